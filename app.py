@@ -1,10 +1,24 @@
+import time
 import streamlit as st
 import pandas as pd
 from modules.recommender import recommend_funds, get_fund_mix
-from modules.amfi_data import get_latest_navs_for_sbi
-from modules.manager_notes import get_fund_manager_notes
-from modules.market_data_api import get_live_market_indices, get_stock_data
+from modules.cache import describe_age, invalidate_all
+from modules.data_sources import get_latest_navs_for_sbi, get_fund_manager_notes, get_live_market_indices, get_stock_data
+from modules.section_loader import SectionLoader
+from modules.market_data_api import INDEX_SYMBOLS
+from modules.metrics import count_upstream_error, get_metrics_server, metrics_tables, observe, span
+# allocation, projection, nav_history, nav_table and tick_feed are imported by the sections
+# that use them, so the page starts without loading modules its sections may not need.
 
+# Per-source timeouts (seconds): a source that misses its own deadline renders a degraded section.
+SOURCE_TIMEOUTS = {"notes": 5, "navs": 20, "indices": 3, "stock": 3}
+MARKET_PANEL_REFRESH_SECONDS = 2
+NAV_HISTORY_CHART_YEARS = 5
+ALLOCATION_METHOD_LABELS = {"Recommended Weightage": "weightage", "Risk Parity": "risk_parity", "Mean-Variance": "mean_variance"}
+CONTRIBUTION_SCHEDULE_LABELS = {"Lump Sum": "lump_sum", "Monthly SIP": "sip"}
+
+page_started = time.perf_counter()
+get_metrics_server() # Serves /metrics when METRICS_PORT is configured
 st.set_page_config(page_title="FundGenius - SBI MF Assistant", layout="wide")
 
 st.title("FundGenius - AI Mutual Fund Assistant (Internal)")
@@ -18,8 +32,28 @@ risk = st.sidebar.selectbox("Risk Profile", ["Conservative", "Low", "Moderate",
 goal = st.sidebar.selectbox("Investment Goal", ["Retirement Planning", "Wealth Creation", "Child's Education", "Tax Saving", "General Investment", "Short-term Capital Gain"], help="Primary objective of the investment.")
 duration = st.sidebar.slider("Investment Duration (Years)", 1, 30, 5, help="Expected investment horizon in years.")
 amount = st.sidebar.number_input("Investment Amount (INR)", 1000, 100000000, 100000, step=1000, help="Total amount client intends to invest.")
+allocation_method = st.sidebar.selectbox("Allocation Method", list(ALLOCATION_METHOD_LABELS), help="How the amount is split across the suggested funds. Risk Parity and Mean-Variance use NAV history.")
+contribution_schedule = st.sidebar.radio("Contribution Schedule", list(CONTRIBUTION_SCHEDULE_LABELS), horizontal=True, help="Invest the amount at once, or in equal monthly instalments over the investment duration.")
+target_corpus = st.sidebar.number_input("Target Corpus (INR)", 0, 1000000000, 0, step=10000, help="Corpus the client is aiming for. 0 uses the amount invested, i.e. the chance of a loss.")
 st.sidebar.markdown("---")
 st.sidebar.info("Adjust client parameters to get tailored recommendations and insights.")
+if st.sidebar.button("Refresh Data", help="Fetch NAVs, market data and insights again instead of using cached copies."):
+    invalidate_all()
+show_debug_metrics = st.sidebar.checkbox("Show Performance Metrics", help="Per-section timings, cache hit ratios and upstream errors for this app process.")
+
+
+# --- Upstream Data ---
+# Start every independent fetch at once; each section below renders as soon as its own
+# data arrives, so the page takes as long as the slowest source rather than their sum.
+sbi_stock_ticker = "SBIN.NS" # Example for NSE: SBI
+loader = SectionLoader()
+loader.submit("navs", get_latest_navs_for_sbi, timeout=SOURCE_TIMEOUTS["navs"])
+# With a streaming tick feed configured, the market panel reads its ring buffers instead.
+from modules.tick_feed import get_tick_subscriber
+tick_feed = get_tick_subscriber()
+if tick_feed is None:
+    loader.submit("indices", get_live_market_indices, timeout=SOURCE_TIMEOUTS["indices"])
+    loader.submit("stock", get_stock_data, sbi_stock_ticker, timeout=SOURCE_TIMEOUTS["stock"])
 
 
 # --- Main Content Area ---
@@ -27,112 +61,277 @@ st.sidebar.info("Adjust client parameters to get tailored recommendations and in
 # 1. Fund Recommendation
 st.header("Fund Recommendation")
 st.markdown("Based on the client's profile, here are the suggested fund categories and specific SBI Mutual Fund schemes.")
-try:
-    recommended_category, suggested_funds = recommend_funds(risk, duration, goal)
-    st.success(f"**Recommended Category:** {recommended_category}")
-    st.subheader("Suggested SBI Mutual Fund Schemes:")
-    if suggested_funds:
-        for fund in suggested_funds:
-            st.markdown(f"- **{fund['name']}** - _{fund['type']}_ [Recommended Allocation: {fund['weightage']}%]")
-            st.write(f"  * _Rationale: {fund['rationale']}_")
-    else:
-        st.warning("No specific funds could be recommended based on the current criteria. Please adjust inputs or contact a senior advisor.")
-except Exception as e:
-    st.error(f"Error generating fund recommendations: {e}")
-    st.info("Ensure the `recommender.py` module is correctly configured and has a comprehensive fund database.")
+recommended_category, suggested_funds = None, []
+with span("recommendation"):
+    try:
+        recommended_category, suggested_funds = recommend_funds(risk, duration, goal)
+        st.success(f"**Recommended Category:** {recommended_category}")
+        st.subheader("Suggested SBI Mutual Fund Schemes:")
+        if suggested_funds:
+            for fund in suggested_funds:
+                st.markdown(f"- **{fund['name']}** - _{fund['type']}_ [Recommended Allocation: {fund['weightage']}%]")
+                st.write(f"  * _Rationale: {fund['rationale']}_")
+        else:
+            st.warning("No specific funds could be recommended based on the current criteria. Please adjust inputs or contact a senior advisor.")
+    except Exception as e:
+        st.error(f"Error generating fund recommendations: {e}")
+        st.info("Ensure the `recommender.py` module is correctly configured and has a comprehensive fund database.")
 st.markdown("---")
+# Commentary is ranked against this recommendation, so its fetch starts once that is known.
+loader.submit("notes", get_fund_manager_notes, recommended_category, tuple(fund['name'] for fund in suggested_funds),
+              timeout=SOURCE_TIMEOUTS["notes"])
 
 # 2. Suggested Fund Mix
 st.header("Suggested Fund Mix & Allocation")
 st.markdown("Here's a proposed allocation of the client's investment amount across the recommended funds.")
-try:
-    if suggested_funds: # Only show mix if funds were recommended
-        mix_data = get_fund_mix(Fund_Recommendation, amount)
-        st.subheader("Investment Allocation Breakdown:")
-        total_allocated = 0
-        for item in mix_data:
-            st.markdown(f"- ₹**{item['amount']:,}** (`{item['percentage']:.2f}%`) → **{item['fund']}**")
-            total_allocated += item['amount']
-        st.markdown(f"**Total Allocated Amount:** ₹{total_allocated:,}")
-        if total_allocated != amount:
-            st.warning(f"Note: Total allocated amount (₹{total_allocated:,}) differs from the input amount (₹{amount:,}). This might be due to rounding).")
-    else:
-        st.info("Please generate fund recommendations first to see a fund mix.")
-except Exception as e:
-    st.error(f"Error generating fund mix: {e}")
-    st.info("Check the `get_fund_mix` function in `recommender.py`.")
+with span("fund_mix"):
+    try:
+        if suggested_funds: # Only show mix if funds were recommended
+            from modules.allocation import AllocationError
+            try:
+                mix_data = get_fund_mix(suggested_funds, amount, ALLOCATION_METHOD_LABELS[allocation_method])
+            except AllocationError as e:
+                st.info(f"{e} Showing the recommended weightage split instead.")
+                mix_data = get_fund_mix(suggested_funds, amount)
+            st.subheader("Investment Allocation Breakdown:")
+            total_allocated = 0
+            for item in mix_data:
+                st.markdown(f"- ₹**{item['amount']:,}** (`{item['percentage']:.2f}%`) → **{item['fund']}**")
+                total_allocated += item['amount']
+            st.markdown(f"**Total Allocated Amount:** ₹{total_allocated:,}")
+            if total_allocated != amount:
+                st.warning(f"Note: Total allocated amount (₹{total_allocated:,}) differs from the input amount (₹{amount:,}). This might be due to rounding).")
+            with span("projection"):
+                try:
+                    from modules.projection import PROJECTION_PATHS, project_corpus
+                    projection = project_corpus(mix_data, duration, CONTRIBUTION_SCHEDULE_LABELS[contribution_schedule], target_corpus or None)
+                    st.subheader("Projected Corpus:")
+                    bands = projection['bands']
+                    final = bands.iloc[-1]
+                    col1, col2, col3, col4 = st.columns(4)
+                    col1.metric("Pessimistic (P10)", f"₹{final['P10']:,.0f}")
+                    col2.metric("Median (P50)", f"₹{final['P50']:,.0f}")
+                    col3.metric("Optimistic (P90)", f"₹{final['P90']:,.0f}")
+                    col4.metric("Shortfall Probability", f"{projection['shortfall_probability']:.1%}", help=f"Chance of ending below ₹{projection['target']:,.0f}.")
+                    st.line_chart(bands)
+                    st.caption(f"At age {age + duration}, across {PROJECTION_PATHS:,} simulated market paths using each fund's NAV history (long-run assumptions where history is short). Projections are not guaranteed returns.")
+                except Exception as e:
+                    st.warning(f"Corpus projection is unavailable: {e}")
+        else:
+            st.info("Please generate fund recommendations first to see a fund mix.")
+    except Exception as e:
+        st.error(f"Error generating fund mix: {e}")
+        st.info("Check the `get_fund_mix` function in `recommender.py`.")
 st.markdown("---")
 
 # 3. Fund Manager Insights
 st.header("Fund Manager Insights & Commentary")
 st.markdown("Stay updated with the latest commentary and outlook from our expert fund managers.")
-try:
-    notes = get_fund_manager_notes()
-    if notes:
-        for i, line in enumerate(notes):
-            st.info(f"🔹 **Insight {i+1}:** {line}")
-    else:
-        st.info("No recent fund manager insights available. Check back later.")
-except Exception as e:
-    st.error(f"Error fetching fund manager notes: {e}")
-    st.info("Ensure the `manager_notes.py` module can access its data source.")
+notes_area = st.empty()
+notes_area.info("Loading fund manager insights...")
 st.markdown("---")
 
 # 4. Live NAVs (SBI Mutual Funds)
 st.header("SBI Mutual Fund NAVs (Live)")
 st.markdown("Access the latest Net Asset Values (NAVs) for SBI Mutual Fund schemes. Data typically updated daily after market close.")
-try:
-    # This function should fetch actual NAVs from AMFI or a reliable API
-    navs_df = get_latest_navs_for_sbi()
-    if not navs_df.empty:
-        st.dataframe(navs_df, use_container_width=True, height=300)
-        st.caption(f"Last updated: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')} (Data source for NAVs: AMFI or authorized API)")
-    else:
-        st.warning("Could not fetch latest SBI Mutual Fund NAVs. Data might be unavailable or API limit reached.")
-except Exception as e:
-    st.error(f"Error fetching live NAVs: {e}")
-    st.info("Verify your internet connection and the `get_latest_navs_for_sbi` function in `amfi_data.py`.")
+navs_area = st.empty()
+navs_area.info("Loading latest NAVs...")
 st.markdown("---")
 
 # 5. General Market Data (Optional, but highly functional)
 st.header("General Market Overview")
 st.markdown("Quick glance at key Indian market indices and selected stock performance.")
 
-col1, col2 = st.columns(2)
 
-with col1:
-    st.subheader("Major Indices")
-    try:
-        indices_data = get_live_market_indices()
-        if not indices_data.empty:
-            st.dataframe(indices_data, use_container_width=True, hide_index=True)
-            st.caption("Source: Live Market Data API (e.g., Broker API)")
+@st.fragment(run_every=MARKET_PANEL_REFRESH_SECONDS)
+def live_market_panel():
+    # Reruns on its own timer without rerunning the rest of the page, and only reads
+    # non-blocking snapshots of the tick buffers, so it never waits on the network.
+    with span("market_panel"):
+        render_market_panel()
+
+
+def render_market_panel():
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Major Indices")
+        quotes = [(name, tick_feed.quote(symbol)) for name, symbol in INDEX_SYMBOLS.items()]
+        quotes = [(name, quote) for name, quote in quotes if quote]
+        if quotes:
+            # Change is NaN until an index's first tick with an open; show a dash, not "nan".
+            st.dataframe(pd.DataFrame({
+                'Index': [name for name, _ in quotes],
+                'Value': [quote['current_price'] for _, quote in quotes],
+                'Change': [quote['change'] for _, quote in quotes],
+                'Change %': [quote['percent_change'] for _, quote in quotes]
+            }).style.format(precision=2, na_rep="—"), use_container_width=True, hide_index=True)
+            for name, _ in quotes:
+                st.caption(name)
+                st.line_chart(tick_feed.series(INDEX_SYMBOLS[name]), height=100)
+            st.caption(f"Source: Streaming tick feed | Last tick {describe_age(max(q['timestamp'] for _, q in quotes))} ago")
         else:
-            st.info("Could not fetch live index data.")
-    except Exception as e:
-        st.error(f"Error fetching live index data: {e}")
-        st.info("Check `get_live_market_indices` in `market_data_api.py`.")
+            st.info("Waiting for index ticks..." if tick_feed.connected else "Tick feed is not connected; retrying.")
+    with col2:
+        st.subheader("Key SBI Stock Performance")
+        quote = tick_feed.quote(sbi_stock_ticker)
+        if quote:
+            st.write(f"**{sbi_stock_ticker}**")
+            st.write(f"Current Price: ₹**{quote['current_price']:,.2f}**")
+            if pd.isna(quote['change']): # No open yet
+                st.write("Change: —")
+            else:
+                st.write(f"Change: {'+' if quote['change'] >= 0 else ''}{quote['change']:,.2f} ({quote['percent_change']:.2f}%)")
+            st.line_chart(tick_feed.series(sbi_stock_ticker), height=200)
+            st.caption(f"Source: Streaming tick feed | Last tick {describe_age(quote['timestamp'])} ago")
+        else:
+            st.info(f"Waiting for ticks for {sbi_stock_ticker}...")
+
 
-with col2:
-    st.subheader("Key SBI Stock Performance")
-    # This is a placeholder for specific stock data related to SBI or its holdings
-    sbi_stock_ticker = "SBIN.NS" # Example for NSE: SBI
+if tick_feed is not None:
+    indices_area = stock_area = None
+    live_market_panel()
+else:
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("Major Indices")
+        indices_area = st.empty()
+        indices_area.info("Loading index data...")
+
+    with col2:
+        st.subheader("Key SBI Stock Performance")
+        # This is a placeholder for specific stock data related to SBI or its holdings
+        stock_area = st.empty()
+        stock_area.info("Loading stock data...")
+st.markdown("---")
+
+
+def render_notes(notes):
+    if notes:
+        for i, note in enumerate(notes):
+            title = f" {note['title']}:" if note['title'] else ""
+            st.info(f"🔹 **Insight {i+1}:**{title} {note['body']} _({note['date']})_")
+    else:
+        st.info("No recent fund manager insights available. Check back later.")
+
+
+def first_nav_page():
+    st.session_state["nav_page"] = 1
+
+
+def render_navs(navs_df):
+    if navs_df.empty:
+        st.warning("Could not fetch latest SBI Mutual Fund NAVs. Data might be unavailable or API limit reached.")
+        return
+    # The cached frame and its fetch time together, in case a refresh landed since it was loaded.
+    nav_entry = get_latest_navs_for_sbi.peek()
+    if nav_entry is not None:
+        navs_df = nav_entry.value
+    fetched_at = nav_entry.fetched_at if nav_entry is not None else None
+    # Only the visible page goes to the browser; search, sorting and paging run here.
+    from modules.nav_table import PAGE_SIZES, DEFAULT_PAGE_SIZE, get_nav_table
+    nav_table = get_nav_table(navs_df, fetched_at)
+    search_col, sort_col, order_col = st.columns([3, 2, 1])
+    nav_query = search_col.text_input("Search schemes", key="nav_search", placeholder="e.g. small cap direct growth", on_change=first_nav_page)
+    nav_sort = sort_col.selectbox("Sort by", ["Default"] + list(nav_table.frame.columns), key="nav_sort", on_change=first_nav_page)
+    nav_descending = order_col.toggle("Descending", key="nav_descending", on_change=first_nav_page)
+    size_col, page_col = st.columns([1, 1])
+    nav_page_size = size_col.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE), key="nav_page_size", on_change=first_nav_page)
+    nav_page = page_col.number_input("Page", min_value=1, step=1, key="nav_page")
+    visible = nav_table.page(nav_query, None if nav_sort == "Default" else nav_sort, nav_descending, nav_page, nav_page_size)
+    st.dataframe(visible.rows, use_container_width=True, hide_index=True, height=300)
+    st.caption(f"{visible.matches:,} of {len(nav_table):,} schemes match | Page {visible.page} of {visible.pages}")
+    nav_dates = pd.to_datetime(navs_df['Date'], errors='coerce').dropna()
+    nav_date = nav_dates.max().strftime('%Y-%m-%d') if not nav_dates.empty else "N/A"
+    st.caption(f"NAV date: {nav_date} | Fetched {describe_age(fetched_at)} ago (Data source for NAVs: AMFI or authorized API)")
     try:
-        stock_info = get_stock_data(sbi_stock_ticker)
-        if stock_info:
-            st.write(f"**{stock_info.get('symbol', 'N/A')}** - {stock_info.get('name', 'N/A')}")
-            st.write(f"Current Price: ₹**{stock_info.get('current_price', 'N/A'):,.2f}**")
-            st.write(f"Change: {'+' if stock_info.get('change', 0) >= 0 else ''}{stock_info.get('change', 'N/A'):,.2f} ({stock_info.get('percent_change', 'N/A'):.2f}%)")
-            st.write(f"Open: ₹{stock_info.get('open', 'N/A'):,.2f} | High: ₹{stock_info.get('high', 'N/A'):,.2f} | Low: ₹₹{stock_info.get('low', 'N/A'):,.2f}")
-            st.caption("Source: Live Market Data API (e.g., Broker API)")
-        else:
-            st.info(f"Could not fetch data for {sbi_stock_ticker}.")
+        from modules.nav_history import get_default_store
+        nav_history = get_default_store() # Written when NAVs are fetched (modules/data_sources.py)
+        with st.expander("NAV History"):
+            if visible.rows.empty:
+                st.info("No schemes match the search above.")
+                return
+            # Schemes on the page shown above, rather than every scheme in the NAVs.
+            history_scheme = st.selectbox("Scheme", visible.rows['Scheme Name'].tolist(), key="nav_history_scheme")
+            history_code = visible.rows.loc[visible.rows['Scheme Name'] == history_scheme, 'Scheme Code'].iloc[0]
+            history_start = pd.Timestamp.today().normalize() - pd.DateOffset(years=NAV_HISTORY_CHART_YEARS)
+            nav_series = nav_history.get_nav_series(int(history_code), start=history_start)
+            if len(nav_series) > 1:
+                st.line_chart(nav_series)
+            else:
+                st.info("Not enough NAV history recorded for this scheme yet.")
     except Exception as e:
-        st.error(f"Error fetching stock data: {e}")
-        st.info("Check `get_stock_data` in `market_data_api.py`.")
-st.markdown("---")
+        st.warning(f"NAV history is unavailable: {e}")
+
+
+def render_indices(indices_data):
+    if not indices_data.empty:
+        st.dataframe(indices_data, use_container_width=True, hide_index=True)
+        st.caption(f"Source: Live Market Data API (e.g., Broker API) | Quoted {describe_age(get_live_market_indices.fetched_at())} ago")
+    else:
+        st.info("Could not fetch live index data.")
+
+
+def render_stock(stock_info):
+    if stock_info:
+        st.write(f"**{stock_info.get('symbol', 'N/A')}** - {stock_info.get('name', 'N/A')}")
+        st.write(f"Current Price: ₹**{stock_info.get('current_price', 'N/A'):,.2f}**")
+        st.write(f"Change: {'+' if stock_info.get('change', 0) >= 0 else ''}{stock_info.get('change', 'N/A'):,.2f} ({stock_info.get('percent_change', 'N/A'):.2f}%)")
+        st.write(f"Open: ₹{stock_info.get('open', 'N/A'):,.2f} | High: ₹{stock_info.get('high', 'N/A'):,.2f} | Low: ₹₹{stock_info.get('low', 'N/A'):,.2f}")
+        st.caption(f"Source: Live Market Data API (e.g., Broker API) | Quoted {describe_age(get_stock_data.fetched_at(sbi_stock_ticker))} ago")
+    else:
+        st.info(f"Could not fetch data for {sbi_stock_ticker}.")
+
+
+# Section name -> (placeholder, data source, renderer, label, error message, troubleshooting hint)
+SECTIONS = {
+    "notes": (notes_area, get_fund_manager_notes, render_notes, "Fund manager insights", "Error fetching fund manager notes", "Ensure the `manager_notes.py` module can access its data source."),
+    "navs": (navs_area, get_latest_navs_for_sbi, render_navs, "NAV data", "Error fetching live NAVs", "Verify your internet connection and the `get_latest_navs_for_sbi` function in `amfi_data.py`."),
+    "indices": (indices_area, get_live_market_indices, render_indices, "Index data", "Error fetching live index data", "Check `get_live_market_indices` in `market_data_api.py`."),
+    "stock": (stock_area, get_stock_data, render_stock, "Stock data", "Error fetching stock data", "Check `get_stock_data` in `market_data_api.py`."),
+}
 
 # --- Footer ---
 st.markdown("---")
 st.caption("Developed by Nitro2624 for Internal SBI Mutual Fund Use. All recommendations are AI-generated and should be reviewed by a human advisor.")
 st.caption("Disclaimer: This tool provides AI-driven insights and is for internal training and informational purposes only. It does not constitute financial advice or an offer to buy/sell securities. Consult a qualified financial advisor for actual investment decisions.")
+
+# --- Deferred Sections ---
+# Fill each placeholder as its fetch completes; late or failing sources degrade on their own.
+for result in loader.results():
+    area, source, render, label, error_message, hint = SECTIONS[result.name]
+    with area.container():
+        if result.timed_out:
+            # Counted under the source's span name, as its exceptions and empty results are.
+            count_upstream_error(source.__name__, 'timeout')
+            st.warning(f"{label} did not arrive within {SOURCE_TIMEOUTS[result.name]}s. The upstream service may be slow; try again shortly.")
+        elif result.error is not None:
+            st.error(f"{error_message}: {result.error}")
+            st.info(hint)
+        else:
+            with span(result.name):
+                try:
+                    render(result.value)
+                except Exception as e:
+                    st.error(f"{error_message}: {e}")
+                    st.info(hint)
+observe("page", time.perf_counter() - page_started, kind="page")
+
+# --- Debug: Performance Metrics ---
+if show_debug_metrics:
+    st.markdown("---")
+    st.header("Performance Metrics")
+    st.caption("Since this app process started. Section spans time rendering; upstream spans time cache misses only.")
+    spans_table, caches_table, errors_table = metrics_tables()
+    st.subheader("Timing Spans")
+    st.dataframe(spans_table, use_container_width=True, hide_index=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Caches")
+        st.dataframe(caches_table, use_container_width=True, hide_index=True)
+    with col2:
+        st.subheader("Upstream Errors")
+        if errors_table.empty:
+            st.info("No upstream errors recorded.")
+        else:
+            st.dataframe(errors_table, use_container_width=True, hide_index=True)
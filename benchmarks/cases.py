@@ -0,0 +1,345 @@
+import functools
+import itertools
+import os
+
+import numpy as np
+
+from benchmarks.harness import make_case
+from benchmarks.synthetic import (SYNTHETIC_NOW, make_client_profiles, make_fund_catalog, write_manager_notes,
+                                 write_navall, write_scheme_master)
+from modules import amfi_data
+from modules.allocation import allocate_batch
+from modules.batch_review import run_review
+from modules.cache import invalidate_all
+from modules.fund_store import FundStore
+from modules.manager_notes import NotesStore
+from modules.nav_table import NavTable
+from modules.projection import project_corpus, simulate_growth
+from modules.snapshot_store import SnapshotStore
+from modules.recommender import (FundCatalog, get_fund_mix, get_fund_mix_batch, load_fund_data, recommend_funds,
+                                 recommend_funds_batch)
+
+# The benchmark cases. "quick" sizes finish in a minute or two and are meant for every
+# change to the rerun path; "full" adds the catalog (up to 50k schemes) and client-book
+# (up to 1M profiles) scaling runs.
+# Every dataset is built by a memoised builder below on first use, from the untimed setup
+# of a case that needs it, so `-k` only pays for the data of the cases it selects.
+SCALES = {
+    'quick': {
+        'catalog_sizes': (9, 1_000),
+        'client_counts': (10_000,),
+        'navall_schemes': (15_000,),
+        'allocation_clients': 10_000,
+        'fund_store_schemes': (45_000,),
+        'manager_notes': (5_000,),
+    },
+    'full': {
+        'catalog_sizes': (9, 1_000, 10_000, 50_000),
+        'client_counts': (10_000, 100_000, 1_000_000),
+        'navall_schemes': (15_000, 50_000),
+        'allocation_clients': 1_000_000,
+        'fund_store_schemes': (45_000, 200_000),
+        'manager_notes': (5_000, 50_000),
+    },
+}
+SINGLE_CALLS = 100 # Calls per timed run for the per-request entry points
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+
+def _repeated(func, *args, calls: int = SINGLE_CALLS):
+    """Calls func(*setup_args, *args) `calls` times per timed run."""
+    def run(*setup_args):
+        for _ in range(calls):
+            func(*setup_args, *args)
+    return run
+
+
+@functools.cache
+def _client_book(n_clients: int):
+    return make_client_profiles(n_clients)
+
+
+@functools.cache
+def _catalog_frame(n_funds: int):
+    return make_fund_catalog(n_funds)
+
+
+@functools.cache
+def _catalog(n_funds: int) -> FundCatalog:
+    return FundCatalog(_catalog_frame(n_funds))
+
+
+@functools.cache
+def _catalog_snapshot(n_funds: int, workdir: str) -> str:
+    snapshot_dir = os.path.join(workdir, f'catalog-{n_funds}')
+    _catalog(n_funds).save_snapshot('bench', snapshot_dir)
+    return snapshot_dir
+
+
+@functools.cache
+def _suggested_funds() -> list:
+    return recommend_funds('Moderate', 5, 'Wealth Creation')[1]
+
+
+@functools.cache
+def _recommended_mix() -> list:
+    return get_fund_mix(_suggested_funds(), 123456)
+
+
+@functools.cache
+def _allocation_problem(n_clients: int) -> tuple:
+    """Distinct random covariances, i.e. with no fund sets to share: (weightages, amounts, covariance, returns)."""
+    rng = np.random.default_rng(0)
+    factors = rng.normal(size=(n_clients, 3, 3)) * 0.1
+    covariance = factors @ factors.transpose(0, 2, 1) + np.eye(3) * 0.01
+    expected_returns = rng.uniform(0, 0.2, (n_clients, 3))
+    weightages = np.tile([40.0, 30.0, 30.0], (n_clients, 1))
+    amounts = rng.integers(10, 100_000, n_clients) * 1000
+    return weightages, amounts, covariance, expected_returns
+
+
+@functools.cache
+def _client_csv(n_clients: int, workdir: str) -> str:
+    path = os.path.join(workdir, f'clients-{n_clients}.csv')
+    _client_book(n_clients).to_csv(path, index=False)
+    return path
+
+
+@functools.cache
+def _navall(n_schemes: int, workdir: str) -> str:
+    return write_navall(os.path.join(workdir, f'NAVAll-{n_schemes}.txt'), n_schemes)
+
+
+@functools.cache
+def _all_navs(n_schemes: int, workdir: str):
+    return amfi_data.fetch_navs(_navall(n_schemes, workdir), amc_name=None)
+
+
+@functools.cache
+def _nav_snapshots(n_schemes: int, workdir: str) -> SnapshotStore:
+    """The all-AMC NAV frame as a snapshot shared between server processes."""
+    store = SnapshotStore(os.path.join(workdir, f'snapshots-{n_schemes}'))
+    store.write('navs', (), _all_navs(n_schemes, workdir), 0.0, float('inf'))
+    return store
+
+
+@functools.cache
+def _nav_table(n_schemes: int, workdir: str) -> NavTable:
+    return NavTable(_all_navs(n_schemes, workdir))
+
+
+@functools.cache
+def _scheme_master(n_schemes: int, workdir: str) -> str:
+    return write_scheme_master(os.path.join(workdir, f'SchemeData-{n_schemes}.csv'), n_schemes)
+
+
+@functools.cache
+def _fund_store(n_schemes: int, workdir: str) -> FundStore:
+    store = FundStore(os.path.join(workdir, f'funds-{n_schemes}.sqlite3'))
+    store.ingest_scheme_master(_scheme_master(n_schemes, workdir))
+    return store
+
+
+@functools.cache
+def _notes_directory(n_notes: int, workdir: str) -> str:
+    return write_manager_notes(os.path.join(workdir, f'notes-{n_notes}'), n_notes)
+
+
+@functools.cache
+def _notes_store(n_notes: int, workdir: str) -> NotesStore:
+    store = NotesStore(os.path.join(workdir, f'notes-{n_notes}.sqlite3'))
+    store.ingest(_notes_directory(n_notes, workdir))
+    return store
+
+
+def recommender_cases(scale: dict, workdir: str) -> list:
+    cases = [
+        make_case('load_fund_data', load_fund_data, repeat=20),
+        make_case(f'recommend_funds x{SINGLE_CALLS}', _repeated(recommend_funds, 'Moderate', 5, 'Wealth Creation'), repeat=10),
+        make_case(f'get_fund_mix x{SINGLE_CALLS}', _repeated(get_fund_mix, 123456), lambda: (_suggested_funds(),), repeat=10),
+    ]
+    for n_funds in scale['catalog_sizes']:
+        cases.append(make_case(f'FundCatalog build/funds={n_funds}', FundCatalog,
+                               lambda n_funds=n_funds: (_catalog_frame(n_funds),), repeat=5))
+        cases.append(make_case(f'FundCatalog load_snapshot/funds={n_funds}',
+                               lambda root: FundCatalog.load_snapshot('bench', root),
+                               lambda n_funds=n_funds: (_catalog_snapshot(n_funds, workdir),), repeat=5))
+        for n_clients in scale['client_counts']:
+            def data(n_funds=n_funds, n_clients=n_clients):
+                return _client_book(n_clients), _catalog(n_funds)
+
+            cases.append(make_case(f'recommend_funds_batch/funds={n_funds}/clients={n_clients}',
+                                   recommend_funds_batch, data, repeat=3))
+            cases.append(make_case(
+                f'get_fund_mix_batch/funds={n_funds}/clients={n_clients}',
+                lambda profiles, catalog: get_fund_mix_batch(profiles, profiles['amount'], catalog=catalog), data,
+                repeat=3
+            ))
+    return cases
+
+
+def allocation_cases(scale: dict) -> list:
+    """Risk-based solvers on distinct random covariances, i.e. with no fund sets to share."""
+    n = scale['allocation_clients']
+    return [
+        make_case(f'allocate_batch/{method}/clients={n}',
+                  lambda weightages, amounts, covariance, expected_returns, method=method:
+                      allocate_batch(weightages, amounts, method, covariance, expected_returns),
+                  lambda: _allocation_problem(n), repeat=3)
+        for method in ('weightage', 'risk_parity', 'mean_variance')
+    ]
+
+
+def projection_cases() -> list:
+    """Monte Carlo projection of a recommended mix: drawing new paths, and a slider change over cached ones."""
+    def new_mix():
+        simulate_growth.invalidate()
+        return (_recommended_mix(),)
+
+    cases = [make_case('project_corpus/new mix', lambda mix: project_corpus(mix, 30), setup=new_mix, repeat=5)]
+    for schedule in ('lump_sum', 'sip'):
+        cases.append(make_case(f'project_corpus/{schedule} x{SINGLE_CALLS}',
+                               _repeated(project_corpus, 30, schedule), lambda: (_recommended_mix(),), repeat=3))
+    return cases
+
+
+def batch_review_cases(scale: dict, workdir: str) -> list:
+    """The batch CLI end to end over a client CSV, in-process and with the worker pool."""
+    cases = []
+    for n_clients in scale['client_counts']:
+        def data(n_clients=n_clients):
+            return _client_csv(n_clients, workdir), os.path.join(workdir, f'review-{n_clients}.csv')
+
+        cases += [
+            make_case(f'run_review/in-process/clients={n_clients}',
+                      lambda path, output: run_review(path, output, workers=0, progress=None), data, repeat=3),
+            make_case(f'run_review/pool/clients={n_clients}',
+                      lambda path, output: run_review(path, output, progress=None), data, repeat=3),
+        ]
+    return cases
+
+
+def navall_cases(scale: dict, workdir: str) -> list:
+    cases = []
+    for n_schemes in scale['navall_schemes']:
+        def path(n_schemes=n_schemes):
+            return (_navall(n_schemes, workdir),)
+
+        def parse(path, amc_name=amfi_data.SBI_AMC_NAME):
+            with open(path, 'r', encoding='utf-8') as f:
+                for _ in amfi_data.iter_navall_records(f, amc_name):
+                    pass
+
+        def cold_fetch(path):
+            amfi_data._nav_cache.clear()
+            amfi_data.fetch_navs(path)
+
+        cases += [
+            make_case(f'iter_navall_records/sbi/schemes={n_schemes}', parse, path, repeat=5),
+            make_case(f'iter_navall_records/all/schemes={n_schemes}', lambda path: parse(path, amc_name=None), path,
+                      repeat=5),
+            make_case(f'fetch_navs/cold/schemes={n_schemes}', cold_fetch, path, repeat=5),
+            make_case(f'fetch_navs/unchanged/schemes={n_schemes}', amfi_data.fetch_navs, path, repeat=20),
+        ]
+
+        # The all-AMC NAV frame as a snapshot shared between server processes.
+        def snapshots(n_schemes=n_schemes):
+            return _nav_snapshots(n_schemes, workdir), _all_navs(n_schemes, workdir)
+
+        cases += [
+            make_case(f'SnapshotStore write/schemes={n_schemes}',
+                      lambda store, navs: store.write('navs', (), navs, 0.0, float('inf')), snapshots, repeat=5),
+            make_case(f'SnapshotStore read x{SINGLE_CALLS}/schemes={n_schemes}',
+                      _repeated(SnapshotStore.read, 'navs', ()),
+                      lambda n_schemes=n_schemes: (_nav_snapshots(n_schemes, workdir),), repeat=5),
+        ]
+
+        # The NAV table's scheme-name index, and a search as typed into the dashboard.
+        cases += [
+            make_case(f'NavTable build/schemes={n_schemes}', NavTable,
+                      lambda n_schemes=n_schemes: (_all_navs(n_schemes, workdir),), repeat=5),
+            make_case(f'NavTable page x{SINGLE_CALLS}/schemes={n_schemes}',
+                      _repeated(NavTable.page, 'small cap direct growth', 'NAV', True, 2),
+                      lambda n_schemes=n_schemes: (_nav_table(n_schemes, workdir),), repeat=5),
+        ]
+    return cases
+
+
+def fund_store_cases(scale: dict, workdir: str) -> list:
+    """Bulk upsert of an AMFI scheme master into a new SQLite store, and recommendations from it."""
+    cases = []
+    databases = itertools.count()
+    for n_schemes in scale['fund_store_schemes']:
+        def new_store(n_schemes=n_schemes):
+            return (FundStore(os.path.join(workdir, f'funds-{n_schemes}-{next(databases)}.sqlite3')),
+                    _scheme_master(n_schemes, workdir))
+
+        cases += [
+            make_case(f'FundStore ingest_scheme_master/schemes={n_schemes}',
+                      lambda store, master: store.ingest_scheme_master(master), setup=new_store,
+                      repeat=3, warmup=0),
+            make_case(f'recommend_funds store x{SINGLE_CALLS}/schemes={n_schemes}',
+                      _repeated(lambda store: recommend_funds('Moderate', 5, 'Wealth Creation', store)),
+                      lambda n_schemes=n_schemes: (_fund_store(n_schemes, workdir),), repeat=10),
+        ]
+    return cases
+
+
+def manager_notes_cases(scale: dict, workdir: str) -> list:
+    """Indexing a directory of manager notes, rescanning it unchanged, and ranked searches."""
+    cases = []
+    databases = itertools.count()
+    fund_names = ('SBI Small Cap Fund', 'SBI Bluechip Fund', 'SBI Contra Fund')
+    for n_notes in scale['manager_notes']:
+        def new_store(n_notes=n_notes):
+            return (NotesStore(os.path.join(workdir, f'notes-{n_notes}-{next(databases)}.sqlite3')),
+                    _notes_directory(n_notes, workdir))
+
+        def indexed(n_notes=n_notes):
+            return _notes_store(n_notes, workdir), _notes_directory(n_notes, workdir)
+
+        cases += [
+            make_case(f'NotesStore ingest/notes={n_notes}', lambda store, directory: store.ingest(directory),
+                      setup=new_store, repeat=3, warmup=0),
+            make_case(f'NotesStore ingest unchanged/notes={n_notes}',
+                      lambda store, directory: store.ingest(directory), indexed, repeat=5),
+            make_case(f'NotesStore search x{SINGLE_CALLS}/notes={n_notes}',
+                      _repeated(lambda store: store.search('Equity - High Growth', fund_names, now=SYNTHETIC_NOW)),
+                      lambda n_notes=n_notes: (_notes_store(n_notes, workdir),), repeat=5),
+        ]
+    return cases
+
+
+def app_cases() -> list:
+    """
+    Headless runs of app.py through Streamlit's AppTest: the first run of a new session
+    with every cache empty, and a rerun of a warm session (what a widget change costs).
+    """
+    def run(app):
+        app.run()
+        if app.exception:
+            raise RuntimeError(f"app.py raised: {app.exception[0].value}")
+
+    def fresh_session():
+        from streamlit.testing.v1 import AppTest
+        invalidate_all(shared=True)
+        amfi_data._nav_cache.clear()
+        return (AppTest.from_file(APP_PATH, default_timeout=120),)
+
+    @functools.cache
+    def warm_session():
+        from streamlit.testing.v1 import AppTest
+        return AppTest.from_file(APP_PATH, default_timeout=120)
+
+    return [
+        make_case('app.py/cold session', run, setup=fresh_session, repeat=5),
+        make_case('app.py/rerun', run, setup=lambda: (warm_session(),), repeat=10),
+    ]
+
+
+def build_cases(scale_name: str, workdir: str) -> list:
+    """Every case at `scale_name`; building them is cheap, the data is made when a case first runs."""
+    scale = SCALES[scale_name]
+    return (recommender_cases(scale, workdir) + allocation_cases(scale) + projection_cases() +
+            batch_review_cases(scale, workdir) + navall_cases(scale, workdir) + fund_store_cases(scale, workdir) +
+            manager_notes_cases(scale, workdir) + app_cases())
@@ -0,0 +1,139 @@
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+# Timing and peak-memory measurement, plus a saved baseline to compare runs against.
+# Each case is timed `repeat` times after `warmup` untimed calls and reported by its
+# median, which shrugs off the odd slow run; peak memory comes from one extra run under
+# tracemalloc, kept separate because tracing slows allocation-heavy code down.
+Case = namedtuple('Case', ['name', 'func', 'setup', 'repeat', 'warmup'])
+Measurement = namedtuple('Measurement', ['name', 'median', 'best', 'spread', 'repeat', 'peak_bytes'])
+Comparison = namedtuple('Comparison', ['name', 'status', 'time_ratio', 'memory_ratio', 'baseline'])
+
+TIME_TOLERANCE = 0.25 # A case is a regression when its median is >25% slower...
+MEMORY_TOLERANCE = 0.25 # ...or its peak memory >25% higher than the baseline
+MIN_TIME_DELTA_SECONDS = 0.002 # Ignore changes smaller than this; they are timer noise
+MIN_MEMORY_DELTA_BYTES = 1 << 20
+
+
+def make_case(name: str, func, setup=None, repeat: int = 5, warmup: int = 1) -> Case:
+    """
+    A benchmark case. `setup`, if given, runs untimed before every call and its return
+    value (a tuple of arguments, or None) is passed to `func`.
+    """
+    return Case(name, func, setup, repeat, warmup)
+
+
+def _call(case: Case) -> float:
+    args = case.setup() if case.setup is not None else None
+    gc.collect()
+    started = time.perf_counter()
+    case.func(*(args or ()))
+    return time.perf_counter() - started
+
+
+def measure(case: Case) -> Measurement:
+    for _ in range(case.warmup):
+        _call(case)
+    timings = [_call(case) for _ in range(case.repeat)]
+
+    args = case.setup() if case.setup is not None else None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        case.func(*(args or ()))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    quartiles = statistics.quantiles(timings, n=4) if len(timings) > 1 else [timings[0]] * 3
+    return Measurement(case.name, statistics.median(timings), min(timings), quartiles[2] - quartiles[0], case.repeat, peak)
+
+
+def environment() -> dict:
+    """What a baseline was measured on; timings from different machines are not comparable."""
+    import numpy as np
+    import pandas as pd
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def save_baseline(path: str, measurements: list, scale: str, keep: dict = None):
+    """Writes measurements as the baseline; `keep` holds earlier results to carry over."""
+    results = dict(keep or {})
+    results.update({m.name: {'median': m.median, 'best': m.best, 'spread': m.spread, 'peak_bytes': m.peak_bytes}
+                    for m in measurements})
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment(), 'scale': scale, 'results': results}, f, indent=2, sort_keys=True)
+
+
+def load_baseline(path: str):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(measurements: list, baseline: dict, time_tolerance: float = TIME_TOLERANCE,
+            memory_tolerance: float = MEMORY_TOLERANCE) -> list:
+    """Classifies each measurement against the baseline as ok, regressed, improved or new."""
+    results = (baseline or {}).get('results', {})
+    comparisons = []
+    for m in measurements:
+        base = results.get(m.name)
+        if base is None:
+            comparisons.append(Comparison(m.name, 'new', None, None, None))
+            continue
+        time_ratio = m.median / base['median'] if base['median'] else float('inf')
+        memory_ratio = m.peak_bytes / base['peak_bytes'] if base['peak_bytes'] else 1.0
+        slower = time_ratio > 1 + time_tolerance and m.median - base['median'] > MIN_TIME_DELTA_SECONDS
+        bigger = memory_ratio > 1 + memory_tolerance and m.peak_bytes - base['peak_bytes'] > MIN_MEMORY_DELTA_BYTES
+        faster = time_ratio < 1 - time_tolerance and base['median'] - m.median > MIN_TIME_DELTA_SECONDS
+        status = 'regressed' if slower or bigger else 'improved' if faster else 'ok'
+        comparisons.append(Comparison(m.name, status, time_ratio, memory_ratio, base))
+    return comparisons
+
+
+def _format_seconds(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.0f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f} ms"
+    return f"{seconds:.2f} s"
+
+
+def format_report(measurements: list, comparisons: list = None) -> str:
+    comparisons = {c.name: c for c in comparisons or []}
+    width = max([len(m.name) for m in measurements] + [4])
+    lines = [f"{'case':<{width}}  {'median':>9}  {'best':>9}  {'iqr':>9}  {'peak MB':>8}  {'vs baseline':>12}"]
+    for m in measurements:
+        c = comparisons.get(m.name)
+        if c is None or c.status == 'new':
+            versus = 'new' if c is not None else ''
+        else:
+            versus = f"{(c.time_ratio - 1) * 100:+.0f}% {c.status if c.status != 'ok' else ''}".rstrip()
+        lines.append(f"{m.name:<{width}}  {_format_seconds(m.median):>9}  {_format_seconds(m.best):>9}  "
+                     f"{_format_seconds(m.spread):>9}  {m.peak_bytes / 2 ** 20:>8.1f}  {versus:>12}")
+    regressed = [c for c in comparisons.values() if c.status == 'regressed']
+    for c in regressed:
+        lines.append(f"REGRESSION {c.name}: time x{c.time_ratio:.2f}, peak memory x{c.memory_ratio:.2f} "
+                     f"(baseline median {_format_seconds(c.baseline['median'])})")
+    return '\n'.join(lines)
+
+
+def progress(message: str):
+    print(message, file=sys.stderr, flush=True)
@@ -0,0 +1,74 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import namedtuple
+
+from benchmarks.harness import Measurement
+
+# Import-time budgets. Each module is imported in a fresh interpreter, after the heavy
+# packages the app loads anyway (`preload`), so the timing covers only what importing the
+# module itself adds. A module must also not pull in any of its `deferred` packages: those
+# are imported lazily, on first use, to keep cold starts and new sessions fast.
+ImportBudget = namedtuple('ImportBudget', ['module', 'preload', 'seconds', 'deferred'])
+ImportResult = namedtuple('ImportResult', ['budget', 'timings', 'median', 'loaded'])
+
+IMPORT_BUDGETS = (
+    ImportBudget('modules.recommender', ('numpy', 'pandas'), 0.05, ('requests', 'streamlit', 'modules.allocation')),
+    ImportBudget('modules.data_sources', ('numpy', 'pandas'), 0.05, ('requests', 'streamlit')),
+    ImportBudget('modules.amfi_data', (), 0.02, ('pandas', 'requests', 'streamlit')),
+    ImportBudget('modules.market_data_api', (), 0.02, ('pandas', 'requests', 'streamlit')),
+    ImportBudget('modules.metrics', (), 0.02, ('pandas', 'requests', 'streamlit', 'http.server')),
+)
+IMPORT_REPEAT = 3
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = """
+import importlib, json, sys, time
+for name in {preload!r}:
+    importlib.import_module(name)
+started = time.perf_counter()
+importlib.import_module({module!r})
+seconds = time.perf_counter() - started
+print(json.dumps({{'seconds': seconds, 'loaded': [name for name in {deferred!r} if name in sys.modules]}}))
+"""
+
+
+def _probe(budget: ImportBudget) -> dict:
+    script = _PROBE.format(module=budget.module, preload=budget.preload, deferred=budget.deferred)
+    output = subprocess.run([sys.executable, '-c', script], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def measure_imports(budgets=IMPORT_BUDGETS, repeat: int = IMPORT_REPEAT) -> list:
+    """Times every budgeted import `repeat` times, each in a new interpreter."""
+    results = []
+    for budget in budgets:
+        probes = [_probe(budget) for _ in range(repeat)]
+        timings = [probe['seconds'] for probe in probes]
+        loaded = sorted({name for probe in probes for name in probe['loaded']})
+        results.append(ImportResult(budget, timings, statistics.median(timings), loaded))
+    return results
+
+
+def import_measurements(results: list) -> list:
+    """The import timings as Measurements, so they are saved and compared like any other case."""
+    measurements = []
+    for r in results:
+        quartiles = statistics.quantiles(r.timings, n=4) if len(r.timings) > 1 else [r.timings[0]] * 3
+        measurements.append(Measurement(f"import {r.budget.module}", r.median, min(r.timings),
+                                        quartiles[2] - quartiles[0], len(r.timings), 0))
+    return measurements
+
+
+def budget_violations(results: list) -> list:
+    """One message per import that is over its time budget or loaded a deferred package."""
+    violations = []
+    for r in results:
+        if r.median > r.budget.seconds:
+            violations.append(f"OVER BUDGET import {r.budget.module}: {r.median * 1e3:.1f} ms "
+                              f"(budget {r.budget.seconds * 1e3:.0f} ms)")
+        if r.loaded:
+            violations.append(f"OVER BUDGET import {r.budget.module}: loads {', '.join(r.loaded)} on import")
+    return violations
@@ -0,0 +1,74 @@
+import argparse
+import os
+import sys
+import tempfile
+
+# Benchmark runner:
+#   python -m benchmarks.run                    # quick suite, compared with benchmarks/baseline.json
+#   python -m benchmarks.run --save-baseline    # record the current numbers as the baseline
+#   python -m benchmarks.run --scale full -k recommend
+# Every run also checks the import-time budgets in benchmarks/imports.py.
+# Exits with status 1 when any case regressed against the baseline or an import is over
+# its budget, so it can gate CI.
+# Baselines are per machine: record one before a change and compare after it.
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def _isolate_environment(workdir: str, navall_path: str):
+    """Points the app at synthetic local data so runs never touch the network or real NAV history."""
+    os.environ['NAV_HISTORY_DIR'] = os.path.join(workdir, 'nav_history')
+    os.environ['AMFI_NAV_URL'] = navall_path
+    os.environ['CATALOG_SNAPSHOT_DIR'] = os.path.join(workdir, 'catalog_snapshot')
+    os.environ['NOTES_DB_PATH'] = os.path.join(workdir, 'manager_notes.sqlite3')
+    os.environ['SNAPSHOT_DIR'] = os.path.join(workdir, 'snapshots')
+    for name in ('MARKET_DATA_API_URL', 'MARKET_DATA_API_KEY', 'TICK_FEED_ADDRESS', 'FUND_DB_PATH', 'NOTES_SOURCE'):
+        os.environ.pop(name, None)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Time and memory benchmarks for FundGenius.")
+    parser.add_argument('--scale', choices=('quick', 'full'), default='quick')
+    parser.add_argument('-k', dest='pattern', default=None, help="Only run cases whose name contains this text.")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline JSON file to compare against.")
+    parser.add_argument('--save-baseline', action='store_true', help="Save this run as the new baseline.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='fundgenius-bench-') as workdir:
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        navall_path = os.path.join(workdir, 'NAVAll-app.txt')
+        _isolate_environment(workdir, navall_path)
+        # Imported only now: modules read their configuration from the environment on import.
+        from benchmarks.cases import build_cases
+        from benchmarks.harness import compare, format_report, load_baseline, measure, progress, save_baseline
+        from benchmarks.imports import IMPORT_BUDGETS, budget_violations, import_measurements, measure_imports
+        from benchmarks.synthetic import write_navall
+
+        write_navall(navall_path, 15_000)
+        cases = [case for case in build_cases(args.scale, workdir) if not args.pattern or args.pattern in case.name]
+        measurements = []
+        for case in cases:
+            progress(f"running {case.name} ...")
+            measurements.append(measure(case))
+        progress("checking import budgets ...")
+        import_results = measure_imports([budget for budget in IMPORT_BUDGETS
+                                          if not args.pattern or args.pattern in f"import {budget.module}"])
+        measurements += import_measurements(import_results)
+
+    baseline = load_baseline(args.baseline)
+    comparisons = compare(measurements, baseline) if baseline is not None else None
+    print(format_report(measurements, comparisons))
+    violations = budget_violations(import_results)
+    for violation in violations:
+        print(violation)
+    if args.save_baseline:
+        # A filtered run only replaces the cases it ran.
+        keep = baseline['results'] if baseline is not None and args.pattern else None
+        save_baseline(args.baseline, measurements, args.scale, keep)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    regressed = comparisons and any(c.status == 'regressed' for c in comparisons)
+    return 1 if regressed or violations else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import csv
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules.recommender import INVESTMENT_GOALS, RISK_PROFILES, load_fund_data
+
+# Deterministic synthetic inputs for the benchmarks: the same size and seed always give the
+# same data, so timings are comparable across runs and machines.
+FUND_TYPES = (
+    "Equity - Large Cap", "Equity - Mid Cap", "Equity - Small Cap", "Equity - Value/Contra",
+    "Equity - ELSS", "Equity - Large & Mid Cap", "Hybrid - Aggressive Hybrid",
+    "Hybrid - Dynamic Asset Allocation", "Debt - Medium Duration", "Debt - Liquid",
+)
+SCHEME_CATEGORIES = (
+    "Equity Scheme - Large Cap Fund", "Equity Scheme - Mid Cap Fund", "Equity Scheme - Small Cap Fund",
+    "Equity Scheme - Large & Mid Cap Fund", "Equity Scheme - Contra Fund", "Equity Scheme - ELSS",
+    "Hybrid Scheme - Aggressive Hybrid Fund", "Hybrid Scheme - Balanced Advantage",
+    "Hybrid Scheme - Conservative Hybrid Fund", "Debt Scheme - Short Duration Fund",
+    "Debt Scheme - Liquid Fund", "Debt Scheme - Gilt Fund", "Solution Oriented Scheme - Children's Fund",
+    "Other Scheme - Index Funds",
+)
+PLAN_VARIANTS = ("Regular Plan - Growth", "Direct Plan - Growth", "Regular Plan - IDCW", "Direct Plan - IDCW")
+SYNTHETIC_NOW = 1792195200.0 # 2026-10-17 00:00 UTC, the "today" synthetic data is dated relative to
+AMC_NAMES = (
+    "Aditya Birla Sun Life Mutual Fund", "HDFC Mutual Fund", "ICICI Prudential Mutual Fund",
+    "SBI Mutual Fund", "Nippon India Mutual Fund",
+)
+
+
+def make_fund_catalog(n_funds: int, seed: int = 0) -> pd.DataFrame:
+    """
+    A fund catalog shaped like load_fund_data() with `n_funds` rows. The first nine rows are
+    the real sample catalog, so recommendations for small sizes match the app's.
+    """
+    base = load_fund_data()
+    if n_funds <= len(base):
+        return base.head(n_funds).reset_index(drop=True)
+    rng = np.random.default_rng(seed)
+    n_new = n_funds - len(base)
+    goals = np.array(INVESTMENT_GOALS)
+    goal_counts = rng.integers(1, 4, n_new)
+    synthetic = pd.DataFrame({
+        'name': [f"SBI Synthetic Fund {i}" for i in range(n_new)],
+        'type': rng.choice(FUND_TYPES, n_new),
+        'risk_profile': rng.choice(RISK_PROFILES, n_new),
+        'min_duration_years': rng.choice([0.1, 1, 3, 5, 7], n_new),
+        'goal_suitability': [rng.choice(goals, k, replace=False).tolist() for k in goal_counts],
+        'description': "Synthetic benchmark fund.",
+    })
+    return pd.concat([base, synthetic], ignore_index=True)
+
+
+def make_client_profiles(n_clients: int, seed: int = 0) -> pd.DataFrame:
+    """Client profiles with the columns recommend_funds_batch reads, plus an investment amount."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'risk_profile': rng.choice(RISK_PROFILES, n_clients),
+        'duration_years': rng.integers(1, 31, n_clients),
+        'investment_goal': rng.choice(INVESTMENT_GOALS, n_clients),
+        'amount': rng.integers(10, 100_000, n_clients) * 1000,
+    })
+
+
+def write_navall(path: str, n_schemes: int, date: str = '17-Oct-2026', seed: int = 0) -> str:
+    """
+    Writes a NAVAll.txt-format file with `n_schemes` schemes spread over a few categories
+    and AMCs (about one in five under SBI Mutual Fund) in every plan and option variant,
+    with the odd "N.A." NAV.
+    """
+    rng = np.random.default_rng(seed)
+    navs = rng.uniform(10, 500, n_schemes)
+    missing = rng.random(n_schemes) < 0.01
+    per_section = max(1, n_schemes // (len(FUND_TYPES) * len(AMC_NAMES)))
+    code = 100000
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("Scheme Code;ISIN Div Payout/ ISIN Growth;ISIN Div Reinvestment;Scheme Name;Net Asset Value;Date\n\n")
+        written = 0
+        while written < n_schemes:
+            for fund_type in FUND_TYPES:
+                f.write(f"Open Ended Schemes({fund_type})\n\n")
+                for amc in AMC_NAMES:
+                    f.write(f"{amc}\n\n")
+                    for _ in range(min(per_section, n_schemes - written)):
+                        nav = "N.A." if missing[written] else f"{navs[written]:.4f}"
+                        f.write(f"{code};INF{code};-;{amc.replace(' Mutual Fund', '')} {fund_type} Fund {code} - {PLAN_VARIANTS[code % len(PLAN_VARIANTS)]};{nav};{date}\n")
+                        code += 1
+                        written += 1
+                    f.write("\n")
+    return path
+
+
+def write_scheme_master(path: str, n_schemes: int, seed: int = 0) -> str:
+    """
+    Writes an AMFI scheme master (SchemeData CSV) with `n_schemes` plans across AMCs and
+    categories, plus the optional expense ratio and AUM columns the fund store reads.
+    """
+    rng = np.random.default_rng(seed)
+    categories = rng.choice(SCHEME_CATEGORIES, n_schemes)
+    amcs = rng.choice(AMC_NAMES, n_schemes)
+    expense_ratios = rng.uniform(0.1, 2.5, n_schemes)
+    aums = rng.lognormal(6, 1.5, n_schemes)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['AMC', 'Code', 'Scheme Name', 'Scheme Type', 'Scheme Category', 'Scheme NAV Name',
+                         'Scheme Minimum Amount', 'Launch Date', ' Closure Date', 'ISIN Div Payout/ ISIN Growth',
+                         'Expense Ratio', 'AUM'])
+        for i in range(n_schemes):
+            code = 100000 + i
+            name = f"{amcs[i].replace(' Mutual Fund', '')} {categories[i].split(' - ')[-1]} {code}"
+            writer.writerow([amcs[i], code, name, 'Open Ended', categories[i], f"{name} - Regular Plan - Growth",
+                             '5000', '01-JAN-2015', '', f"INF{code}", f"{expense_ratios[i]:.2f}", f"{aums[i]:.1f}"])
+    return path
+
+
+NOTE_TOPICS = (
+    ("small cap", "Small-cap valuations remain stretched; we are adding selectively on corrections."),
+    ("mid cap", "Mid-cap earnings momentum is broadening beyond a few sectors."),
+    ("bluechip", "Large-cap leaders offer stability while the broader market consolidates."),
+    ("contra", "Contrarian positions in out-of-favour sectors are starting to pay off."),
+    ("equity hybrid", "The hybrid allocation keeps equity exposure near the upper band."),
+    ("balanced advantage", "Valuation signals moved the balanced advantage mix towards debt."),
+    ("liquid", "Liquid fund yields track the repo rate closely this month."),
+    ("debt", "We prefer the short end of the curve while rate cuts are priced in."),
+    ("tax saving", "ELSS flows pick up ahead of the financial year end."),
+)
+
+
+def write_manager_notes(directory: str, n_notes: int, seed: int = 0, years: int = 5) -> str:
+    """
+    Writes `n_notes` commentary documents dated over the `years` years before SYNTHETIC_NOW,
+    each on one or two of NOTE_TOPICS, in the headers-then-body format modules/manager_notes.py reads.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    for i in range(n_notes):
+        picks = rng.choice(len(NOTE_TOPICS), rng.integers(1, 3), replace=False)
+        published = time.strftime('%Y-%m-%d', time.gmtime(SYNTHETIC_NOW - rng.uniform(0, years * 365) * 86400))
+        title = f"Note {i}: {' and '.join(NOTE_TOPICS[p][0] for p in picks)} outlook"
+        body = ' '.join(NOTE_TOPICS[p][1] for p in picks) + " Portfolio positioning is reviewed every month."
+        with open(os.path.join(directory, f"note-{i:06d}.md"), 'w', encoding='utf-8') as f:
+            f.write(f"Title: {title}\nDate: {published}\n\n{body}\n")
+    return directory
@@ -0,0 +1,291 @@
+import bisect
+
+import numpy as np
+import pandas as pd
+
+from modules.analytics import TRADING_DAYS_PER_YEAR, forward_fill
+from modules.cache import cached, next_amfi_publish_time
+from modules.nav_history import NavHistoryStore, get_default_store
+from modules.recommender import normalize_fund_name
+
+# Splits an investment amount across the recommended funds. Every method works on a batch
+# of clients at once: weights are (clients x legs) arrays, with NaN weightage marking an
+# unused leg, so re-allocating the whole client book is a handful of NumPy passes.
+#   weightage      the recommender's own weightages, normalised
+#   risk_parity    every leg contributes the same share of portfolio variance
+#   mean_variance  maximises return - risk_aversion/2 * variance within per-leg bounds
+# The risk-based methods use annualised mean returns and covariance of daily log returns
+# from the NAV history store, cached until the next AMFI publish.
+ALLOCATION_METHODS = ('weightage', 'risk_parity', 'mean_variance')
+ROUNDING_UNIT = 100 # Every leg is a multiple of ₹100; any odd remainder goes to the largest leg
+COVARIANCE_LOOKBACK_DAYS = 3 * 365
+MIN_RETURN_OBSERVATIONS = 60 # Fewer daily returns than this and a fund has no usable statistics
+RISK_AVERSION = 4.0
+MIN_FUND_WEIGHT = 0.05 # Mean-variance keeps every recommended fund in the mix...
+MAX_FUND_WEIGHT = 0.60 # ...without letting one of them dominate it
+SOLVER_ITERATIONS = 500
+SOLVER_TOLERANCE = 1e-10
+MIN_CURVATURE = 1e-8 # Annual variance below which mean-variance treats a mix as riskless
+
+
+class AllocationError(ValueError):
+    """Raised when a risk-based allocation cannot be computed, e.g. for lack of NAV history."""
+
+
+def largest_remainder_round(weights: np.ndarray, amounts, unit: int = ROUNDING_UNIT) -> np.ndarray:
+    """
+    Rounds weights (clients x legs, rows summing to 1) times amounts to multiples of `unit`
+    so that every row adds up to its amount exactly: each leg gets the floor of its share,
+    and the units left over go one at a time to the legs with the largest remainders.
+    """
+    weights = np.nan_to_num(np.asarray(weights, dtype=np.float64))
+    amounts = np.asarray(amounts, dtype=np.int64)
+    units, residual = np.divmod(amounts, unit)
+    shares = weights * units[:, None]
+    legs = np.floor(shares).astype(np.int64)
+    remainders = shares - legs
+    left_over = units - legs.sum(axis=1)
+    # Stable sort so ties go to the earlier (higher priority) leg.
+    order = np.argsort(-remainders, axis=1, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(weights.shape[1])[None, :], axis=1)
+    legs += ranks < left_over[:, None]
+    legs *= unit
+    legs[np.arange(len(legs)), np.argmax(weights, axis=1)] += residual
+    legs[weights.sum(axis=1) <= 0] = 0 # No funds, nothing to allocate
+    return legs
+
+
+def _masked_covariance(covariance: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Zeroes unused legs out of a (clients x legs x legs) covariance, with a unit diagonal."""
+    covariance = np.where(mask[:, :, None] & mask[:, None, :], covariance, 0.0)
+    diagonal = np.einsum('pkk->pk', covariance)
+    diagonal[~mask] = 1.0
+    return covariance
+
+
+def risk_parity_weights(covariance: np.ndarray, mask: np.ndarray, iterations: int = SOLVER_ITERATIONS) -> np.ndarray:
+    """
+    Equal-risk-contribution weights for a batch of (legs x legs) covariance matrices.
+    Minimises x'Σx/2 - sum(b·log x) with b = 1/legs by cyclical coordinate descent, where each
+    coordinate step has a closed form; the normalised minimiser has equal risk contributions.
+    Only clients that have not converged yet are iterated.
+    """
+    covariance = _masked_covariance(covariance, mask)
+    budget = mask / np.maximum(mask.sum(axis=1, keepdims=True), 1)
+    diagonal = np.einsum('pkk->pk', covariance)
+    x = np.where(mask, 1 / np.sqrt(diagonal), 0.0)
+    active = np.arange(len(x))
+    for _ in range(iterations):
+        sigma, b, xa = covariance[active], budget[active], x[active]
+        previous = xa.copy()
+        for k in range(xa.shape[1]):
+            cross = np.einsum('pj,pj->p', sigma[:, k], xa) - sigma[:, k, k] * xa[:, k]
+            xa[:, k] = (-cross + np.sqrt(cross ** 2 + 4 * sigma[:, k, k] * b[:, k])) / (2 * sigma[:, k, k])
+        x[active] = xa
+        active = active[np.max(np.abs(xa - previous), axis=1) >= SOLVER_TOLERANCE]
+        if not len(active):
+            break
+    totals = x.sum(axis=1, keepdims=True)
+    return np.divide(x, totals, out=np.zeros_like(x), where=totals > 0)
+
+
+def _project_to_box_simplex(v: np.ndarray, lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+    """
+    Euclidean projection of each row onto {w : sum(w) = 1, lower <= w <= upper}.
+    sum(clip(v - t, lower, upper)) is piecewise linear and non-increasing in t, with kinks
+    at v - upper and v - lower, so the right t is interpolated inside the bracketing kinks.
+    """
+    kinks = np.sort(np.concatenate([v - upper, v - lower], axis=1), axis=1)
+    totals = np.clip(v[:, None, :] - kinks[:, :, None], lower[:, None, :], upper[:, None, :]).sum(axis=2)
+    rows = np.arange(len(v))
+    j = np.clip((totals >= 1).sum(axis=1) - 1, 0, kinks.shape[1] - 2)
+    t0, t1 = kinks[rows, j], kinks[rows, j + 1]
+    g0, g1 = totals[rows, j], totals[rows, j + 1]
+    step = np.divide(g0 - 1, g0 - g1, out=np.zeros_like(g0), where=g0 > g1)
+    t = t0 + step * (t1 - t0)
+    return np.clip(v - t[:, None], lower, upper)
+
+
+def mean_variance_weights(covariance: np.ndarray, expected_returns: np.ndarray, mask: np.ndarray,
+                          risk_aversion: float = RISK_AVERSION, min_weight: float = MIN_FUND_WEIGHT,
+                          max_weight: float = MAX_FUND_WEIGHT, iterations: int = SOLVER_ITERATIONS) -> np.ndarray:
+    """
+    Long-only mean-variance weights for a batch of clients: maximises μ'w - λ/2 w'Σw with
+    weights summing to 1 and each used leg between min_weight and max_weight (bounds are
+    widened where a client has too few legs for them to be feasible). Solved by accelerated
+    projected gradient ascent with adaptive restart, iterating only unconverged clients.
+    """
+    # Unused legs get a zero block rather than _masked_covariance's unit diagonal: their bounds
+    # pin them at 0 anyway, and a unit variance would set the step size for fund variances
+    # that are two orders of magnitude smaller.
+    covariance = np.where(mask[:, :, None] & mask[:, None, :], covariance, 0.0)
+    expected_returns = np.where(mask, expected_returns, 0.0)
+    n_legs = np.maximum(mask.sum(axis=1, keepdims=True), 1)
+    lower = np.where(mask, np.minimum(min_weight, 1 / n_legs), 0.0)
+    upper = np.where(mask, np.maximum(max_weight, 1 / n_legs), 0.0)
+    # 1/L step, with L the largest eigenvalue of the objective's Hessian over the used legs
+    # (floored so that riskless legs, where the objective is linear, get a large but exact step).
+    step = 1 / (risk_aversion * np.maximum(np.linalg.eigvalsh(covariance)[:, -1], MIN_CURVATURE))
+    w = _project_to_box_simplex(np.where(mask, 1 / n_legs, 0.0), lower, upper)
+    y = w.copy()
+    momentum = np.ones(len(w))
+    active = np.arange(len(w))
+    for _ in range(iterations):
+        ya = y[active]
+        gradient = expected_returns[active] - risk_aversion * np.einsum('pij,pj->pi', covariance[active], ya)
+        w_next = _project_to_box_simplex(ya + step[active, None] * gradient, lower[active], upper[active])
+        # A projected gradient step that does not move y means y is optimal. (Comparing
+        # successive iterates instead can stop early when momentum briefly lands on a vertex.)
+        done = np.max(np.abs(w_next - ya), axis=1) < SOLVER_TOLERANCE
+        # Adaptive restart: drop the momentum of clients it is carrying uphill.
+        momentum[active[np.einsum('pk,pk->p', ya - w_next, w_next - w[active]) > 0]] = 1.0
+        momentum_next = (1 + np.sqrt(1 + 4 * momentum[active] ** 2)) / 2
+        y[active] = w_next + ((momentum[active] - 1) / momentum_next)[:, None] * (w_next - w[active])
+        w[active], momentum[active] = w_next, momentum_next
+        active = active[~done]
+        if not len(active):
+            break
+    return w
+
+
+def _unique_rows(a: np.ndarray) -> tuple:
+    """np.unique(a, axis=0, return_inverse=True), several times faster via a byte-string view."""
+    a = np.ascontiguousarray(a)
+    keys = a.view(np.dtype((np.void, a.itemsize * a.shape[1]))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return a[first], inverse.ravel()
+
+
+def allocate_batch(weightages: np.ndarray, amounts, method: str = 'weightage', covariance: np.ndarray = None,
+                   expected_returns: np.ndarray = None, unit: int = ROUNDING_UNIT) -> tuple:
+    """
+    Allocates many clients at once.
+    `weightages` is (clients x legs) with NaN for unused legs; `covariance` (clients x legs x
+    legs) and `expected_returns` (clients x legs) are needed for the risk-based methods.
+    Returns (weights, leg_amounts, fallback): clients whose legs lack return statistics get
+    their weightage split instead and are flagged in `fallback`.
+    """
+    if method not in ALLOCATION_METHODS:
+        raise ValueError(f"Unknown allocation method {method!r}; expected one of {ALLOCATION_METHODS}.")
+    weightages = np.atleast_2d(np.asarray(weightages, dtype=np.float64))
+    mask = ~np.isnan(weightages)
+    totals = np.nansum(weightages, axis=1, keepdims=True)
+    weights = np.divide(np.nan_to_num(weightages), totals, out=np.zeros_like(weightages), where=totals > 0)
+    fallback = np.zeros(len(weights), dtype=bool)
+
+    if method != 'weightage':
+        if covariance is None or (method == 'mean_variance' and expected_returns is None):
+            raise AllocationError(f"The {method} method needs return statistics from NAV history.")
+        covariance = np.asarray(covariance, dtype=np.float64)
+        known = ~np.isnan(np.einsum('pkk->pk', covariance))
+        if expected_returns is not None:
+            expected_returns = np.asarray(expected_returns, dtype=np.float64)
+            known &= ~np.isnan(expected_returns)
+        solvable = (mask.any(axis=1) & (known | ~mask).all(axis=1))
+        fallback = ~solvable & mask.any(axis=1)
+        if solvable.any():
+            rows = np.flatnonzero(solvable)
+            # Weights depend only on a client's legs and their statistics, and most clients
+            # share a fund set with many others, so each distinct problem is solved once.
+            problems = [mask[rows], np.nan_to_num(covariance[rows]).reshape(len(rows), -1)]
+            if expected_returns is not None:
+                problems.append(np.nan_to_num(expected_returns[rows]))
+            problems, inverse = _unique_rows(np.concatenate(problems, axis=1))
+            n_legs = mask.shape[1]
+            problem_mask = problems[:, :n_legs].astype(bool)
+            problem_covariance = problems[:, n_legs:n_legs + n_legs * n_legs].reshape(-1, n_legs, n_legs)
+            if method == 'risk_parity':
+                solved = risk_parity_weights(problem_covariance, problem_mask)
+            else:
+                solved = mean_variance_weights(problem_covariance, problems[:, n_legs + n_legs * n_legs:], problem_mask)
+            weights[rows] = solved[inverse]
+
+    return weights, largest_remainder_round(weights, amounts, unit), fallback
+
+
+def _plan_rank(normalized_name: str) -> tuple:
+    """Sort key preferring the Regular Growth plan of a scheme, then the shortest name."""
+    words = set(normalized_name.split())
+    return (
+        'direct' in words,
+        bool(words & {'idcw', 'dividend', 'bonus', 'payout', 'reinvestment'}),
+        'growth' not in words,
+        len(normalized_name),
+    )
+
+
+def resolve_scheme_codes(fund_names, store: NavHistoryStore = None) -> np.ndarray:
+    """
+    Maps catalog fund names (e.g. "SBI Bluechip Fund") to AMFI scheme codes using the
+    scheme names recorded at NAV ingest, preferring the Regular Growth plan when a fund has
+    several. Returns an int64 array with -1 for funds that could not be matched.
+    """
+    store = store if store is not None else get_default_store()
+    index = sorted((normalize_fund_name(name), code) for code, name in store.scheme_names().items())
+    keys = [name for name, _ in index]
+    codes = np.full(len(fund_names), -1, dtype=np.int64)
+    for i, fund_name in enumerate(fund_names):
+        prefix = normalize_fund_name(fund_name)
+        lo = bisect.bisect_left(keys, prefix)
+        hi = bisect.bisect_left(keys, prefix + '\x7f')
+        candidates = [(name, code) for name, code in index[lo:hi] if name == prefix or name.startswith(prefix + ' ')]
+        if candidates:
+            codes[i] = min(candidates, key=lambda candidate: _plan_rank(candidate[0]))[1]
+    return codes
+
+
+@cached('covariance', expires_at=next_amfi_publish_time, maxsize=32)
+def _return_statistics(store: NavHistoryStore, last_date: int, scheme_codes: tuple, lookback_days: int) -> tuple:
+    # last_date is part of the cache key, so an ingest of a new NAV day is a cache miss.
+    wanted = np.unique(np.array([c for c in scheme_codes if c >= 0], dtype=np.int32))
+    n = len(scheme_codes)
+    expected_returns, covariance = np.full(n, np.nan), np.full((n, n), np.nan)
+    if last_date is None or not len(wanted):
+        return expected_returns, covariance
+
+    dates, codes, navs = store.get_schemes(wanted, np.datetime64(last_date - lookback_days, 'D'), np.datetime64(last_date, 'D'))
+    days, rows = np.unique(dates, return_inverse=True)
+    matrix = np.full((len(days), len(wanted)), np.nan)
+    matrix[rows, np.searchsorted(wanted, codes)] = navs
+    log_returns = np.diff(np.log(forward_fill(matrix)), axis=0)
+
+    # Pairwise-complete statistics, so a young fund does not shorten everyone's window.
+    returns = pd.DataFrame(log_returns)
+    mean = returns.mean().where(returns.count() >= MIN_RETURN_OBSERVATIONS).to_numpy() * TRADING_DAYS_PER_YEAR
+    cov = returns.cov(min_periods=MIN_RETURN_OBSERVATIONS).to_numpy() * TRADING_DAYS_PER_YEAR
+    usable = ~np.isnan(mean) & ~np.isnan(cov).any(axis=1)
+    if usable.any():
+        # Pairwise estimates need not be positive semi-definite; clip negative eigenvalues.
+        block = cov[np.ix_(usable, usable)]
+        values, vectors = np.linalg.eigh(block)
+        cov[np.ix_(usable, usable)] = (vectors * np.clip(values, 1e-12, None)) @ vectors.T
+    mean[~usable] = np.nan
+    cov[~usable] = np.nan
+    cov[:, ~usable] = np.nan
+
+    positions = np.searchsorted(wanted, np.array(scheme_codes, dtype=np.int64).clip(min=0))
+    present = np.array(scheme_codes) >= 0
+    idx = np.flatnonzero(present)
+    expected_returns[idx] = mean[positions[idx]]
+    covariance[np.ix_(idx, idx)] = cov[np.ix_(positions[idx], positions[idx])]
+    return expected_returns, covariance
+
+
+def return_statistics(scheme_codes, store: NavHistoryStore = None,
+                      lookback_days: int = COVARIANCE_LOOKBACK_DAYS) -> tuple:
+    """
+    Annualised mean log returns and covariance of daily log returns for `scheme_codes` over
+    the trailing `lookback_days`. Returns (expected_returns, covariance) aligned to the codes,
+    with NaN for codes of -1 or without enough history. Cached per store state.
+    """
+    store = store if store is not None else get_default_store()
+    codes = tuple(int(c) for c in scheme_codes)
+    return _return_statistics(store, store.last_date(), codes, lookback_days)
+
+
+def fund_return_statistics(fund_names, store: NavHistoryStore = None,
+                           lookback_days: int = COVARIANCE_LOOKBACK_DAYS) -> tuple:
+    """return_statistics for catalog fund names, resolved to scheme codes via resolve_scheme_codes."""
+    store = store if store is not None else get_default_store()
+    return return_statistics(resolve_scheme_codes(list(fund_names), store), store, lookback_days)
@@ -1,47 +1,193 @@
-import pandas as pd
-import requests
-import streamlit as st # For accessing secrets
+import os
+import threading
+from datetime import datetime
+from functools import lru_cache
 
-def get_latest_navs_for_sbi():
+# pandas, requests and streamlit are imported inside the functions that use them: importing
+# this module (as every app session and the batch tools do) stays cheap, and a local NAV file
+# never loads the HTTP stack at all.
+# AMFI publishes the NAVs of every scheme in a single semicolon-delimited text file.
+AMFI_NAV_URL = "https://www.amfiindia.com/spages/NAVAll.txt"
+SBI_AMC_NAME = "SBI Mutual Fund"
+NAV_COLUMNS = ['Scheme Code', 'Scheme Name', 'Category', 'NAV', 'Date']
+REQUEST_TIMEOUT_SECONDS = 30
+
+# One pooled session for every AMFI request, so keep-alive connections are reused across reruns.
+_session = None
+_session_lock = threading.Lock()
+
+# Last parsed result per source, with the validators needed for the next conditional request.
+_nav_cache = {}
+_nav_cache_lock = threading.Lock()
+
+
+def get_session():
+    """Returns the shared requests.Session used for AMFI downloads."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            _session = requests.Session()
+            _session.headers.update({'User-Agent': 'FundGenius/1.0'})
+        return _session
+
+
+def get_nav_source() -> str:
     """
-    Fetches the latest NAVs for SBI Mutual Fund schemes from AMFI or a reliable API.
-    This is a placeholder for actual API integration.
+    Returns where to read NAVAll.txt from: the AMFI_NAV_URL secret or environment variable,
+    falling back to the public AMFI URL. A local file path or file:// URL works too,
+    which is handy for running offline against a fixture.
     """
-    # Placeholder for a real API endpoint for AMFI NAVs
-    # A common approach is to parse data from AMFI India website or use a third-party API that scrapes it.
-    # For a real-time, robust solution, consider paid APIs like RapidAPI's mutual fund NAVs.
-    # Example AMFI Daily NAV URL (might change): "https://www.amfiindia.com/spages/NAVAll.txt"
-
-    # Using a hypothetical API endpoint for illustration
-    # In a real scenario, you'd use st.secrets for the URL
-    # nav_api_url = st.secrets.get("AMFI_NAV_API_URL", "https://api.example.com/amfi/sbi_navs")
-    # For demonstration, let's simulate fetching
     try:
-        # For demonstration, returning dummy data
-        data = {
-            'Scheme Name': [
-                "SBI Bluechip Fund - Regular Plan - Growth",
-                "SBI Equity Hybrid Fund - Regular Plan - Growth",
-                "SBI Small Cap Fund - Regular Plan - Growth",
-                "SBI Long Term Equity Fund - Regular Plan - Growth",
-                "SBI Balanced Advantage Fund - Regular Plan - Growth"
-            ],
-            'NAV': [
-                75.50, 250.25, 160.80, 300.10, 155.75
-            ],
-            'Date': [
-                pd.to_datetime('today').strftime('%Y-%m-%d')] * 5
+        import streamlit as st # For accessing secrets
+        source = st.secrets.get("AMFI_NAV_URL")
+    except Exception: # No secrets file configured
+        source = None
+    return source or os.environ.get("AMFI_NAV_URL", AMFI_NAV_URL)
+
+
+def iter_navall_records(lines, amc_name: str = SBI_AMC_NAME):
+    """
+    Streams scheme records out of NAVAll.txt lines, one line at a time.
+    The file is a sequence of sections: a category header such as
+    "Open Ended Schemes(Equity Scheme - Large Cap Fund)", then an AMC name line, then
+    "Scheme Code;ISIN Div Payout/ ISIN Growth;ISIN Div Reinvestment;Scheme Name;Net Asset Value;Date"
+    rows for that AMC. Only rows under `amc_name` are split and yielded (pass None for all AMCs).
+    """
+    category = None
+    current_amc = None
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        line = line.strip()
+        if not line:
+            continue
+        if ';' not in line:
+            # Section headers: either a scheme category or the name of the AMC that follows.
+            if line.endswith(')') and 'Schemes' in line:
+                category = line[line.index('(') + 1:-1] if '(' in line else line
+            else:
+                current_amc = line
+            continue
+        if amc_name is not None and current_amc != amc_name:
+            continue
+        fields = line.split(';')
+        if len(fields) < 6 or not fields[0].strip().isdigit():
+            continue # Column header row or a malformed line
+        yield {
+            'Scheme Code': int(fields[0]),
+            'Scheme Name': fields[3].strip(),
+            'Category': category,
+            'NAV': _parse_nav(fields[4]),
+            'Date': _parse_date(fields[5])
         }
-        df = pd.DataFrame(data)
-        return df
-        # Example of how you *would* fetch from a real API:
-        # response = requests.get(nav_api_url)
-        # response.raise_for_status() # Raise an exception for HTTP errors
-        # nav_data = response.json() # Assuming JSON response
-        # Process nav_data into a pandas DataFrame, filter for SBI funds
-        # return pd.DataFrame(nav_data)
-
-    except requests.exceptions.RequestException as e:
+
+
+def _parse_nav(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError: # AMFI uses "N.A." for schemes without a NAV today
+        return float('nan')
+
+
+@lru_cache(maxsize=64) # Every row of a daily file carries one of a handful of dates
+def _parse_date(value: str) -> str:
+    try:
+        return datetime.strptime(value.strip(), '%d-%b-%Y').strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def _records_to_frame(records):
+    import pandas as pd
+    return pd.DataFrame(list(records), columns=NAV_COLUMNS)
+
+
+def _local_path(source: str):
+    if source.startswith('file://'):
+        return source[len('file://'):]
+    if '://' not in source:
+        return source
+    return None
+
+
+def fetch_navs(source: str = None, amc_name: str = SBI_AMC_NAME, session=None):
+    """
+    Returns the NAVs of one AMC's schemes from NAVAll.txt at `source`.
+    HTTP sources are fetched over the pooled session with If-None-Match / If-Modified-Since,
+    and a 304 reuses the previously parsed frame without touching the body (a 304 with no
+    frame to reuse is retried once unconditionally, bypassing caches on the way). Local files
+    are re-parsed only when their size or modification time changes. Either way the body is
+    streamed and filtered line by line, never held in memory as a whole.
+    """
+    source = source or get_nav_source()
+    key = (source, amc_name)
+    with _nav_cache_lock:
+        cached = _nav_cache.get(key)
+
+    path = _local_path(source)
+    if path is not None:
+        stat = os.stat(path)
+        validator = (stat.st_size, stat.st_mtime_ns)
+        if cached is not None and cached['validator'] == validator:
+            return cached['navs'].copy()
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            navs = _records_to_frame(iter_navall_records(f, amc_name))
+        entry = {'validator': validator, 'navs': navs}
+    else:
+        headers = {}
+        if cached is not None:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+        session = session or get_session()
+        response = session.get(source, headers=headers, stream=True, timeout=REQUEST_TIMEOUT_SECONDS)
+        if response.status_code == 304 and cached is None:
+            response.close()
+            response = session.get(source, headers={'Cache-Control': 'no-cache'}, stream=True,
+                                   timeout=REQUEST_TIMEOUT_SECONDS)
+        with response:
+            if response.status_code == 304:
+                if cached is not None:
+                    return cached['navs'].copy()
+                import requests
+                raise requests.HTTPError(f"304 Not Modified from {source} with no NAVs to reuse", response=response)
+            response.raise_for_status()
+            navs = _records_to_frame(iter_navall_records(response.iter_lines(chunk_size=64 * 1024), amc_name))
+            entry = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'navs': navs
+            }
+
+    with _nav_cache_lock:
+        _nav_cache[key] = entry
+    return navs.copy()
+
+
+def get_cached_navs(source: str = None, amc_name: str = SBI_AMC_NAME):
+    """Returns the last successfully parsed NAVs for `source`, or None if there are none yet."""
+    with _nav_cache_lock:
+        cached = _nav_cache.get((source or get_nav_source(), amc_name))
+    return cached['navs'].copy() if cached is not None else None
+
+
+def get_latest_navs_for_sbi(source: str = None):
+    """
+    Fetches the latest NAVs for SBI Mutual Fund schemes from AMFI's NAVAll.txt.
+    Unchanged files are not downloaded or parsed again; if AMFI cannot be reached, the last
+    successfully parsed NAVs are shown instead.
+    """
+    import pandas as pd
+    import streamlit as st
+    try:
+        return fetch_navs(source)
+    except OSError as e: # Includes every requests.exceptions.RequestException
+        stale = get_cached_navs(source)
+        if stale is not None:
+            st.warning(f"Could not refresh NAV data ({e}); showing the last fetched NAVs.")
+            return stale
         st.error(f"Failed to fetch NAV data: {e}. Check API URL and internet connection.")
         return pd.DataFrame()
     except Exception as e:
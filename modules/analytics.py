@@ -0,0 +1,351 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from modules.nav_history import from_day_numbers, get_default_store, to_day_number
+
+# Return and risk analytics for every scheme at once, computed on a 2-D date x scheme
+# NAV matrix built from the NAV history store. A full recompute is batched NumPy over the
+# whole matrix; RiskReturnAccumulator then keeps the same metrics up to date one NAV day
+# at a time without touching the full history again. Either can be limited to a set of
+# schemes, e.g. the funds a recommendation ranks, whose rows are looked up per day rather
+# than scanned. get_metric_scores serves recommendation ranking from such accumulators.
+TRADING_DAYS_PER_YEAR = 252
+DAYS_PER_YEAR = 365.25
+CAGR_HORIZONS_YEARS = (1, 3, 5)
+RISK_FREE_RATE = 0.065 # Annual, roughly the 91-day T-bill yield
+ROW_CHUNK = 64 # Rows of the NAV matrix processed per vectorized step
+METRIC_COLUMNS = (
+    [f'cagr_{h}y' for h in CAGR_HORIZONS_YEARS]
+    + [f'rolling_cagr_{h}y' for h in CAGR_HORIZONS_YEARS]
+    + ['volatility', 'max_drawdown', 'sharpe', 'sortino', 'observations']
+)
+
+
+def _stored_rows(store, start, end, scheme_codes) -> tuple:
+    if scheme_codes is None:
+        return store.get_range(start, end)
+    return store.get_schemes(scheme_codes, start, end)
+
+
+def build_nav_matrix(store=None, start=None, end=None, scheme_codes=None) -> tuple:
+    """
+    Pivots the stored NAVs over [start, end], of `scheme_codes` only if given, into a dense matrix.
+    Returns (days, scheme_codes, navs): int32 day numbers for the rows, sorted scheme codes
+    for the columns, and a float64 (days x schemes) matrix with NaN where a scheme has no NAV.
+    """
+    store = store if store is not None else get_default_store()
+    dates, codes, values = _stored_rows(store, start, end, scheme_codes)
+    if not len(dates):
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32), np.empty((0, 0))
+
+    # Rows are sorted by day, so each day is one contiguous block of sorted scheme codes.
+    # Most days carry the same set of schemes as the day before, which makes the pivot a
+    # row copy per day rather than a scatter of every cell.
+    starts = np.concatenate(([0], np.flatnonzero(dates[1:] != dates[:-1]) + 1))
+    stops = np.append(starts[1:], len(dates))
+    days = np.asarray(dates[starts], dtype=np.int32)
+
+    distinct_blocks = []
+    previous = None
+    for start, stop in zip(starts, stops):
+        block = codes[start:stop]
+        if previous is None or not np.array_equal(block, previous):
+            distinct_blocks.append(np.asarray(block))
+        previous = block
+    scheme_codes = np.unique(np.concatenate(distinct_blocks)).astype(np.int32)
+
+    navs = np.full((len(days), len(scheme_codes)), np.nan)
+    block_index = 0
+    previous = None
+    for row, (start, stop) in enumerate(zip(starts, stops)):
+        block = codes[start:stop]
+        if previous is None or not np.array_equal(block, previous):
+            block = distinct_blocks[block_index]
+            block_index += 1
+            slots = None if len(block) == len(scheme_codes) else np.searchsorted(scheme_codes, block)
+        if slots is None:
+            navs[row] = values[start:stop]
+        else:
+            navs[row, slots] = values[start:stop]
+        previous = block
+    return days, scheme_codes, navs
+
+
+def forward_fill(navs: np.ndarray) -> np.ndarray:
+    """Carries each scheme's last seen NAV down the rows; leading gaps stay NaN."""
+    filled = navs.copy()
+    for i in range(1, len(filled)):
+        row = filled[i]
+        gaps = np.isnan(row)
+        row[gaps] = filled[i - 1][gaps]
+    return filled
+
+
+def _anchor_rows(days: np.ndarray, years: float) -> np.ndarray:
+    """For each row, the last row at least `years` earlier, or -1 if history is too short."""
+    targets = days.astype(np.int64) - int(round(years * DAYS_PER_YEAR))
+    return np.searchsorted(days, targets, side='right') - 1
+
+
+def rolling_cagr(days: np.ndarray, navs: np.ndarray, years: float) -> np.ndarray:
+    """Trailing `years` CAGR for every (day, scheme) cell; NaN where the window is not covered."""
+    filled = forward_fill(navs)
+    anchors = _anchor_rows(days, years)
+    result = np.full(navs.shape, np.nan)
+    covered = np.flatnonzero(anchors >= 0)
+    if len(covered):
+        result[covered] = np.expm1(np.log(filled[covered] / filled[anchors[covered]]) / years)
+    return result
+
+
+def _metrics_frame(scheme_codes, state: dict) -> pd.DataFrame:
+    """Turns accumulator state arrays into the per-scheme metrics table."""
+    n = state['n_returns']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = state['sum_returns'] / n
+        variance = (state['sum_sq_returns'] - n * mean ** 2) / (n - 1)
+        volatility = np.sqrt(np.maximum(variance, 0) * TRADING_DAYS_PER_YEAR)
+        downside = np.sqrt(state['sum_sq_downside'] / n * TRADING_DAYS_PER_YEAR)
+        excess = mean * TRADING_DAYS_PER_YEAR - RISK_FREE_RATE
+        metrics = {}
+        for h in CAGR_HORIZONS_YEARS:
+            metrics[f'cagr_{h}y'] = state[f'cagr_{h}y']
+        for h in CAGR_HORIZONS_YEARS:
+            # Geometric average of the trailing CAGRs over every day with a full window.
+            metrics[f'rolling_cagr_{h}y'] = np.expm1(state[f'rolling_sum_{h}y'] / state[f'rolling_count_{h}y'] / h)
+        metrics['volatility'] = np.where(n > 1, volatility, np.nan)
+        metrics['max_drawdown'] = np.where(np.isnan(state['peak']), np.nan, state['max_drawdown'])
+        metrics['sharpe'] = np.where(n > 1, excess / volatility, np.nan)
+        metrics['sortino'] = np.where(n > 0, excess / downside, np.nan)
+    metrics['observations'] = state['n_navs']
+    frame = pd.DataFrame(metrics, index=pd.Index(scheme_codes, name='Scheme Code'))
+    return frame.replace([np.inf, -np.inf], np.nan)
+
+
+class RiskReturnAccumulator:
+    """
+    Running per-scheme accumulators for returns and risk metrics.
+    Daily log-return sums, squared sums and downside squares give volatility, Sharpe and
+    Sortino; a running peak gives max drawdown; for each CAGR horizon the accumulator keeps
+    the forward-filled NAVs as of the anchor day, advanced from the history store as days
+    arrive. update() costs O(schemes), independent of how much history is stored.
+    With `scheme_codes`, only those schemes are tracked.
+    """
+
+    def __init__(self, store=None, scheme_codes=None):
+        self.store = store if store is not None else get_default_store()
+        self.only = None if scheme_codes is None else np.unique(np.asarray(scheme_codes, dtype=np.int32))
+        self.scheme_codes = np.empty(0, dtype=np.int32)
+        self.last_day = None
+        self.anchor_day = {h: None for h in CAGR_HORIZONS_YEARS}
+        self.state = self._empty_state(0)
+
+    @staticmethod
+    def _empty_state(n_schemes: int) -> dict:
+        nan = lambda: np.full(n_schemes, np.nan)
+        zero = lambda: np.zeros(n_schemes)
+        state = {
+            'last_nav': nan(), 'peak': nan(), 'max_drawdown': zero(),
+            'n_navs': np.zeros(n_schemes, dtype=np.int64), 'n_returns': zero(),
+            'sum_returns': zero(), 'sum_sq_returns': zero(), 'sum_sq_downside': zero(),
+        }
+        for h in CAGR_HORIZONS_YEARS:
+            state[f'anchor_nav_{h}y'] = nan()
+            state[f'cagr_{h}y'] = nan()
+            state[f'rolling_sum_{h}y'] = zero()
+            state[f'rolling_count_{h}y'] = zero()
+        return state
+
+    @classmethod
+    def from_history(cls, store=None, start=None, end=None, scheme_codes=None):
+        """Full, vectorized recompute over the stored history; returns a ready accumulator."""
+        accumulator = cls(store, scheme_codes)
+        days, scheme_codes, navs = build_nav_matrix(accumulator.store, start, end, accumulator.only)
+        accumulator._load_matrix(days, scheme_codes, navs)
+        return accumulator
+
+    def _load_matrix(self, days, scheme_codes, navs):
+        """
+        Builds the accumulator state from a full NAV matrix in one pass over its rows.
+        The matrix is consumed: it is overwritten in place with forward-filled log NAVs, so
+        no second matrix-sized array is allocated. Each row is folded in with whole-row
+        vector ops, the same arithmetic update() applies to a new day.
+        """
+        self.scheme_codes = scheme_codes
+        state = self._empty_state(len(scheme_codes))
+        if not len(days):
+            self.state = state
+            return
+        log_navs = np.log(navs, out=navs)
+        anchors = {h: _anchor_rows(days, h) for h in CAGR_HORIZONS_YEARS}
+
+        previous = log_navs[0]
+        first_log = previous.copy()
+        log_peak = previous.copy()
+        min_log_drawdown = np.zeros(len(scheme_codes))
+        n_navs = (~np.isnan(previous)).astype(np.int64)
+        sum_sq = state['sum_sq_returns']
+        sum_sq_down = state['sum_sq_downside']
+        returns = np.empty(len(scheme_codes))
+        for i in range(1, len(days)):
+            row = log_navs[i]
+            gaps = np.isnan(row)
+            # Daily log return against the last seen NAV; a gap or a scheme's first NAV has none.
+            np.subtract(row, previous, out=returns)
+            returns[np.isnan(returns)] = 0.0
+            row[gaps] = previous[gaps]
+            sum_sq += returns * returns
+            np.minimum(returns, 0.0, out=returns)
+            sum_sq_down += returns * returns
+            n_navs += ~gaps
+            np.copyto(first_log, row, where=np.isnan(first_log))
+            np.fmax(log_peak, row, out=log_peak)
+            np.fmin(min_log_drawdown, row - log_peak, out=min_log_drawdown)
+            for h in CAGR_HORIZONS_YEARS:
+                anchor = anchors[h][i]
+                if anchor >= 0:
+                    self._add_rolling(state, h, row - log_navs[anchor])
+            previous = row
+
+        # Log returns telescope and every NAV after a scheme's first adds one return.
+        state['n_navs'] = n_navs
+        state['n_returns'] = np.maximum(n_navs - 1, 0).astype(np.float64)
+        state['sum_returns'] = np.where(n_navs > 0, previous - first_log, 0.0)
+        state['peak'] = np.exp(log_peak)
+        state['max_drawdown'] = np.expm1(min_log_drawdown)
+        state['last_nav'] = np.exp(previous)
+        for h in CAGR_HORIZONS_YEARS:
+            anchor = anchors[h][-1]
+            if anchor < 0:
+                continue
+            self.anchor_day[h] = int(days[anchor])
+            state[f'anchor_nav_{h}y'] = np.exp(log_navs[anchor])
+            state[f'cagr_{h}y'] = np.expm1((previous - log_navs[anchor]) / h)
+        self.state = state
+        self.last_day = int(days[-1])
+
+    @staticmethod
+    def _add_rolling(state: dict, years: int, log_growth: np.ndarray):
+        """Adds one day's trailing log growth to the horizon's rolling sums, skipping NaNs."""
+        valid = ~np.isnan(log_growth)
+        state[f'rolling_sum_{years}y'] += np.where(valid, log_growth, 0.0)
+        state[f'rolling_count_{years}y'] += valid
+
+    def _ensure_schemes(self, codes: np.ndarray):
+        """Adds state slots for schemes seen for the first time."""
+        new_codes = np.setdiff1d(codes, self.scheme_codes)
+        if not len(new_codes):
+            return
+        positions = np.searchsorted(self.scheme_codes, new_codes)
+        blank = self._empty_state(len(new_codes))
+        self.state = {key: np.insert(values, positions, blank[key]) for key, values in self.state.items()}
+        self.scheme_codes = np.insert(self.scheme_codes, positions, new_codes)
+
+    def _advance_anchor(self, years: int, day: int):
+        """Moves the horizon's anchor forward to the last stored day on or before `day - years`."""
+        target = day - int(round(years * DAYS_PER_YEAR))
+        previous = self.anchor_day[years]
+        if previous is not None and target <= previous:
+            return
+        start = None if previous is None else from_day_numbers([previous + 1])[0]
+        dates, codes, values = _stored_rows(self.store, start, from_day_numbers([target])[0], self.only)
+        if not len(dates):
+            return
+        self._ensure_schemes(np.unique(codes))
+        # Rows are in day order, so assigning them in sequence leaves the latest NAV per scheme.
+        self.state[f'anchor_nav_{years}y'][np.searchsorted(self.scheme_codes, codes)] = values
+        self.anchor_day[years] = int(dates[-1])
+
+    def update(self, date, scheme_codes, navs):
+        """
+        Folds one new NAV day into the running metrics.
+        `date` must be after the last processed day and already appended to the store.
+        """
+        day = to_day_number(date)
+        if self.last_day is not None and day <= self.last_day:
+            return
+        codes = np.asarray(scheme_codes, dtype=np.int32)
+        values = np.asarray(navs, dtype=np.float64)
+        keep = ~np.isnan(values)
+        if self.only is not None:
+            keep &= np.isin(codes, self.only)
+        codes, values = codes[keep], values[keep]
+        self._ensure_schemes(codes)
+        slots = np.searchsorted(self.scheme_codes, codes)
+        state = self.state
+
+        previous = state['last_nav'][slots]
+        has_previous = ~np.isnan(previous)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.where(has_previous, np.log(values / previous), 0.0)
+        state['n_returns'][slots] += has_previous
+        state['sum_returns'][slots] += returns
+        state['sum_sq_returns'][slots] += returns ** 2
+        state['sum_sq_downside'][slots] += np.minimum(returns, 0.0) ** 2
+
+        peak = np.fmax(state['peak'][slots], values)
+        state['peak'][slots] = peak
+        state['max_drawdown'][slots] = np.minimum(state['max_drawdown'][slots], values / peak - 1)
+        state['last_nav'][slots] = values
+        state['n_navs'][slots] += 1
+
+        for h in CAGR_HORIZONS_YEARS:
+            self._advance_anchor(h, day)
+            if self.anchor_day[h] is None:
+                continue
+            with np.errstate(divide='ignore', invalid='ignore'):
+                log_growth = np.log(state['last_nav'] / state[f'anchor_nav_{h}y'])
+            state[f'cagr_{h}y'] = np.expm1(log_growth / h)
+            self._add_rolling(state, h, log_growth)
+        self.last_day = day
+
+    def metrics(self) -> pd.DataFrame:
+        """Per-scheme metrics table indexed by scheme code (columns: METRIC_COLUMNS)."""
+        return _metrics_frame(self.scheme_codes, self.state)[list(METRIC_COLUMNS)]
+
+
+def compute_metrics(store=None, start=None, end=None, scheme_codes=None) -> pd.DataFrame:
+    """Full recompute of every scheme's (or only `scheme_codes`') metrics over the stored history."""
+    return RiskReturnAccumulator.from_history(store, start, end, scheme_codes).metrics()
+
+
+def metric_scores(metrics: pd.DataFrame, scheme_codes, metric: str = 'sharpe') -> np.ndarray:
+    """
+    Aligns one metric to a list of scheme codes for use as a recommendation score;
+    schemes without the metric get NaN and rank last.
+    """
+    return metrics[metric].reindex(pd.Index(scheme_codes)).to_numpy(dtype=np.float64)
+
+
+_accumulators = {} # (store root, scheme codes) -> (rows folded in, accumulator, metrics frame)
+_accumulators_lock = threading.Lock()
+
+
+def get_metric_scores(scheme_codes, metric: str = 'sharpe', store=None) -> np.ndarray:
+    """
+    metric_scores for `scheme_codes` from the stored history, from a process-wide accumulator
+    per set of codes: computed in full on first use, then brought up to date one NAV day at
+    a time as days are appended. A merge into the last day (schemes published late) changes
+    stored rows without adding a day, and is recomputed in full.
+    """
+    store = store if store is not None else get_default_store()
+    codes = tuple(sorted({int(code) for code in scheme_codes if code >= 0}))
+    key = (os.path.abspath(store.root), codes)
+    with _accumulators_lock:
+        rows = len(store)
+        folded, accumulator, metrics = _accumulators.get(key, (None, None, None))
+        if folded != rows:
+            last_day = store.last_date()
+            if accumulator is None or accumulator.last_day is None or last_day is None or last_day <= accumulator.last_day:
+                accumulator = RiskReturnAccumulator.from_history(store, scheme_codes=codes)
+            else:
+                dates, day_codes, navs = store.get_schemes(codes, from_day_numbers([accumulator.last_day + 1])[0])
+                for day in np.unique(dates):
+                    rows_of_day = dates == day
+                    accumulator.update(from_day_numbers([day])[0], day_codes[rows_of_day], navs[rows_of_day])
+            metrics = accumulator.metrics()
+            _accumulators[key] = (rows, accumulator, metrics)
+    return metric_scores(metrics, scheme_codes, metric)
@@ -0,0 +1,287 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from modules.allocation import ALLOCATION_METHODS, allocate_batch, fund_return_statistics
+from modules.recommender import (INVESTMENT_GOALS, OTHER_PICKS, PRIORITY_PICKS, RISK_PROFILES, get_fund_catalog,
+                                 rank_store, recommend_from_store, recommend_funds_batch)
+
+# Headless recommendation runs over a whole client book, e.g. the quarterly re-suitability
+# review. Client profiles are read from CSV or Parquet in chunks of `chunk_rows`; each chunk
+# is recommended and allocated by a worker process, which returns it already formatted as
+# CSV, and the parent writes chunks strictly in input order, so the output is identical
+# however many workers run. At most two chunks per worker are in flight, which bounds memory
+# whatever the size of the book.
+# After every chunk written, a checkpoint next to the output records how far the run got;
+# a rerun of the same job truncates the output to that point and carries on from there, or
+# starts over if the output has since been deleted, moved or cut short.
+#   python -m modules.batch_review clients.csv --out review.csv --method risk_parity
+# Funds come from the FundStore when FUND_DB_PATH is configured, as in the app.
+CHUNK_ROWS = 20_000
+CHUNKS_PER_WORKER = 2
+PROGRESS_INTERVAL_SECONDS = 5
+CHECKPOINT_SUFFIX = '.checkpoint.json'
+LEGS = PRIORITY_PICKS + OTHER_PICKS
+
+# Input columns, each with the names it is accepted under.
+PROFILE_COLUMNS = {
+    'client_id': ('client_id', 'id'),
+    'age': ('age',),
+    'risk_profile': ('risk_profile', 'risk'),
+    'investment_goal': ('investment_goal', 'goal'),
+    'duration_years': ('duration_years', 'duration'),
+    'amount': ('amount', 'investment_amount'),
+}
+REQUIRED_COLUMNS = ('risk_profile', 'investment_goal', 'duration_years', 'amount')
+
+OUTPUT_COLUMNS = (['client_id', 'age', 'risk_profile', 'investment_goal', 'duration_years', 'amount',
+                   'recommended_category', 'allocation_method'] +
+                  [f'{field}_{leg}' for leg in range(1, LEGS + 1) for field in ('fund', 'amount', 'percentage')] +
+                  ['error'])
+
+
+def _column_map(columns) -> dict:
+    """Maps each known input column to its name in `columns`; raises on missing required ones."""
+    lowered = {str(column).strip().lower(): column for column in columns}
+    found = {}
+    for name, aliases in PROFILE_COLUMNS.items():
+        for alias in aliases:
+            if alias in lowered:
+                found[name] = lowered[alias]
+                break
+    missing = [name for name in REQUIRED_COLUMNS if name not in found]
+    if missing:
+        raise ValueError(f"Client file has no {', '.join(missing)} column (found: {', '.join(map(str, columns))}).")
+    return found
+
+
+def read_profiles(path: str, chunk_rows: int = CHUNK_ROWS):
+    """Yields the client file as DataFrames of at most `chunk_rows` rows, in file order."""
+    if path.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq # Optional: only needed for Parquet input
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows, skipinitialspace=True)
+
+
+def count_profiles(path: str):
+    """Number of clients in a Parquet file (from its footer), or None for CSV."""
+    if path.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    return None
+
+
+def _validate(profiles: pd.DataFrame) -> pd.Series:
+    """Per row: why the profile cannot be reviewed, or '' when it can."""
+    errors = pd.Series('', index=profiles.index)
+    errors[profiles['amount'].isna() | (profiles['amount'] <= 0)] = 'invalid amount'
+    errors[profiles['duration_years'].isna() | (profiles['duration_years'] < 0)] = 'invalid duration'
+    errors[~profiles['investment_goal'].isin(INVESTMENT_GOALS)] = 'unknown investment goal'
+    errors[~profiles['risk_profile'].isin(RISK_PROFILES)] = 'unknown risk profile'
+    return errors
+
+
+def _recommendations(profiles: pd.DataFrame) -> list:
+    from modules.fund_store import get_fund_store
+    store = get_fund_store()
+    if store is not None and store.has_funds():
+        rank_store(store) # Once per chunk
+        return [recommend_from_store(store, risk, duration, goal) for risk, duration, goal in
+                zip(profiles['risk_profile'], profiles['duration_years'], profiles['investment_goal'])]
+    return recommend_funds_batch(profiles)
+
+
+def review_chunk(first_row: int, chunk: pd.DataFrame, method: str = 'weightage') -> tuple:
+    """
+    Recommends and allocates one chunk of client profiles, as get_fund_mix would for each.
+    Clients whose funds lack NAV history for a risk-based method get the weightage split,
+    as in the app. Returns (rows, csv_text) with the chunk's OUTPUT_COLUMNS rows, no header.
+    """
+    columns = _column_map(chunk.columns)
+    n = len(chunk)
+    profiles = pd.DataFrame({
+        'client_id': chunk[columns['client_id']].to_numpy() if 'client_id' in columns else np.arange(first_row, first_row + n),
+        'age': chunk[columns['age']].to_numpy() if 'age' in columns else np.full(n, None),
+        'risk_profile': chunk[columns['risk_profile']].astype(str).str.strip().str.title().to_numpy(),
+        'investment_goal': chunk[columns['investment_goal']].astype(str).str.strip().to_numpy(),
+        'duration_years': pd.to_numeric(chunk[columns['duration_years']], errors='coerce').to_numpy(),
+        'amount': pd.to_numeric(chunk[columns['amount']], errors='coerce').to_numpy(),
+    })
+    errors = _validate(profiles)
+    valid = (errors == '').to_numpy()
+
+    categories = np.full(n, None, dtype=object)
+    names = np.full((n, LEGS), None, dtype=object)
+    weightages = np.full((n, LEGS), np.nan)
+    rows = np.flatnonzero(valid)
+    for row, (category, suggested_funds) in zip(rows, _recommendations(profiles.iloc[rows])):
+        categories[row] = category
+        for leg, fund in enumerate(suggested_funds[:LEGS]):
+            names[row, leg] = fund['name']
+            weightages[row, leg] = fund['weightage']
+    amounts = np.where(valid, np.nan_to_num(profiles['amount'].to_numpy()), 0).astype(np.int64)
+
+    covariance = expected_returns = None
+    if method != 'weightage':
+        # Statistics for the chunk's distinct funds, gathered per client like get_fund_mix_batch.
+        funds = sorted({name for name in names.ravel() if name is not None})
+        fund_returns, fund_covariance = fund_return_statistics(funds) if funds else (np.full(1, np.nan), np.full((1, 1), np.nan))
+        index = {name: i for i, name in enumerate(funds)}
+        legs = np.array([[index.get(name, 0) for name in row] for row in names], dtype=np.int64).reshape(n, LEGS)
+        expected_returns = fund_returns[legs]
+        covariance = fund_covariance[legs[:, :, None], legs[:, None, :]]
+    weights, leg_amounts, fallback = allocate_batch(weightages, amounts, method, covariance, expected_returns)
+
+    output = profiles.copy()
+    output['recommended_category'] = categories
+    output['allocation_method'] = np.where(valid, np.where(fallback, 'weightage', method), None)
+    used = ~np.isnan(weightages)
+    for leg in range(LEGS):
+        output[f'fund_{leg + 1}'] = names[:, leg]
+        output[f'amount_{leg + 1}'] = pd.Series(leg_amounts[:, leg], dtype='Int64').where(used[:, leg])
+        output[f'percentage_{leg + 1}'] = np.where(used[:, leg], np.round(weights[:, leg] * 100, 4), np.nan)
+    output['error'] = errors.to_numpy()
+    return n, output[OUTPUT_COLUMNS].to_csv(header=False, index=False, lineterminator='\n')
+
+
+def _init_worker():
+    # Load the catalog (a memory-mapped snapshot, see modules/catalog_snapshot.py) before
+    # the first chunk arrives rather than while it waits.
+    get_fund_catalog()
+
+
+def _job(input_path: str, chunk_rows: int, method: str) -> dict:
+    """What a checkpoint must match to be resumed: the same input file and options."""
+    stat = os.stat(input_path)
+    return {'input': os.path.abspath(input_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'chunk_rows': chunk_rows, 'method': method}
+
+
+def _read_checkpoint(path: str, job: dict):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return checkpoint if checkpoint.get('job') == job else None
+
+
+def _output_size(path: str) -> int:
+    """Size of the output so far in bytes, or -1 when there is none."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return -1
+
+
+def _write_checkpoint(path: str, job: dict, chunks: int, rows: int, output_bytes: int):
+    staging = path + '.tmp'
+    with open(staging, 'w', encoding='utf-8') as f:
+        json.dump({'job': job, 'chunks': chunks, 'rows': rows, 'output_bytes': output_bytes}, f)
+    os.replace(staging, path)
+
+
+def _report(rows: int, total, started: float, resumed_rows: int, out=sys.stderr):
+    elapsed = time.monotonic() - started
+    rate = (rows - resumed_rows) / elapsed if elapsed > 0 else 0
+    done = f"{rows:,}/{total:,} profiles ({rows / total:.0%})" if total else f"{rows:,} profiles"
+    print(f"{done} in {elapsed:.1f}s, {rate:,.0f}/s", file=out, flush=True)
+
+
+def run_review(input_path: str, output_path: str, method: str = 'weightage', workers: int = None,
+               chunk_rows: int = CHUNK_ROWS, resume: bool = True, progress=sys.stderr) -> int:
+    """
+    Reviews every client in `input_path` and writes one OUTPUT_COLUMNS row per client, in
+    input order, to the CSV `output_path`. With `resume`, a run interrupted earlier picks up
+    after the last chunk it wrote. `workers` defaults to the CPU count; 0 runs in-process.
+    Returns the number of clients written.
+    """
+    if method not in ALLOCATION_METHODS:
+        raise ValueError(f"Unknown allocation method {method!r}; expected one of {ALLOCATION_METHODS}.")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    checkpoint_path = output_path + CHECKPOINT_SUFFIX
+    job = _job(input_path, chunk_rows, method)
+    checkpoint = _read_checkpoint(checkpoint_path, job) if resume else None
+    if checkpoint and _output_size(output_path) < checkpoint['output_bytes']:
+        if progress is not None:
+            print(f"{output_path} is missing or shorter than its checkpoint records; starting over",
+                  file=progress, flush=True)
+        checkpoint = None
+    skip, rows = (checkpoint['chunks'], checkpoint['rows']) if checkpoint else (0, 0)
+    total = count_profiles(input_path)
+
+    with open(output_path, 'r+b' if checkpoint else 'wb') as out:
+        if checkpoint:
+            out.truncate(checkpoint['output_bytes']) # Drop anything written after the checkpoint
+            out.seek(0, os.SEEK_END)
+            print(f"Resuming after {rows:,} profiles", file=progress, flush=True)
+        else:
+            out.write((','.join(OUTPUT_COLUMNS) + '\n').encode('utf-8'))
+
+        started, reported = time.monotonic(), time.monotonic()
+        written_chunks, skipped_rows = skip, rows
+        first_rows = rows # Input row number of the next chunk, the default client_id
+
+        def write(result):
+            nonlocal rows, written_chunks, reported
+            n_rows, text = result
+            out.write(text.encode('utf-8'))
+            out.flush()
+            os.fsync(out.fileno())
+            rows += n_rows
+            written_chunks += 1
+            _write_checkpoint(checkpoint_path, job, written_chunks, rows, out.tell())
+            if progress is not None and time.monotonic() - reported >= PROGRESS_INTERVAL_SECONDS:
+                reported = time.monotonic()
+                _report(rows, total, started, skipped_rows, progress)
+
+        chunks = ((index, chunk) for index, chunk in enumerate(read_profiles(input_path, chunk_rows)) if index >= skip)
+        if workers <= 0:
+            for _, chunk in chunks:
+                write(review_chunk(first_rows, chunk, method))
+                first_rows += len(chunk)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                pending = [] # Futures in input order; only the oldest is waited on
+                for _, chunk in chunks:
+                    pending.append(pool.submit(review_chunk, first_rows, chunk, method))
+                    first_rows += len(chunk)
+                    if len(pending) >= workers * CHUNKS_PER_WORKER:
+                        write(pending.pop(0).result())
+                for future in pending:
+                    write(future.result())
+
+    try:
+        os.remove(checkpoint_path) # Finished: a rerun starts over
+    except FileNotFoundError:
+        pass
+    if progress is not None:
+        _report(rows, total, started, skipped_rows, progress)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommend funds and allocations for a whole client book.")
+    parser.add_argument('profiles', help="CSV or Parquet file of client profiles (risk, goal, duration, amount; "
+                                         "optionally client_id and age).")
+    parser.add_argument('--out', required=True, help="CSV file to write one recommendation row per client to.")
+    parser.add_argument('--method', default='weightage', choices=ALLOCATION_METHODS, help="Allocation method.")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count; 0: none).")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="Clients per chunk.")
+    parser.add_argument('--restart', action='store_true', help="Ignore any checkpoint and start from the top.")
+    args = parser.parse_args()
+    rows = run_review(args.profiles, args.out, args.method, args.workers, args.chunk_rows, resume=not args.restart)
+    print(f"Wrote {rows:,} recommendations to {args.out}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+import functools
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+
+
+# Streamlit reruns app.py top to bottom on every widget change, but imported modules stay
+# loaded, so caches that live here survive reruns and are shared by every session.
+# Concurrent misses for the same key make a single upstream call (single flight). With
+# `stale_ttl`, an expired entry is still served for that long while one background call
+# refreshes it. `shared` caches are also shared with the app's other processes through
+# modules/snapshot_store.py, so each key is fetched once per machine rather than per process.
+CacheEntry = namedtuple('CacheEntry', ['value', 'fetched_at', 'expires_at'])
+
+IST = timezone(timedelta(hours=5, minutes=30))
+AMFI_PUBLISH_HOUR_IST = 23 # AMFI requires fund houses to publish the day's NAVs by 11 PM
+NAV_RETRY_SECONDS = 20 * 60 # How soon NAVs older than the last publish are checked again
+
+_caches = {}
+_shared_stores = {} # Cache name -> SnapshotStore, for the caches shared between processes
+_caches_lock = threading.Lock()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a fixed TTL (seconds) or at the time
+    returned by `expires_at(fetched_at, value)`. At most `maxsize` entries are kept; the least
+    recently used one is evicted first. Expired entries are kept `stale_ttl` seconds longer
+    for `lookup`, which may serve them while they are refreshed.
+    """
+
+    def __init__(self, name: str, ttl: float = None, expires_at=None, maxsize: int = 128, clock=time.time,
+                 stale_ttl: float = 0):
+        if ttl is None and expires_at is None:
+            raise ValueError("A cache needs either a ttl or an expires_at function.")
+        self.name = name
+        self.ttl = ttl
+        self.expires_at = expires_at
+        self.maxsize = maxsize
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._invalidated = {} # key -> when it was invalidated, until it is set again
+        self._all_invalidated_at = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key):
+        """Returns the live CacheEntry for `key`, or None if it is missing or expired."""
+        entry = self.lookup(key)
+        hit = entry is not None and entry.expires_at > self.clock()
+        self.record(hit)
+        return entry if hit else None
+
+    def lookup(self, key):
+        """
+        Returns the entry for `key` if it is live or expired less than `stale_ttl` ago, else
+        None. Does not count as a hit or miss; callers `record` what they did with it.
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at + self.stale_ttl <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def peek(self, key):
+        """Returns the entry for `key` even if expired, without touching LRU order or stats."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def set(self, key, value, fetched_at: float = None) -> CacheEntry:
+        fetched_at = self.clock() if fetched_at is None else fetched_at
+        expires_at = self.expires_at(fetched_at, value) if self.expires_at is not None else fetched_at + self.ttl
+        entry = CacheEntry(value, fetched_at, expires_at)
+        with self._lock:
+            self._invalidated.pop(key, None)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, key=None):
+        """Drops one entry, or every entry when `key` is None, and records when (see invalidated_at)."""
+        now = self.clock()
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._invalidated.clear()
+                self._all_invalidated_at = now
+            else:
+                self._entries.pop(key, None)
+                self._invalidated[key] = now
+
+    def invalidated_at(self, key):
+        """When `key` was last invalidated, or None; values fetched before then are not to be reused."""
+        with self._lock:
+            times = [t for t in (self._all_invalidated_at, self._invalidated.get(key)) if t is not None]
+        return max(times) if times else None
+
+
+def _make_key(args, kwargs) -> tuple:
+    return args + tuple(sorted(kwargs.items()))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; callers that arrive meanwhile share its outcome."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = func(*args)
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def start(self, key, func, *args):
+        """Runs the call in a background thread, unless one for `key` is already in flight."""
+        with self._lock:
+            if key in self._calls:
+                return
+
+        def run():
+            try:
+                self.do(key, func, *args)
+            except Exception:
+                pass # Counted by the upstream's own metrics; the stale value stays in use
+        threading.Thread(target=run, name=f"refresh-{key!r}", daemon=True).start()
+
+
+def cached(name: str, ttl: float = None, expires_at=None, maxsize: int = 128, cache_if=None,
+           stale_ttl: float = 0, shared: bool = False):
+    """
+    Decorator that caches a data-source function in a named TTLCache.
+    `cache_if(value)` can veto caching a result, e.g. an empty frame returned after an upstream
+    error, so a failure is retried on the next call instead of being served until expiry.
+    `stale_ttl` serves an expired value that long past its expiry while it is refreshed in
+    the background; `shared` shares values with other processes (modules/snapshot_store.py).
+    The wrapper gains `cache`, `invalidate(*args, **kwargs)`, `peek(*args, **kwargs)` and
+    `fetched_at(*args, **kwargs)`.
+    """
+    cache = TTLCache(name, ttl=ttl, expires_at=expires_at, maxsize=maxsize, stale_ttl=stale_ttl)
+    store = None
+    if shared:
+        from modules.snapshot_store import get_snapshot_store # Only shared caches need it
+        store = get_snapshot_store()
+    with _caches_lock:
+        _caches[name] = cache
+        if store is not None:
+            _shared_stores[name] = store
+    flights, refreshes = SingleFlight(), SingleFlight() # Foreground fetches; background refreshes
+
+    def decorator(func):
+        def load(key, args, kwargs, wait):
+            # The process holding the key's lock fetches; the others wait for its snapshot.
+            # A background refresh (wait=False) leaves a key being fetched elsewhere alone.
+            with store.lock(name, key, wait) if store is not None else nullcontext(True) as owner:
+                if not owner and not wait:
+                    return None
+                if store is not None:
+                    snapshot = store.read(name, key, newer_than=cache.invalidated_at(key))
+                    if snapshot is not None and snapshot.expires_at > cache.clock():
+                        return cache.set(key, snapshot.value, snapshot.fetched_at).value
+                value = func(*args, **kwargs)
+                if cache_if is None or cache_if(value):
+                    entry = cache.set(key, value)
+                    if store is not None:
+                        try:
+                            store.write(name, key, value, entry.fetched_at, entry.expires_at)
+                        except (OSError, TypeError): # Full or unshareable: still cached in this process
+                            pass
+                return value
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = _make_key(args, kwargs)
+            entry = cache.lookup(key)
+            now = cache.clock()
+            if store is not None and (entry is None or entry.expires_at <= now):
+                # Another process may have fetched it since; reading its header is cheap. A
+                # snapshot fetched before this process last invalidated the key is not reused.
+                seen = [t for t in (entry.fetched_at if entry is not None else None, cache.invalidated_at(key)) if t is not None]
+                snapshot = store.read(name, key, newer_than=max(seen) if seen else None)
+                if snapshot is not None and snapshot.expires_at + stale_ttl > now:
+                    entry = cache.set(key, snapshot.value, snapshot.fetched_at)
+            if entry is not None:
+                cache.record(hit=True)
+                if entry.expires_at <= now:
+                    refreshes.start(key, load, key, args, kwargs, False)
+                return entry.value
+            cache.record(hit=False)
+            return flights.do(key, load, key, args, kwargs, True)
+
+        def peek(*args, **kwargs):
+            """Returns the CacheEntry for these arguments, live or not, without fetching, or None."""
+            return cache.peek(_make_key(args, kwargs))
+
+        def fetched_at(*args, **kwargs):
+            """Returns when the cached value for these arguments was fetched (epoch seconds), or None."""
+            entry = peek(*args, **kwargs)
+            return entry.fetched_at if entry is not None else None
+
+        def invalidate(*args, **kwargs):
+            """Drops the value for these arguments (all values without any) in this process only."""
+            cache.invalidate(_make_key(args, kwargs) if args or kwargs else None)
+
+        wrapper.cache = cache
+        wrapper.invalidate = invalidate
+        wrapper.peek = peek
+        wrapper.fetched_at = fetched_at
+        return wrapper
+    return decorator
+
+
+def get_caches() -> dict:
+    """Returns every named cache, e.g. for stats or a debug panel."""
+    with _caches_lock:
+        return dict(_caches)
+
+
+def invalidate_all(shared: bool = False):
+    """
+    Manual invalidation hook: empties every cache of this process so its next call goes
+    upstream; other processes keep their values, and take up the refetched ones when theirs
+    expire. `shared` also deletes the snapshots shared between processes, so every process
+    refetches: an administrative reset, not a user's refresh.
+    """
+    for cache in get_caches().values():
+        cache.invalidate()
+    if shared:
+        with _caches_lock:
+            stores = dict(_shared_stores)
+        for name, store in stores.items():
+            store.invalidate(name)
+
+
+def next_amfi_publish_time(fetched_at: float, value=None) -> float:
+    """Expiry for data derived from NAVs: the next AMFI publish time (23:00 IST) after `fetched_at`."""
+    fetched = datetime.fromtimestamp(fetched_at, IST)
+    publish = fetched.replace(hour=AMFI_PUBLISH_HOUR_IST, minute=0, second=0, microsecond=0)
+    if publish <= fetched:
+        publish += timedelta(days=1)
+    return publish.timestamp()
+
+
+def expected_nav_date(fetched_at: float) -> str:
+    """
+    The NAV date ('YYYY-MM-DD') AMFI should have published by `fetched_at`: the day of the
+    last 23:00 IST before it, or the Friday before when that falls on a weekend.
+    """
+    published = datetime.fromtimestamp(fetched_at, IST) - timedelta(hours=AMFI_PUBLISH_HOUR_IST)
+    day = published.date()
+    day -= timedelta(days=max(0, day.weekday() - 4)) # Saturday and Sunday: Friday's NAVs
+    return day.isoformat()
+
+
+def next_nav_refresh_time(fetched_at: float, navs=None) -> float:
+    """
+    Expiry for a NAV frame ('Date' column of ISO dates): the next AMFI publish time, or only
+    NAV_RETRY_SECONDS away when the frame predates expected_nav_date, e.g. when fetched
+    just after 23:00 IST before AMFI has published. Re-checking an unchanged file is a
+    conditional request, so this is cheap; on market holidays it simply repeats until the
+    next publish.
+    """
+    if navs is not None and len(navs):
+        latest = navs['Date'].dropna().max()
+        if isinstance(latest, str) and latest < expected_nav_date(fetched_at):
+            return fetched_at + NAV_RETRY_SECONDS
+    return next_amfi_publish_time(fetched_at)
+
+
+def describe_age(fetched_at: float, now: float = None) -> str:
+    """Human-readable age of data fetched at `fetched_at`, e.g. "4s", "12 min", "3 h"."""
+    if fetched_at is None:
+        return "unknown"
+    seconds = max(0, (now if now is not None else time.time()) - fetched_at)
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds // 60:.0f} min"
+    return f"{seconds // 3600:.0f} h"
@@ -0,0 +1,57 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Prebuilt binary snapshots of derived catalog arrays, so a new process maps them from disk
+# instead of recomputing them on import. A snapshot is a directory named after the
+# fingerprint of its source data, holding one .npy file per array (opened memory-mapped, so
+# pages are only read when touched and are shared between processes through the page cache)
+# and meta.json for everything that is not an array. A changed source catalog gets a new
+# fingerprint and so a new snapshot; older ones are removed once it is written. Snapshots
+# are renamed into place complete, so readers never see half of one, and two processes
+# writing the same fingerprint at once just race to identical content.
+CATALOG_SNAPSHOT_DIR = os.environ.get("CATALOG_SNAPSHOT_DIR", os.path.join("data", "catalog_snapshot"))
+META_FILE = 'meta.json'
+
+
+def fingerprint(*parts) -> str:
+    """Content hash of JSON-serializable `parts`, e.g. the source records and encoding tables."""
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+
+def read_snapshot(key: str, root: str = CATALOG_SNAPSHOT_DIR):
+    """Returns (arrays, meta) of the snapshot for fingerprint `key`, or None if there is none."""
+    directory = os.path.join(root, key)
+    try:
+        with open(os.path.join(directory, META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in meta['arrays']}
+    except (OSError, ValueError, KeyError): # Missing, partial or from an older layout: rebuild
+        return None
+    return arrays, meta
+
+
+def write_snapshot(key: str, arrays: dict, meta: dict, root: str = CATALOG_SNAPSHOT_DIR):
+    """Writes the snapshot for fingerprint `key` and removes snapshots of other fingerprints."""
+    os.makedirs(root, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=root)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(staging, f'{name}.npy'), np.ascontiguousarray(array))
+        with open(os.path.join(staging, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(dict(meta, arrays=sorted(arrays)), f)
+        try:
+            os.rename(staging, os.path.join(root, key))
+        except OSError: # Another process finished the same snapshot first
+            pass
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    for entry in os.listdir(root):
+        if entry != key and not entry.startswith('.'):
+            # Processes that still map an old snapshot keep reading it until they exit.
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
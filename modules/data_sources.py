@@ -0,0 +1,72 @@
+import functools
+import warnings
+
+from modules.amfi_data import get_latest_navs_for_sbi as _get_latest_navs_for_sbi
+from modules.cache import cached, next_nav_refresh_time
+from modules.manager_notes import get_fund_manager_notes as _get_fund_manager_notes
+from modules.market_data_api import get_live_market_indices as _get_live_market_indices
+from modules.market_data_api import get_stock_data as _get_stock_data
+from modules.metrics import timed
+
+# Cached versions of every upstream data call made by app.py, each with its own freshness:
+# NAVs change once a day, index and stock quotes every few seconds during market hours,
+# and fund manager commentary a few times a day (cached per recommendation it is ranked
+# for). Empty results are not cached, so an upstream failure is retried on the next rerun.
+# Each upstream call (cache misses only) is timed, and an exception or empty result counts
+# as an upstream error in modules/metrics.py.
+# NAVs expire at AMFI's next publish time, unless the file fetched is older than the day
+# AMFI should have published: then it is checked again every few minutes until it is not.
+# NAVs and quotes come from rate-limited services and are the same for every advisor, so
+# they are shared across server processes, and an expired value is served for a while
+# longer while one refresh runs in the background instead of every session waiting on it.
+# Each fetch of NAVs is also appended to the NAV history (modules/nav_history.py) right
+# there, so the history is written once per fetch rather than on every rerun.
+INDEX_QUOTE_TTL_SECONDS = 5
+STOCK_QUOTE_TTL_SECONDS = 5
+QUOTE_STALE_SECONDS = 10
+NAV_STALE_SECONDS = 6 * 3600 # Yesterday's NAVs until today's are fetched, e.g. when AMFI publishes late
+MANAGER_NOTES_TTL_SECONDS = 15 * 60
+
+
+def _has_rows(df) -> bool:
+    return df is not None and not df.empty
+
+
+def _is_present(value) -> bool:
+    return bool(value)
+
+
+def _upstream(func, is_valid):
+    return timed(func.__name__, kind='upstream', upstream=True, error_if=lambda value: not is_valid(value))(func)
+
+
+def _recording_history(fetch_navs):
+    @functools.wraps(fetch_navs)
+    def wrapper(*args, **kwargs):
+        navs = fetch_navs(*args, **kwargs)
+        if _has_rows(navs):
+            from modules.nav_history import get_default_store
+            try:
+                get_default_store().ingest_navs(navs) # Only schemes and days not yet stored are written
+            except (OSError, ValueError) as e:
+                warnings.warn(f"Could not record NAV history: {e}")
+        return navs
+    return wrapper
+
+
+get_latest_navs_for_sbi = cached(
+    'navs', expires_at=next_nav_refresh_time, maxsize=8, cache_if=_has_rows, stale_ttl=NAV_STALE_SECONDS, shared=True
+)(_recording_history(_upstream(_get_latest_navs_for_sbi, _has_rows)))
+
+get_live_market_indices = cached(
+    'indices', ttl=INDEX_QUOTE_TTL_SECONDS, maxsize=8, cache_if=_has_rows, stale_ttl=QUOTE_STALE_SECONDS, shared=True
+)(_upstream(_get_live_market_indices, _has_rows))
+
+get_stock_data = cached(
+    'stock_quotes', ttl=STOCK_QUOTE_TTL_SECONDS, maxsize=512, cache_if=_is_present, stale_ttl=QUOTE_STALE_SECONDS,
+    shared=True
+)(_upstream(_get_stock_data, _is_present))
+
+get_fund_manager_notes = cached(
+    'manager_notes', ttl=MANAGER_NOTES_TTL_SECONDS, maxsize=256, cache_if=_is_present
+)(_upstream(_get_fund_manager_notes, _is_present))
@@ -0,0 +1,369 @@
+import argparse
+import csv
+import os
+import re
+import threading
+from functools import lru_cache
+
+from modules.recommender import BRANCH_PRIORITY_TYPES, INVESTMENT_GOALS, RISK_PROFILES
+from modules.sqlite_pool import DEFAULT_POOL_SIZE, ConnectionPool
+
+# The full multi-AMC fund universe in SQLite. `funds` holds one row per scheme code;
+# risk is a code into RISK_PROFILES, goal suitability a bitmask over INVESTMENT_GOALS and
+# priority_mask has bit b set when the scheme's type is a priority type of allocation
+# branch b. `position` is catalog order (the tiebreak within a risk tier): new schemes are
+# appended and an upsert never moves an existing one.
+# `fund_goals` is the recommendation index: one row per (scheme, suitable goal), clustered
+# on (goal, risk, position) and carrying the duration and priority columns, so "the first k
+# eligible schemes for this goal and risk" is a short ordered range scan that stops after k
+# matches, however many schemes there are. It is maintained by every upsert.
+# `score` ranks schemes within a risk tier ahead of position (higher first, none last). The
+# recommender sets it from NAV history metrics (RANKING_METRIC in modules/recommender.py)
+# once per appended NAV day, noting in `meta` what it was computed from, and fund_goals is
+# also indexed on (goal, risk, score, position) so a ranked scan stays as short.
+# Load or refresh it from AMFI's scheme master (SchemeData CSV):
+#   FUND_DB_PATH=data/funds.sqlite3 python -m modules.fund_store SchemeData.csv
+# With FUND_DB_PATH set (secret or environment variable) and the store populated,
+# recommend_funds picks from it instead of the built-in sample catalog.
+FUND_DB_PATH = os.environ.get("FUND_DB_PATH", os.path.join("data", "funds.sqlite3"))
+UPSERT_BATCH_ROWS = 5_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS funds (
+    scheme_code INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    amc TEXT,
+    category TEXT,
+    type TEXT,
+    risk_code INTEGER NOT NULL,
+    min_duration_years REAL NOT NULL,
+    max_duration_years REAL,
+    goal_mask INTEGER NOT NULL,
+    priority_mask INTEGER NOT NULL,
+    expense_ratio REAL,
+    aum_crore REAL,
+    description TEXT,
+    position INTEGER NOT NULL,
+    score REAL
+);
+CREATE INDEX IF NOT EXISTS funds_risk_duration ON funds (risk_code, min_duration_years);
+CREATE INDEX IF NOT EXISTS funds_goal_mask ON funds (goal_mask);
+CREATE UNIQUE INDEX IF NOT EXISTS funds_position ON funds (position);
+CREATE TABLE IF NOT EXISTS fund_goals (
+    goal_code INTEGER NOT NULL,
+    risk_code INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    scheme_code INTEGER NOT NULL,
+    min_duration_years REAL NOT NULL,
+    priority_mask INTEGER NOT NULL,
+    score REAL,
+    PRIMARY KEY (goal_code, risk_code, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS fund_goals_scheme ON fund_goals (scheme_code);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+FUND_COLUMNS = ['scheme_code', 'name', 'amc', 'category', 'type', 'risk_profile', 'min_duration_years',
+                'max_duration_years', 'goal_suitability', 'expense_ratio', 'aum_crore', 'description']
+
+# How AMFI scheme categories map onto the recommender's vocabulary, first match wins:
+# (category substring, risk profile, min duration, max duration, suitable goals).
+CATEGORY_PROFILES = [
+    ("Overnight", "Conservative", 0.1, 0.5, ["General Investment", "Short-term Capital Gain"]),
+    ("Liquid", "Conservative", 0.1, 0.5, ["General Investment", "Short-term Capital Gain"]),
+    ("Money Market", "Conservative", 0.1, 1, ["General Investment", "Short-term Capital Gain"]),
+    ("Ultra Short", "Low", 0.25, 1, ["General Investment", "Short-term Capital Gain"]),
+    ("Low Duration", "Low", 0.5, 1, ["General Investment", "Short-term Capital Gain"]),
+    ("Short Duration", "Low", 1, 3, ["General Investment", "Short-term Capital Gain"]),
+    ("Arbitrage", "Low", 0.25, 3, ["General Investment", "Short-term Capital Gain"]),
+    ("Conservative Hybrid", "Low", 1, None, ["General Investment", "Retirement Planning"]),
+    ("Gilt", "Low", 3, None, ["General Investment", "Retirement Planning"]),
+    ("Debt", "Low", 1, None, ["General Investment", "Short-term Capital Gain"]),
+    ("Income", "Low", 1, None, ["General Investment", "Short-term Capital Gain"]),
+    ("ELSS", "Moderate", 3, None, ["Tax Saving", "Wealth Creation"]),
+    ("Children", "Moderate", 5, None, ["Child's Education", "Wealth Creation"]),
+    ("Retirement", "Moderate", 5, None, ["Retirement Planning", "Wealth Creation"]),
+    ("Small Cap", "High", 7, None, ["Wealth Creation", "Retirement Planning"]),
+    ("Large & Mid Cap", "High", 5, None, ["Wealth Creation", "Retirement Planning"]),
+    ("Mid Cap", "High", 7, None, ["Wealth Creation", "Retirement Planning"]),
+    ("Contra", "High", 5, None, ["Wealth Creation"]),
+    ("Value", "High", 5, None, ["Wealth Creation"]),
+    ("Sectoral", "High", 7, None, ["Wealth Creation"]),
+    ("Thematic", "High", 7, None, ["Wealth Creation"]),
+    ("Large Cap", "Moderate", 5, None, ["Wealth Creation", "Retirement Planning"]),
+    ("Index", "Moderate", 5, None, ["Wealth Creation", "Retirement Planning"]),
+    ("Hybrid", "Moderate", 3, None, ["Wealth Creation", "Retirement Planning", "General Investment"]),
+    ("Asset Allocation", "Moderate", 3, None, ["Wealth Creation", "Retirement Planning", "General Investment"]),
+    ("Equity", "High", 5, None, ["Wealth Creation", "Retirement Planning"]),
+]
+DEFAULT_CATEGORY_PROFILE = ("Moderate", 3, None, ["General Investment"])
+
+
+@lru_cache(maxsize=1024) # A scheme master has a few dozen distinct categories
+def category_profile(category: str) -> tuple:
+    """(risk profile, min duration, max duration, goals) for an AMFI scheme category."""
+    for pattern, *profile in CATEGORY_PROFILES:
+        if pattern.lower() in (category or '').lower():
+            return tuple(profile)
+    return DEFAULT_CATEGORY_PROFILE
+
+
+def _goal_mask(goals) -> int:
+    return sum(1 << INVESTMENT_GOALS.index(goal) for goal in set(goals or ()) if goal in INVESTMENT_GOALS)
+
+
+@lru_cache(maxsize=1024)
+def _priority_mask(fund_type: str) -> int:
+    return sum(1 << branch for branch, pattern in enumerate(BRANCH_PRIORITY_TYPES) if re.search(pattern, fund_type or ''))
+
+
+def _optional_float(value):
+    try:
+        return float(value) if value not in (None, '') else None
+    except (TypeError, ValueError): # e.g. "N.A."
+        return None
+
+
+class FundStore:
+    """SQLite catalog of the fund universe with indexed recommendation queries."""
+
+    def __init__(self, path: str = FUND_DB_PATH, pool_size: int = DEFAULT_POOL_SIZE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.pool = ConnectionPool(path, pool_size)
+        with self.pool.connection() as connection:
+            connection.executescript(SCHEMA)
+            for table in ('funds', 'fund_goals'): # Stores created before funds had scores
+                if 'score' not in [column[1] for column in connection.execute(f"PRAGMA table_info({table})")]:
+                    connection.execute(f"ALTER TABLE {table} ADD COLUMN score REAL")
+            connection.execute("CREATE INDEX IF NOT EXISTS fund_goals_ranked ON fund_goals "
+                               "(goal_code, risk_code, score DESC, position, min_duration_years, priority_mask)")
+            connection.commit()
+
+    def __len__(self):
+        with self.pool.connection() as connection:
+            return connection.execute("SELECT COUNT(*) FROM funds").fetchone()[0]
+
+    def has_funds(self) -> bool:
+        with self.pool.connection() as connection:
+            return connection.execute("SELECT 1 FROM funds LIMIT 1").fetchone() is not None
+
+    def upsert_funds(self, records) -> int:
+        """
+        Inserts or updates funds from dicts with FUND_COLUMNS keys; scheme_code, name and
+        category are required and the rest default from category_profile(). Expense ratio,
+        AUM and description keep their stored values when a record leaves them out.
+        Returns the number of records written.
+        """
+        written = 0
+        batch = []
+        for record in records:
+            batch.append(self._row(record))
+            if len(batch) >= UPSERT_BATCH_ROWS:
+                written += self._upsert_rows(batch)
+                batch = []
+        if batch:
+            written += self._upsert_rows(batch)
+        return written
+
+    def _row(self, record: dict) -> dict:
+        category = record.get('category')
+        risk_profile, min_duration, max_duration, goals = category_profile(category)
+        risk_profile = record.get('risk_profile') or risk_profile
+        fund_type = record.get('type') or category
+        goals = record.get('goal_suitability') or goals
+        min_duration = record.get('min_duration_years', min_duration)
+        return {
+            'scheme_code': int(record['scheme_code']),
+            'name': record['name'],
+            'amc': record.get('amc'),
+            'category': category,
+            'type': fund_type,
+            'risk_code': RISK_PROFILES.index(risk_profile) if risk_profile in RISK_PROFILES else len(RISK_PROFILES),
+            'min_duration_years': float(min_duration if min_duration is not None else 0),
+            'max_duration_years': _optional_float(record.get('max_duration_years', max_duration)),
+            'goal_mask': _goal_mask(goals),
+            'priority_mask': _priority_mask(fund_type),
+            'expense_ratio': _optional_float(record.get('expense_ratio')),
+            'aum_crore': _optional_float(record.get('aum_crore')),
+            'description': record.get('description'),
+        }
+
+    def _upsert_rows(self, rows: list) -> int:
+        # A scheme listed twice in one batch is written once, as its last listing, or its
+        # goal rows would be inserted twice.
+        rows = list({row['scheme_code']: row for row in rows}.values())
+        with self.pool.connection() as connection, connection:
+            connection.execute("BEGIN IMMEDIATE") # Take the write lock before reading the next position
+            next_position = connection.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM funds").fetchone()[0]
+            for offset, row in enumerate(rows):
+                row['position'] = next_position + offset
+            codes = [(row['scheme_code'],) for row in rows]
+            connection.executemany("DELETE FROM fund_goals WHERE scheme_code = ?", codes)
+            connection.executemany("""
+                INSERT INTO funds (scheme_code, name, amc, category, type, risk_code, min_duration_years,
+                                   max_duration_years, goal_mask, priority_mask, expense_ratio, aum_crore,
+                                   description, position)
+                VALUES (:scheme_code, :name, :amc, :category, :type, :risk_code, :min_duration_years,
+                        :max_duration_years, :goal_mask, :priority_mask, :expense_ratio, :aum_crore,
+                        :description, :position)
+                ON CONFLICT (scheme_code) DO UPDATE SET
+                    name = excluded.name, amc = excluded.amc, category = excluded.category, type = excluded.type,
+                    risk_code = excluded.risk_code, min_duration_years = excluded.min_duration_years,
+                    max_duration_years = excluded.max_duration_years, goal_mask = excluded.goal_mask,
+                    priority_mask = excluded.priority_mask,
+                    expense_ratio = COALESCE(excluded.expense_ratio, funds.expense_ratio),
+                    aum_crore = COALESCE(excluded.aum_crore, funds.aum_crore),
+                    description = COALESCE(excluded.description, funds.description)
+            """, rows)
+            # Rebuilt from the stored rows, so updated schemes keep their original position.
+            connection.executemany("""
+                INSERT INTO fund_goals (goal_code, risk_code, position, scheme_code, min_duration_years, priority_mask, score)
+                SELECT ?, risk_code, position, scheme_code, min_duration_years, priority_mask, score
+                FROM funds WHERE scheme_code = ? AND goal_mask & ?
+            """, [(goal, row['scheme_code'], 1 << goal) for row in rows for goal in range(len(INVESTMENT_GOALS))
+                  if row['goal_mask'] & (1 << goal)])
+        return len(rows)
+
+    def ingest_scheme_master(self, source) -> int:
+        """
+        Bulk upserts AMFI's scheme master (SchemeData CSV: AMC, Code, Scheme Name, Scheme
+        Category, Scheme NAV Name, ...) from a path or an iterable of lines. Optional
+        "Expense Ratio" and "AUM" columns are stored when present.
+        """
+        if isinstance(source, str):
+            with open(source, 'r', encoding='utf-8', errors='replace', newline='') as f:
+                return self.ingest_scheme_master(f)
+        reader = csv.DictReader(source)
+        reader.fieldnames = [name.strip() for name in reader.fieldnames or []]
+
+        def records():
+            for row in reader:
+                code = (row.get('Code') or '').strip()
+                if not code.isdigit():
+                    continue
+                category = (row.get('Scheme Category') or '').strip()
+                amc = (row.get('AMC') or '').strip()
+                yield {
+                    'scheme_code': int(code),
+                    'name': (row.get('Scheme NAV Name') or row.get('Scheme Name') or '').strip(),
+                    'amc': amc,
+                    'category': category,
+                    'expense_ratio': row.get('Expense Ratio'),
+                    'aum_crore': row.get('AUM'),
+                    'description': f"{category} scheme from {amc}." if category else None,
+                }
+        return self.upsert_funds(records())
+
+    def scheme_codes(self) -> list:
+        """Every stored scheme code, in catalog order."""
+        with self.pool.connection() as connection:
+            return [row[0] for row in connection.execute("SELECT scheme_code FROM funds ORDER BY position")]
+
+    def scores_as_of(self):
+        """What the stored scores were computed from, as passed to set_scores, or None."""
+        with self.pool.connection() as connection:
+            row = connection.execute("SELECT value FROM meta WHERE key = 'scores_as_of'").fetchone()
+        return row[0] if row is not None else None
+
+    def set_scores(self, scores: dict, as_of: str):
+        """Replaces every ranking score with {scheme code: score} (NaN for none) and records `as_of`."""
+        rows = [(float(score), int(code)) for code, score in scores.items() if score == score]
+        with self.pool.connection() as connection, connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("UPDATE funds SET score = NULL WHERE score IS NOT NULL")
+            connection.executemany("UPDATE funds SET score = ? WHERE scheme_code = ?", rows)
+            connection.execute("UPDATE fund_goals SET score = (SELECT score FROM funds WHERE funds.scheme_code = fund_goals.scheme_code)")
+            connection.execute("INSERT INTO meta (key, value) VALUES ('scores_as_of', ?) "
+                               "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (as_of,))
+
+    def top_funds(self, goal_code: int, risk_codes, max_min_duration: float, branch: int, priority: bool,
+                  limit: int) -> list:
+        """
+        The first `limit` funds, by descending score (none last) and then catalog order, that
+        suit goal `goal_code`, have a risk code in `risk_codes` and a minimum duration of at
+        most `max_min_duration`, and are (or, with priority=False, are not) of a priority type
+        of allocation branch `branch`.
+        """
+        risk_codes = list(risk_codes)
+        if limit <= 0 or not risk_codes:
+            return []
+        rows = []
+        with self.pool.connection() as connection:
+            # One ordered range scan per risk code, merged by position; a tier has one or two.
+            for risk_code in risk_codes:
+                rows += connection.execute("""
+                    SELECT g.position, g.score, f.scheme_code, f.name, f.type, f.description
+                    FROM fund_goals AS g JOIN funds AS f ON f.scheme_code = g.scheme_code
+                    WHERE g.goal_code = ? AND g.risk_code = ? AND g.min_duration_years <= ?
+                      AND ((g.priority_mask >> ?) & 1) = ?
+                    ORDER BY g.score DESC, g.position LIMIT ?
+                """, (goal_code, risk_code, float(max_min_duration), branch, int(priority), limit)).fetchall()
+        ranked = sorted(rows, key=lambda row: (row['score'] is None, -(row['score'] or 0), row['position']))
+        return [dict(row) for row in ranked[:limit]]
+
+    def load_frame(self):
+        """Every fund in catalog order, shaped like load_fund_data() plus the store's own columns."""
+        import pandas as pd
+        with self.pool.connection() as connection:
+            rows = connection.execute("SELECT * FROM funds ORDER BY position").fetchall()
+        return pd.DataFrame([{
+            'scheme_code': row['scheme_code'],
+            'name': row['name'],
+            'amc': row['amc'],
+            'category': row['category'],
+            'type': row['type'],
+            'risk_profile': RISK_PROFILES[row['risk_code']] if row['risk_code'] < len(RISK_PROFILES) else None,
+            'min_duration_years': row['min_duration_years'],
+            'max_duration_years': row['max_duration_years'],
+            'goal_suitability': [goal for i, goal in enumerate(INVESTMENT_GOALS) if row['goal_mask'] & (1 << i)],
+            'expense_ratio': row['expense_ratio'],
+            'aum_crore': row['aum_crore'],
+            'description': row['description'],
+        } for row in rows], columns=FUND_COLUMNS)
+
+    def close(self):
+        self.pool.close()
+
+
+_store = None
+_store_resolved = False # Configuration is read once per process, also when nothing is set
+_store_lock = threading.Lock()
+
+
+def get_fund_store():
+    """
+    Returns the process-wide FundStore for the FUND_DB_PATH secret or environment variable,
+    or None when neither is set (the recommender then uses its built-in catalog).
+    """
+    global _store, _store_resolved
+    with _store_lock:
+        if not _store_resolved:
+            try:
+                import streamlit as st
+                path = st.secrets.get("FUND_DB_PATH")
+            except Exception: # No secrets file configured
+                path = None
+            path = path or os.environ.get("FUND_DB_PATH")
+            _store = FundStore(path) if path else None
+            _store_resolved = True
+        return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load AMFI's scheme master into the SQLite fund store.")
+    parser.add_argument('scheme_master', help="Path to the SchemeData CSV downloaded from AMFI.")
+    parser.add_argument('--db', default=FUND_DB_PATH, help="SQLite database file (default: FUND_DB_PATH).")
+    args = parser.parse_args()
+    store = FundStore(args.db)
+    written = store.ingest_scheme_master(args.scheme_master)
+    print(f"Upserted {written} schemes into {args.db}; {len(store)} in the store.")
+
+
+if __name__ == '__main__':
+    main()
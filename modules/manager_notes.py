@@ -1,20 +1,315 @@
-import random
+import json
+import math
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
 
-def get_fund_manager_notes():
+from modules.sqlite_pool import DEFAULT_POOL_SIZE, ConnectionPool
+
+# Fund manager commentary in a SQLite FTS5 full-text index. Notes are ingested
+# incrementally from NOTES_SOURCE (secret or environment variable): a directory of .txt/.md
+# documents, one note each, and/or .jsonl feeds, one note per line. Every source file's
+# size and modification time is recorded, so a refresh only re-reads files that changed
+# and drops notes whose file is gone. A document may start with "Key: value" headers:
+#   Title: Mid-cap outlook for the quarter
+#   Date: 2026-09-30
+#   Funds: SBI Small Cap Fund, SBI Large & Midcap Fund
+# followed by a blank line and the body; without a Date header the file's modification
+# time is used. Feed lines are {"date", "title", "body", "funds"} objects.
+# Retrieval ranks the notes that match the recommended category and fund names by BM25
+# (fund tags and titles weigh more than the body), scaled by an exponential recency decay,
+# so the index answers in milliseconds however many years of notes it holds. Without a
+# configured source, the built-in sample notes are indexed instead.
+NOTES_DB_PATH = os.environ.get("NOTES_DB_PATH", os.path.join("data", "manager_notes.sqlite3"))
+NOTES_PER_QUERY = 5
+RECENCY_HALF_LIFE_DAYS = 90 # A note's weight halves every quarter...
+RECENCY_FLOOR = 0.2 # ...but never drops below this share, so old but on-point notes still rank
+BM25_WEIGHTS = (3.0, 1.0, 5.0) # title, body, funds
+REFRESH_INTERVAL_SECONDS = 60 # How often a query may re-scan NOTES_SOURCE for changes
+DOCUMENT_SUFFIXES = ('.txt', '.md')
+FEED_SUFFIXES = ('.jsonl',)
+SAMPLE_SOURCE = 'builtin:sample'
+
+# Words that say nothing about a fund's subject matter; never used as search terms.
+STOPWORDS = {
+    'sbi', 'fund', 'funds', 'scheme', 'plan', 'regular', 'direct', 'growth', 'idcw', 'option', 'mutual',
+    'the', 'and', 'of', 'a', 'an', 'in', 'for', 'to',
+}
+# Risk-level words of the recommended category ("Equity - High Growth"): only the asset
+# classes say what a note is about, and these words would match most notes.
+CATEGORY_STOPWORDS = STOPWORDS | {'high', 'balanced', 'conservative'}
+
+SAMPLE_NOTES = [
+    "Equity markets continue to show resilience, with a focus on earnings growth in specific sectors.",
+    "We are cautiously optimistic about mid-cap segment performance in the coming quarter.",
+    "Inflationary pressures are being closely monitored; portfolio adjustments reflect defensive positioning where necessary.",
+    "Debt market yields are stabilizing, presenting opportunities in short to medium duration instruments.",
+    "Global economic factors remain a key watch point, influencing foreign institutional investment flows.",
+    "Technology and healthcare sectors are showing strong fundamentals for long-term growth.",
+    "Our strategic asset allocation remains consistent with long-term wealth creation objectives.",
+    "New regulatory changes are being analyzed for their impact on mutual fund operations and investor returns."
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    published REAL NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    body TEXT NOT NULL,
+    funds TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS notes_source ON notes (source);
+CREATE INDEX IF NOT EXISTS notes_published ON notes (published);
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+    title, body, funds, content='notes', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+    INSERT INTO notes_fts (rowid, title, body, funds) VALUES (new.id, new.title, new.body, new.funds);
+END;
+CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+    INSERT INTO notes_fts (notes_fts, rowid, title, body, funds) VALUES ('delete', old.id, old.title, old.body, old.funds);
+END;
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+
+def _recency_weight(published: float, now: float) -> float:
+    """RECENCY_FLOOR for very old notes, rising to 1 for one published `now` (both epoch seconds)."""
+    age_days = max(0.0, (now - published) / 86400)
+    return RECENCY_FLOOR + (1 - RECENCY_FLOOR) * math.pow(0.5, age_days / RECENCY_HALF_LIFE_DAYS)
+
+
+def _register_functions(connection):
+    connection.create_function('recency_weight', 2, _recency_weight, deterministic=True)
+
+
+def _parse_date(value: str, default: float) -> float:
+    for fmt in ('%Y-%m-%d', '%d-%b-%Y', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            return datetime.strptime(value.strip(), fmt).replace(tzinfo=timezone.utc).timestamp()
+        except (AttributeError, ValueError):
+            continue
+    return default
+
+
+def _funds_text(funds) -> str:
+    if isinstance(funds, str):
+        return funds
+    return ', '.join(funds or ())
+
+
+def parse_document(text: str, default_published: float) -> dict:
+    """Splits a note document into its optional headers and body."""
+    headers = {}
+    lines = text.splitlines()
+    for i, line in enumerate(lines):
+        match = re.match(r'^(Title|Date|Funds):\s*(.*)$', line, re.IGNORECASE)
+        if match is None:
+            body_start = i + 1 if not line.strip() and headers else i
+            break
+        headers[match.group(1).lower()] = match.group(2).strip()
+    else:
+        body_start = len(lines)
+    return {
+        'title': headers.get('title', ''),
+        'published': _parse_date(headers.get('date'), default_published),
+        'funds': headers.get('funds', ''),
+        'body': '\n'.join(lines[body_start:]).strip(),
+    }
+
+
+def search_query(category: str = None, fund_names=()) -> str:
+    """
+    FTS5 query matching the asset classes of the category or any of the fund names. Fund
+    names become quoted phrases, minus generic words such as "SBI", "Fund" or "Regular Plan".
+    """
+    def words(text, stopwords=STOPWORDS):
+        return [word for word in re.findall(r'[A-Za-z]+', text or '') if word.lower() not in stopwords]
+
+    terms = words(category, CATEGORY_STOPWORDS) + [' '.join(words(name)) for name in fund_names]
+    return ' OR '.join(dict.fromkeys(f'"{term}"' for term in terms if term))
+
+
+class NotesStore:
+    """Full-text index of fund manager notes with relevance and recency ranked retrieval."""
+
+    def __init__(self, path: str = NOTES_DB_PATH, pool_size: int = DEFAULT_POOL_SIZE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.pool = ConnectionPool(path, pool_size, on_connect=_register_functions)
+        with self.pool.connection() as connection:
+            connection.executescript(SCHEMA)
+        self._refreshed_at = {} # source -> monotonic time of its last scan
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self):
+        with self.pool.connection() as connection:
+            return connection.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+    def replace_source(self, source: str, notes: list, size: int = 0, mtime_ns: int = 0):
+        """Replaces every note of `source` with `notes` (dicts of title, body, published, funds)."""
+        rows = [(source, note['published'], note.get('title') or '', note['body'], _funds_text(note.get('funds')))
+                for note in notes if note.get('body')]
+        with self.pool.connection() as connection, connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM notes WHERE source = ?", (source,))
+            connection.executemany("INSERT INTO notes (source, published, title, body, funds) VALUES (?, ?, ?, ?, ?)", rows)
+            connection.execute("INSERT OR REPLACE INTO sources (path, size, mtime_ns) VALUES (?, ?, ?)",
+                               (source, size, mtime_ns))
+        return len(rows)
+
+    def remove_source(self, source: str):
+        with self.pool.connection() as connection, connection:
+            connection.execute("DELETE FROM notes WHERE source = ?", (source,))
+            connection.execute("DELETE FROM sources WHERE path = ?", (source,))
+
+    def source_versions(self) -> dict:
+        with self.pool.connection() as connection:
+            return {row['path']: (row['size'], row['mtime_ns']) for row in connection.execute("SELECT * FROM sources")}
+
+    def ingest(self, source: str) -> int:
+        """
+        Brings the index up to date with `source`, a notes directory or a single document
+        or feed file: new and changed files are (re)indexed and notes of deleted files
+        dropped. Returns the number of files re-read.
+        """
+        if os.path.isdir(source):
+            paths = []
+            for directory, _, names in os.walk(source):
+                paths += [os.path.join(directory, name) for name in sorted(names)
+                          if name.endswith(DOCUMENT_SUFFIXES + FEED_SUFFIXES)]
+        else:
+            paths = [source]
+        prefix = os.path.join(source, '') if os.path.isdir(source) else source
+        known = {path: version for path, version in self.source_versions().items()
+                 if path == source or path.startswith(prefix)}
+
+        changed = 0
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError: # Deleted since the directory was listed
+                continue
+            known_version = known.pop(path, None)
+            if known_version == (stat.st_size, stat.st_mtime_ns):
+                continue
+            self.replace_source(path, list(self._read_notes(path, stat.st_mtime)), stat.st_size, stat.st_mtime_ns)
+            changed += 1
+        for path in known: # Files that have disappeared
+            self.remove_source(path)
+        return changed
+
+    def _read_notes(self, path: str, mtime: float):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            if not path.endswith(FEED_SUFFIXES):
+                yield parse_document(f.read(), mtime)
+                return
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError: # Blank or truncated line, e.g. a feed still being written
+                    continue
+                yield {
+                    'title': item.get('title', ''),
+                    'published': _parse_date(item.get('date'), mtime),
+                    'funds': _funds_text(item.get('funds')),
+                    'body': item.get('body') or item.get('text') or '',
+                }
+
+    def refresh(self, source: str, min_interval: float = REFRESH_INTERVAL_SECONDS) -> int:
+        """ingest(source), at most once per `min_interval` seconds; concurrent callers skip it."""
+        now = time.monotonic()
+        if not self._refresh_lock.acquire(blocking=False):
+            return 0
+        try:
+            last = self._refreshed_at.get(source)
+            if last is not None and now - last < min_interval:
+                return 0
+            self._refreshed_at[source] = now
+            return self.ingest(source)
+        finally:
+            self._refresh_lock.release()
+
+    def search(self, category: str = None, fund_names=(), k: int = NOTES_PER_QUERY, now: float = None) -> list:
+        """
+        The k notes most relevant to a category and fund names, weighted by recency, topped
+        up with the most recent notes when fewer match.
+        """
+        now = time.time() if now is None else now
+        query = search_query(category, fund_names)
+        with self.pool.connection() as connection:
+            rows = []
+            if query:
+                rows = connection.execute(f"""
+                    SELECT n.title, n.body, n.funds, n.published, n.source
+                    FROM notes_fts JOIN notes AS n ON n.id = notes_fts.rowid
+                    WHERE notes_fts MATCH ?
+                    ORDER BY -bm25(notes_fts, {', '.join(map(str, BM25_WEIGHTS))}) * recency_weight(n.published, ?) DESC
+                    LIMIT ?
+                """, (query, now, k)).fetchall()
+            if len(rows) < k:
+                # Top up with the latest notes, e.g. for a category nobody has written about.
+                seen = {(row['source'], row['body']) for row in rows}
+                latest = connection.execute(
+                    "SELECT title, body, funds, published, source FROM notes ORDER BY published DESC LIMIT ?", (k + len(rows),)
+                ).fetchall()
+                rows += [row for row in latest if (row['source'], row['body']) not in seen][:k - len(rows)]
+        return [{
+            'title': row['title'],
+            'body': row['body'],
+            'funds': row['funds'],
+            'date': datetime.fromtimestamp(row['published'], timezone.utc).strftime('%Y-%m-%d'),
+        } for row in rows]
+
+    def close(self):
+        self.pool.close()
+
+
+_store = None
+_source = None
+_store_lock = threading.Lock()
+
+
+def get_notes_store():
+    """
+    Returns the process-wide NotesStore, indexing the NOTES_SOURCE secret or environment
+    variable (a directory or feed file) when one is set and the sample notes otherwise.
+    """
+    global _store, _source
+    with _store_lock:
+        if _store is None:
+            try:
+                import streamlit as st
+                source = st.secrets.get("NOTES_SOURCE")
+            except Exception: # No secrets file configured
+                source = None
+            _source = source or os.environ.get("NOTES_SOURCE")
+            _store = NotesStore()
+            if _source:
+                _store.remove_source(SAMPLE_SOURCE)
+            elif SAMPLE_SOURCE not in _store.source_versions():
+                published = time.time()
+                _store.replace_source(SAMPLE_SOURCE, [{'published': published, 'body': note} for note in SAMPLE_NOTES])
+        return _store
+
+
+def get_fund_manager_notes(category: str = None, fund_names=(), k: int = NOTES_PER_QUERY) -> list:
     """
-    Retrieves a list of recent fund manager insights.
-    In a real application, this would come from an internal CMS,
-    a database, or an RSS feed of official SBI MF insights.
+    Retrieves the fund manager insights most relevant to a recommendation: its category and
+    fund names, with recent notes weighted up. Returns dicts of title, body, funds and date.
+    In a real application, the notes would come from an internal CMS, a database, or an RSS
+    feed of official SBI MF insights exported to NOTES_SOURCE.
     """
-    notes = [
-        "Equity markets continue to show resilience, with a focus on earnings growth in specific sectors.",
-        "We are cautiously optimistic about mid-cap segment performance in the coming quarter.",
-        "Inflationary pressures are being closely monitored; portfolio adjustments reflect defensive positioning where necessary.",
-        "Debt market yields are stabilizing, presenting opportunities in short to medium duration instruments.",
-        "Global economic factors remain a key watch point, influencing foreign institutional investment flows.",
-        "Technology and healthcare sectors are showing strong fundamentals for long-term growth.",
-        "Our strategic asset allocation remains consistent with long-term wealth creation objectives.",
-        "New regulatory changes are being analyzed for their impact on mutual fund operations and investor returns."
-    ]
-    # Return a random subset or all notes for demonstration
-    return random.sample(notes, k=min(len(notes), 5)) # Get up to 5 random notes
+    store = get_notes_store()
+    if _source:
+        store.refresh(_source)
+    return store.search(category, fund_names, k)
@@ -1,6 +1,20 @@
-import pandas as pd
-import requests
-import streamlit as st # For accessing secrets
+# pandas is imported by the function that builds a frame, not when this module is imported.
+
+# Broker symbols for the indices shown on the dashboard.
+INDEX_SYMBOLS = {
+    'Nifty 50': 'NIFTY 50',
+    'Sensex': 'SENSEX',
+    'Nifty Bank': 'NIFTY BANK',
+    'Nifty Next 50': 'NIFTY NEXT 50'
+}
+
+def _quote_client():
+    """
+    The configured QuoteClient or None. modules.quote_client, and with it requests, is only
+    imported on the first quote lookup rather than when this module is.
+    """
+    from modules.quote_client import get_quote_client
+    return get_quote_client()
 
 def get_live_market_indices():
     """
@@ -14,6 +28,17 @@ def get_live_market_indices():
     # kite = KiteConnect(api_key=st.secrets["KITE_API_KEY"])
     # kite.set_access_token(st.secrets["KITE_ACCESS_TOKEN"])
     # # Then fetch quotes: kite.quote("NSE:NIFTY 50", "BSE:SENSEX")
+    import pandas as pd
+    client = _quote_client()
+    if client is not None:
+        quotes = client.get_quotes(INDEX_SYMBOLS.values())
+        rows = [(name, quotes.get(symbol)) for name, symbol in INDEX_SYMBOLS.items()]
+        return pd.DataFrame({
+            'Index': [name for name, quote in rows if quote],
+            'Value': [quote['current_price'] for _, quote in rows if quote],
+            'Change': [quote['change'] for _, quote in rows if quote],
+            'Change %': [quote['percent_change'] for _, quote in rows if quote]
+        })
 
     # Dummy data for demonstration
     data = {
@@ -44,6 +69,9 @@ def get_stock_data(ticker: str):
     #     'high': data.get('high'),
     #     'low': data.get('low')
     # }
+    client = _quote_client()
+    if client is not None:
+        return client.get_quotes([ticker]).get(ticker)
 
     # Dummy data for demonstration
     if ticker == "SBIN.NS":
@@ -58,3 +86,15 @@ def get_stock_data(ticker: str):
             'low': 790.00
         }
     return None
+
+def get_stock_data_many(tickers) -> dict:
+    """
+    Fetches live stock data for many tickers at once, e.g. every holding of our equity schemes.
+    Returns {ticker: stock data dict or None}, with the same dicts get_stock_data returns.
+    With a quote API configured, tickers are batched into as few upstream requests as possible
+    over a pooled session (see modules/quote_client.py); otherwise each falls back to get_stock_data.
+    """
+    client = _quote_client()
+    if client is not None:
+        return client.get_quotes(tickers)
+    return {ticker: get_stock_data(ticker) for ticker in dict.fromkeys(tickers)}
@@ -0,0 +1,287 @@
+import bisect
+import functools
+import os
+import threading
+import time
+import warnings
+from contextlib import contextmanager
+
+from modules.cache import get_caches
+
+# In-process instrumentation. Every dashboard section and data entry point records a
+# timing span: a call count, a latency histogram and an error count per span. Data
+# sources also count upstream errors, and the named caches in modules/cache.py report
+# their hits and misses. Everything is exported in the Prometheus text format, from a
+# local endpoint when METRICS_PORT is set (secret or environment variable):
+#   METRICS_PORT=9464 streamlit run app.py
+#   curl http://127.0.0.1:9464/metrics
+# Recording a span costs a couple of microseconds and holds one lock briefly. pandas and
+# http.server are only imported by the debug panel and the endpoint that need them.
+METRIC_PREFIX = 'fundgenius'
+LATENCY_BUCKETS_SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class SpanStats:
+    """Latency histogram, call and error counts, extremes and the last duration of one span."""
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS_SECONDS) + 1) # Last bucket is +Inf
+        self.count = 0
+        self.total_seconds = 0.0
+        self.errors = 0
+        self.last_seconds = None
+        self.min_seconds = float('inf')
+        self.max_seconds = 0.0
+
+    def observe(self, seconds: float, error: bool = False):
+        self.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS_SECONDS, seconds)] += 1
+        self.count += 1
+        self.total_seconds += seconds
+        self.errors += error
+        self.last_seconds = seconds
+        self.min_seconds = min(self.min_seconds, seconds)
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def quantile(self, q: float):
+        """
+        Estimates a latency quantile from the histogram, interpolating within a bucket whose
+        edges are narrowed to the smallest and largest durations seen.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.bucket_counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = max(LATENCY_BUCKETS_SECONDS[i - 1] if i > 0 else 0.0, self.min_seconds)
+                upper = min(LATENCY_BUCKETS_SECONDS[i] if i < len(LATENCY_BUCKETS_SECONDS) else self.max_seconds, self.max_seconds)
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.max_seconds
+
+
+_spans = {} # (kind, name) -> SpanStats
+_upstream_errors = {} # (source, reason) -> count
+_lock = threading.Lock()
+
+
+def observe(name: str, seconds: float, kind: str = 'function', error: bool = False):
+    """Records one timed call of span `name`."""
+    with _lock:
+        stats = _spans.get((kind, name))
+        if stats is None:
+            stats = _spans[(kind, name)] = SpanStats()
+        stats.observe(seconds, error)
+
+
+def count_upstream_error(source: str, reason: str):
+    """
+    Counts a failed upstream call, e.g. reason 'exception', 'empty' or 'timeout'. `source` is
+    the data source's span name, i.e. its function name, whichever way the call failed.
+    """
+    with _lock:
+        _upstream_errors[(source, reason)] = _upstream_errors.get((source, reason), 0) + 1
+
+
+@contextmanager
+def span(name: str, kind: str = 'section'):
+    """Times the enclosed block as span `name`; an exception counts as an error and propagates."""
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        observe(name, time.perf_counter() - started, kind, error)
+
+
+def timed(name: str = None, kind: str = 'function', upstream: bool = False, error_if=None):
+    """
+    Decorator that records a span for every call. With `upstream=True` the function is a
+    data source: exceptions, and results for which `error_if(result)` is true (e.g. the empty
+    frame a source returns after showing its own error), also count as upstream errors.
+    """
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                observe(span_name, time.perf_counter() - started, kind, error=True)
+                if upstream:
+                    count_upstream_error(span_name, 'exception')
+                raise
+            failed = error_if is not None and error_if(result)
+            observe(span_name, time.perf_counter() - started, kind, error=failed)
+            if upstream and failed:
+                count_upstream_error(span_name, 'empty')
+            return result
+        return wrapper
+    return decorator
+
+
+def span_snapshot() -> dict:
+    """Copies of every span's stats, keyed by (kind, name)."""
+    with _lock:
+        snapshot = {}
+        for key, stats in _spans.items():
+            copy = SpanStats()
+            copy.__dict__.update(stats.__dict__)
+            copy.bucket_counts = list(stats.bucket_counts)
+            snapshot[key] = copy
+        return snapshot
+
+
+def upstream_error_snapshot() -> dict:
+    with _lock:
+        return dict(_upstream_errors)
+
+
+def reset():
+    """Clears every recorded span and error count (e.g. between benchmark runs)."""
+    with _lock:
+        _spans.clear()
+        _upstream_errors.clear()
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels) -> str:
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render_prometheus() -> str:
+    """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+    p = METRIC_PREFIX
+    lines = [
+        f"# HELP {p}_span_duration_seconds Latency of dashboard sections and module entry points.",
+        f"# TYPE {p}_span_duration_seconds histogram",
+    ]
+    spans = span_snapshot()
+    for (kind, name), stats in sorted(spans.items()):
+        cumulative = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS_SECONDS + ('+Inf',), stats.bucket_counts):
+            cumulative += bucket_count
+            le = bound if bound == '+Inf' else _number(bound)
+            lines.append(f"{p}_span_duration_seconds_bucket{_labels(span=name, kind=kind, le=le)} {cumulative}")
+        lines.append(f"{p}_span_duration_seconds_sum{_labels(span=name, kind=kind)} {_number(stats.total_seconds)}")
+        lines.append(f"{p}_span_duration_seconds_count{_labels(span=name, kind=kind)} {stats.count}")
+
+    lines += [f"# HELP {p}_span_errors_total Calls of a span that raised or returned an error result.",
+              f"# TYPE {p}_span_errors_total counter"]
+    lines += [f"{p}_span_errors_total{_labels(span=name, kind=kind)} {stats.errors}"
+              for (kind, name), stats in sorted(spans.items())]
+
+    lines += [f"# HELP {p}_upstream_errors_total Failed upstream data calls by source and reason.",
+              f"# TYPE {p}_upstream_errors_total counter"]
+    lines += [f"{p}_upstream_errors_total{_labels(source=source, reason=reason)} {count}"
+              for (source, reason), count in sorted(upstream_error_snapshot().items())]
+
+    caches = sorted(get_caches().items())
+    for metric, kind, help_text, value in (
+        ('cache_hits_total', 'counter', 'Cache lookups served from the cache.', lambda c: c.hits),
+        ('cache_misses_total', 'counter', 'Cache lookups that went upstream.', lambda c: c.misses),
+        ('cache_hit_ratio', 'gauge', 'Share of cache lookups served from the cache.',
+         lambda c: c.hits / (c.hits + c.misses) if c.hits + c.misses else 0),
+        ('cache_entries', 'gauge', 'Entries currently held by the cache.', len),
+    ):
+        lines += [f"# HELP {p}_{metric} {help_text}", f"# TYPE {p}_{metric} {kind}"]
+        lines += [f"{p}_{metric}{_labels(cache=name)} {_number(value(cache))}" for name, cache in caches]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_tables() -> tuple:
+    """(spans, caches, upstream_errors) DataFrames for the in-app debug panel, slowest spans first."""
+    import pandas as pd
+    spans = pd.DataFrame([
+        {
+            'Span': name,
+            'Kind': kind,
+            'Calls': stats.count,
+            'Errors': stats.errors,
+            'Mean (ms)': stats.total_seconds / stats.count * 1000,
+            'p50 (ms)': stats.quantile(0.5) * 1000,
+            'p95 (ms)': stats.quantile(0.95) * 1000,
+            'Last (ms)': stats.last_seconds * 1000,
+        }
+        for (kind, name), stats in span_snapshot().items() if stats.count
+    ], columns=['Span', 'Kind', 'Calls', 'Errors', 'Mean (ms)', 'p50 (ms)', 'p95 (ms)', 'Last (ms)'])
+    caches = pd.DataFrame([
+        {'Cache': name, 'Hits': cache.hits, 'Misses': cache.misses, 'Entries': len(cache),
+         'Hit Ratio': cache.hits / (cache.hits + cache.misses) if cache.hits + cache.misses else None}
+        for name, cache in sorted(get_caches().items())
+    ], columns=['Cache', 'Hits', 'Misses', 'Entries', 'Hit Ratio'])
+    errors = pd.DataFrame([
+        {'Source': source, 'Reason': reason, 'Count': count}
+        for (source, reason), count in sorted(upstream_error_snapshot().items())
+    ], columns=['Source', 'Reason', 'Count'])
+    return spans.sort_values('p95 (ms)', ascending=False), caches, errors
+
+
+def _serve_metrics(handler):
+    """GET handler of the metrics endpoint."""
+    if handler.path.split('?')[0] != '/metrics':
+        handler.send_error(404)
+        return
+    body = render_prometheus().encode()
+    handler.send_response(200)
+    handler.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+    handler.send_header('Content-Length', str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def start_metrics_server(port: int, host: str = '127.0.0.1'):
+    """Serves /metrics on host:port from a daemon thread and returns the ThreadingHTTPServer."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        do_GET = _serve_metrics
+
+        def log_message(self, format, *args):
+            pass # Scrapes every few seconds would flood the Streamlit log
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
+
+
+_server = None
+_server_resolved = False # Configured and started (or failed) once per process, also when no port is set
+_server_lock = threading.Lock()
+
+
+def get_metrics_server():
+    """
+    Returns the process-wide metrics endpoint for the METRICS_PORT secret or environment
+    variable (bound to METRICS_HOST, default 127.0.0.1), starting it on first use, or None
+    when no port is configured or it could not be bound.
+    """
+    global _server, _server_resolved
+    with _server_lock:
+        if not _server_resolved:
+            _server_resolved = True
+            try:
+                import streamlit as st
+                port = st.secrets.get("METRICS_PORT")
+            except Exception: # No secrets file configured
+                port = None
+            port = port or os.environ.get("METRICS_PORT")
+            if port:
+                try:
+                    _server = start_metrics_server(int(port), os.environ.get("METRICS_HOST", '127.0.0.1'))
+                except OSError as e: # Port taken, e.g. by a second app process; carry on without it
+                    warnings.warn(f"Metrics endpoint not started on port {port}: {e}")
+        return _server
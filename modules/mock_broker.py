@@ -0,0 +1,275 @@
+import argparse
+import json
+import random
+import socketserver
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# A local stand-in for a broker quote API (see modules/quote_client.py for the contract),
+# for exercising throughput and failure handling without network access:
+#   python -m modules.mock_broker --port 8765 --latency 0.05 --failure-rate 0.05
+#   MARKET_DATA_API_URL=http://127.0.0.1:8765 streamlit run app.py
+# MockTickPublisher is the matching stand-in for the streaming tick feed (modules/tick_feed.py):
+#   python -m modules.mock_broker --port 8765 --ticks-port 8766
+#   TICK_FEED_ADDRESS=127.0.0.1:8766 streamlit run app.py
+# Prices are a deterministic per-symbol random walk, so repeated runs are comparable.
+STOCK_NAMES = {
+    'SBIN.NS': 'State Bank of India',
+    'RELIANCE.NS': 'Reliance Industries',
+    'HDFCBANK.NS': 'HDFC Bank',
+    'INFY.NS': 'Infosys',
+    'TCS.NS': 'Tata Consultancy Services',
+}
+
+
+class MockBroker:
+    """
+    Threaded HTTP quote server with configurable latency, random 5xx failures, a request
+    rate limit (429 + Retry-After) and a cap on symbols per request (400 when exceeded).
+    Use as a context manager or call start()/stop(); `url` is set once started.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, failure_rate: float = 0.0,
+                 requests_per_second: float = None, max_symbols: int = 500, seed: int = 0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.requests_per_second = requests_per_second
+        self.max_symbols = max_symbols
+        self.random = random.Random(seed)
+        self.requests_served = 0
+        self.symbols_served = 0
+        self.failures_returned = 0
+        self.rate_limited = 0
+        self.url = None
+        self._window_start = time.monotonic()
+        self._window_requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def quote(self, symbol: str) -> dict:
+        """Deterministic quote for `symbol` that drifts slowly with wall-clock time."""
+        base = 100 + zlib.crc32(symbol.encode()) % 4900
+        minute = int(time.time() // 60)
+        walk = random.Random(f"{symbol}:{minute}")
+        price = round(base * (1 + walk.uniform(-0.02, 0.02)), 2)
+        open_price = round(base * (1 + walk.uniform(-0.01, 0.01)), 2)
+        change = round(price - open_price, 2)
+        return {
+            'symbol': symbol,
+            'name': STOCK_NAMES.get(symbol, symbol),
+            'current_price': price,
+            'change': change,
+            'percent_change': round(change / open_price * 100, 2),
+            'open': open_price,
+            'high': round(max(price, open_price) * 1.005, 2),
+            'low': round(min(price, open_price) * 0.995, 2),
+        }
+
+    def _admit(self):
+        """Returns (status, retry_after) for the next request under the rate limit and failure rate."""
+        with self._lock:
+            if self.requests_per_second is not None:
+                now = time.monotonic()
+                if now - self._window_start >= 1.0:
+                    self._window_start, self._window_requests = now, 0
+                if self._window_requests >= self.requests_per_second:
+                    self.rate_limited += 1
+                    return 429, max(0.01, 1.0 - (now - self._window_start))
+                self._window_requests += 1
+            if self.failure_rate and self.random.random() < self.failure_rate:
+                self.failures_returned += 1
+                return 503, None
+            return 200, None
+
+    def _handler(self):
+        broker = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1' # Keep-alive, like a real broker API
+
+            def _send(self, status: int, payload: dict, headers: dict = None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != '/quotes':
+                    self._send(404, {'error': 'not found'})
+                    return
+                symbols = [s for s in parse_qs(url.query).get('symbols', [''])[0].split(',') if s]
+                if broker.latency:
+                    time.sleep(broker.latency)
+                status, retry_after = broker._admit()
+                if status == 429:
+                    self._send(429, {'error': 'rate limited'}, {'Retry-After': f"{retry_after:.3f}"})
+                    return
+                if status != 200:
+                    self._send(status, {'error': 'upstream unavailable'})
+                    return
+                if len(symbols) > broker.max_symbols:
+                    self._send(400, {'error': f'at most {broker.max_symbols} symbols per request'})
+                    return
+                with broker._lock:
+                    broker.requests_served += 1
+                    broker.symbols_served += len(symbols)
+                self._send(200, {'quotes': {s: broker.quote(s) for s in symbols}})
+
+            def log_message(self, format, *args):
+                pass # Keep benchmark and test output quiet
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_port
+        self.url = f"http://{self.host}:{self.port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-broker', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class MockTickPublisher:
+    """
+    TCP server that broadcasts line-delimited JSON ticks for `symbols` to every connected
+    subscriber, about `ticks_per_second` ticks per symbol per second.
+    """
+
+    def __init__(self, symbols, host: str = '127.0.0.1', port: int = 0, ticks_per_second: float = 2.0, seed: int = 0):
+        self.symbols = list(symbols)
+        self.host = host
+        self.port = port
+        self.ticks_per_second = ticks_per_second
+        self.random = random.Random(seed)
+        self.ticks_published = 0
+        self.address = None
+        self._clients = []
+        self._clients_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server = None
+        self._threads = []
+
+    def _handler(self):
+        publisher = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                with publisher._clients_lock:
+                    publisher._clients.append(self.request)
+                # Hold the connection open until the subscriber goes away or we stop.
+                while not publisher._stop.is_set():
+                    try:
+                        if not self.request.recv(1024):
+                            break
+                    except OSError:
+                        break
+                with publisher._clients_lock:
+                    if self.request in publisher._clients:
+                        publisher._clients.remove(self.request)
+
+        return Handler
+
+    def _publish(self):
+        prices = {s: float(100 + zlib.crc32(s.encode()) % 4900) for s in self.symbols}
+        opens = dict(prices)
+        while not self._stop.wait(1.0 / self.ticks_per_second):
+            lines = []
+            for symbol in self.symbols:
+                prices[symbol] = round(prices[symbol] * (1 + self.random.gauss(0, 0.0005)), 2)
+                lines.append(json.dumps({'symbol': symbol, 'price': prices[symbol], 'open': opens[symbol], 'ts': time.time()}))
+            payload = ('\n'.join(lines) + '\n').encode()
+            with self._clients_lock:
+                clients = list(self._clients)
+            for client in clients:
+                try:
+                    client.sendall(payload)
+                except OSError:
+                    with self._clients_lock:
+                        if client in self._clients:
+                            self._clients.remove(client)
+            self.ticks_published += len(lines)
+
+    def start(self):
+        self._server = socketserver.ThreadingTCPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self.address = f"{self.host}:{self.port}"
+        self._threads = [
+            threading.Thread(target=self._server.serve_forever, name='tick-server', daemon=True),
+            threading.Thread(target=self._publish, name='tick-publisher', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._clients_lock:
+            for client in self._clients:
+                try:
+                    client.close()
+                except OSError:
+                    pass
+            self._clients.clear()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock broker quote API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every request.")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Fraction of requests answered with 503.")
+    parser.add_argument('--requests-per-second', type=float, default=None, help="Rate limit; excess requests get 429.")
+    parser.add_argument('--max-symbols', type=int, default=500, help="Most symbols accepted per request.")
+    parser.add_argument('--ticks-port', type=int, default=None, help="Also publish a tick feed on this port.")
+    parser.add_argument('--tick-symbols', default='NIFTY 50,SENSEX,NIFTY BANK,NIFTY NEXT 50,SBIN.NS',
+                        help="Comma-separated symbols for the tick feed.")
+    args = parser.parse_args()
+    broker = MockBroker(args.host, args.port, args.latency, args.failure_rate, args.requests_per_second, args.max_symbols)
+    broker.start()
+    print(f"Mock broker listening on {broker.url}")
+    if args.ticks_port is not None:
+        publisher = MockTickPublisher(args.tick_symbols.split(','), args.host, args.ticks_port).start()
+        print(f"Mock tick feed publishing on {publisher.address}")
+    try:
+        broker._thread.join()
+    except KeyboardInterrupt:
+        broker.stop()
+
+
+if __name__ == '__main__':
+    main()
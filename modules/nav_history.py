@@ -0,0 +1,341 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError: # Windows: appends are serialised within a process only
+    fcntl = None
+
+# Daily NAVs are kept as three append-only, fixed-width column files, one row per
+# (date, scheme) pair, sorted by date and then scheme code:
+#   dates.i4   int32    days since 1970-01-01
+#   codes.i4   int32    AMFI scheme code
+#   navs.f8    float64  net asset value
+# A day's rows are contiguous, so any date range is one slice of every column and can be
+# read straight off numpy.memmap views without copying. Within a day, rows are sorted by
+# scheme code, so one scheme's series is a binary search per day rather than a scan of every
+# row. Scheme names seen at ingest are kept alongside in scheme_names.json, so callers can
+# resolve names to scheme codes. Several server processes may share a store: writers take
+# an exclusive lock on append.lock, and re-check what is stored once they hold it.
+# AMFI publishes some schemes late, so a later fetch of the last stored day can carry codes
+# that day lacks. Those are merged into it: the day's rows are the tail of every column, so
+# they are rewritten in place, growing the files and never shrinking them under a reader's
+# mapping. The old rows are journalled first, and a merge cut short is rolled back by the next
+# writer. A reader in another process querying that day during the few milliseconds of a
+# merge may see a mix of its old and merged rows.
+NAV_HISTORY_DIR = os.environ.get("NAV_HISTORY_DIR", os.path.join("data", "nav_history"))
+COLUMNS = {
+    'dates': ('dates.i4', np.int32),
+    'codes': ('codes.i4', np.int32),
+    'navs': ('navs.f8', np.float64),
+}
+SCHEME_NAMES_FILE = 'scheme_names.json'
+LOCK_FILE = 'append.lock'
+JOURNAL_FILE = 'merge.journal.npz'
+
+
+def to_day_number(value) -> int:
+    """Converts a date-like value (str, date, Timestamp, datetime64) to days since 1970-01-01."""
+    return int(pd.Timestamp(value).to_datetime64().astype('datetime64[D]').astype(np.int64))
+
+
+def from_day_numbers(days) -> pd.DatetimeIndex:
+    """Converts int32 day numbers back to a DatetimeIndex."""
+    return pd.DatetimeIndex(np.asarray(days, dtype='int64').astype('datetime64[D]'))
+
+
+class NavHistoryStore:
+    """
+    Append-only columnar NAV history on disk.
+    Reads go through numpy.memmap, remapped only when an append has grown the files.
+    Appends write one day of rows to the end of each column; only the last day is ever rewritten,
+    to merge in schemes published late.
+    """
+
+    def __init__(self, root: str = NAV_HISTORY_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.RLock()
+        self._maps = None
+        self._mapped_rows = -1
+        self._names = None
+        self._names_mtime = None
+        self._segments = None
+        self._segment_rows = -1
+        self._write_depth = 0
+
+    def _path(self, column: str) -> str:
+        return os.path.join(self.root, COLUMNS[column][0])
+
+    def __len__(self):
+        # The dates column is written last on append, so its length is the committed row count.
+        path = self._path('dates')
+        return os.path.getsize(path) // np.dtype(np.int32).itemsize if os.path.exists(path) else 0
+
+    def _columns(self) -> dict:
+        """Returns read-only memmaps of every column, trimmed to the committed row count."""
+        n_rows = len(self)
+        with self._lock:
+            if self._mapped_rows != n_rows:
+                if n_rows == 0:
+                    self._maps = {name: np.empty(0, dtype=dtype) for name, (_, dtype) in COLUMNS.items()}
+                else:
+                    self._maps = {
+                        name: np.memmap(self._path(name), dtype=dtype, mode='r', shape=(n_rows,))
+                        for name, (_, dtype) in COLUMNS.items()
+                    }
+                self._mapped_rows = n_rows
+            return self._maps
+
+    @contextmanager
+    def _write_lock(self):
+        """Held while writing: excludes other threads of this process and, through append.lock, other processes."""
+        with self._lock:
+            if fcntl is None or self._write_depth: # No flock here, or nested in this thread's own hold
+                self._write_depth += 1
+                try:
+                    if self._write_depth == 1:
+                        self._roll_back_merge()
+                    yield
+                finally:
+                    self._write_depth -= 1
+                return
+            fd = os.open(os.path.join(self.root, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                self._write_depth = 1
+                self._roll_back_merge()
+                yield
+            finally:
+                self._write_depth = 0
+                os.close(fd) # Releases the lock
+
+    def _day_segments(self) -> tuple:
+        """(days, starts, ends): every stored day and the row range holding it."""
+        dates = self._columns()['dates']
+        with self._lock:
+            if self._segment_rows != len(dates):
+                starts = np.flatnonzero(np.concatenate(([True], dates[1:] != dates[:-1]))) if len(dates) else np.empty(0, dtype=np.int64)
+                self._segments = (np.asarray(dates[starts]), starts, np.append(starts[1:], len(dates)))
+                self._segment_rows = len(dates)
+            return self._segments
+
+    def last_date(self):
+        """Returns the most recent stored day number, or None for an empty store."""
+        dates = self._columns()['dates']
+        return int(dates[-1]) if len(dates) else None
+
+    def append_day(self, date, scheme_codes, navs) -> int:
+        """
+        Appends one day of NAVs and returns the number of rows written.
+        Days must arrive in order: re-appending the last stored day only adds the schemes it
+        lacks (stored NAVs are kept), and an earlier day raises ValueError since it would
+        have to be inserted mid-file.
+        """
+        day = to_day_number(date)
+        codes = np.asarray(scheme_codes, dtype=np.int32)
+        values = np.asarray(navs, dtype=np.float64)
+        if codes.shape != values.shape:
+            raise ValueError("scheme_codes and navs must have the same length.")
+        keep = ~np.isnan(values)
+        codes, values = codes[keep], values[keep]
+        order = np.argsort(codes, kind='stable')
+        codes, values = codes[order], values[order]
+        if len(codes) and np.any(codes[1:] == codes[:-1]):
+            raise ValueError("Duplicate scheme codes in one day of NAVs.")
+
+        with self._write_lock():
+            # Re-read under the lock: another process may have appended this day meanwhile.
+            last = self.last_date()
+            if last is not None and day == last:
+                return self._merge_last_day(codes, values)
+            if last is not None and day < last:
+                raise ValueError(f"NAV history is append-only; {from_day_numbers([day])[0].date()} is before the last stored day.")
+            if not len(codes):
+                return 0
+
+            committed = len(self)
+            for name in ('codes', 'navs', 'dates'): # dates last: it marks the rows as committed
+                column = {'codes': codes, 'navs': values, 'dates': np.full(len(codes), day, dtype=np.int32)}[name]
+                with open(self._path(name), 'ab') as f:
+                    # Drop any torn tail left by an interrupted append before writing.
+                    f.truncate(committed * column.itemsize)
+                    f.write(column.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+        return len(codes)
+
+    def _merge_last_day(self, codes: np.ndarray, values: np.ndarray) -> int:
+        """Adds the (sorted) codes the last stored day lacks to it. Call with the write lock held."""
+        days, starts, ends = self._day_segments()
+        start, end = int(starts[-1]), int(ends[-1])
+        columns = self._columns()
+        stored_codes, stored_navs = np.array(columns['codes'][start:end]), np.array(columns['navs'][start:end])
+        new = ~np.isin(codes, stored_codes)
+        if not new.any():
+            return 0
+        merged_codes = np.concatenate((stored_codes, codes[new]))
+        order = np.argsort(merged_codes, kind='stable')
+        merged = {'codes': merged_codes[order], 'navs': np.concatenate((stored_navs, values[new]))[order]}
+
+        committed = len(self)
+        journal = os.path.join(self.root, JOURNAL_FILE)
+        with open(journal + '.tmp', 'wb') as f:
+            np.savez(f, rows=committed, start=start, codes=stored_codes, navs=stored_navs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(journal + '.tmp', journal)
+        for name in ('codes', 'navs'):
+            with open(self._path(name), 'r+b') as f:
+                f.seek(start * merged[name].itemsize)
+                f.write(merged[name].tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        with open(self._path('dates'), 'ab') as f: # Last, as on append: it commits the added rows
+            f.truncate(committed * np.dtype(np.int32).itemsize)
+            f.write(np.full(int(new.sum()), days[-1], dtype=np.int32).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.remove(journal)
+        return int(new.sum())
+
+    def _roll_back_merge(self):
+        """Restores the last day's rows if a merge was interrupted before it committed."""
+        journal = os.path.join(self.root, JOURNAL_FILE)
+        if not os.path.exists(journal):
+            return
+        with np.load(journal) as saved:
+            if len(self) != int(saved['rows']): # The merge committed; only the cleanup was cut short
+                os.remove(journal)
+                return
+            start = int(saved['start'])
+            for name in ('codes', 'navs'):
+                with open(self._path(name), 'r+b') as f:
+                    f.seek(start * saved[name].itemsize)
+                    f.write(saved[name].tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+        os.remove(journal)
+
+    def _row_range(self, start=None, end=None) -> tuple:
+        dates = self._columns()['dates']
+        lo = 0 if start is None else int(np.searchsorted(dates, np.int32(to_day_number(start)), side='left'))
+        hi = len(dates) if end is None else int(np.searchsorted(dates, np.int32(to_day_number(end)), side='right'))
+        return lo, max(lo, hi)
+
+    def get_range(self, start=None, end=None) -> tuple:
+        """
+        Whole-universe range query over [start, end], both inclusive.
+        Returns (dates, codes, navs) as read-only memmap slices; nothing is copied.
+        """
+        lo, hi = self._row_range(start, end)
+        columns = self._columns()
+        return columns['dates'][lo:hi], columns['codes'][lo:hi], columns['navs'][lo:hi]
+
+    def get_schemes(self, scheme_codes, start=None, end=None) -> tuple:
+        """
+        Range query over [start, end] for `scheme_codes` only. Returns (dates, codes, navs)
+        arrays in date and then code order. Each (day, scheme) row is found by a binary
+        search within that day's rows, so the cost grows with days times schemes, not rows.
+        """
+        columns = self._columns()
+        days, starts, ends = self._day_segments()
+        first = 0 if start is None else int(np.searchsorted(days, to_day_number(start), side='left'))
+        last = len(days) if end is None else int(np.searchsorted(days, to_day_number(end), side='right'))
+        wanted = np.unique(np.asarray(scheme_codes, dtype=np.int32))
+        if last <= first or not len(wanted):
+            return tuple(np.empty(0, dtype=dtype) for _, dtype in COLUMNS.values())
+
+        codes = columns['codes']
+        targets = np.tile(wanted, last - first)
+        low = np.repeat(starts[first:last], len(wanted))
+        segment_ends = np.repeat(ends[first:last], len(wanted))
+        high = segment_ends.copy()
+        for _ in range(int((high - low).max()).bit_length()):
+            active = low < high
+            middle = (low + high) // 2
+            right = active & (codes[np.minimum(middle, len(codes) - 1)] < targets)
+            low = np.where(right, middle + 1, low)
+            high = np.where(active & ~right, middle, high)
+        found = low < segment_ends
+        found[found] = codes[low[found]] == targets[found]
+        rows = low[found]
+        return columns['dates'][rows], columns['codes'][rows], columns['navs'][rows]
+
+    def get_nav_series(self, scheme_code: int, start=None, end=None) -> pd.Series:
+        """Returns one scheme's NAVs over [start, end] as a Series indexed by date."""
+        dates, _, navs = self.get_schemes([scheme_code], start, end)
+        return pd.Series(navs, index=from_day_numbers(dates), name=scheme_code)
+
+    def scheme_names(self) -> dict:
+        """Returns {scheme code: latest scheme name} for every scheme ingested with a name."""
+        path = os.path.join(self.root, SCHEME_NAMES_FILE)
+        with self._lock:
+            mtime = os.path.getmtime(path) if os.path.exists(path) else None
+            if mtime is None:
+                self._names, self._names_mtime = {}, None
+            elif mtime != self._names_mtime:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._names = {int(code): name for code, name in json.load(f).items()}
+                self._names_mtime = mtime
+            return dict(self._names or {})
+
+    def _record_scheme_names(self, navs_df: pd.DataFrame):
+        if 'Scheme Name' not in navs_df.columns:
+            return
+        path = os.path.join(self.root, SCHEME_NAMES_FILE)
+        with self._write_lock():
+            names = self.scheme_names()
+            updates = {int(code): name for code, name in zip(navs_df['Scheme Code'], navs_df['Scheme Name']) if names.get(int(code)) != name}
+            if not updates:
+                return
+            names.update(updates)
+            # Write-then-rename so readers never see a half-written file.
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({str(code): name for code, name in sorted(names.items())}, f)
+            os.replace(path + '.tmp', path)
+
+    def ingest_navs(self, navs_df: pd.DataFrame) -> int:
+        """
+        Appends a NAV frame as returned by get_latest_navs_for_sbi ('Scheme Code', 'NAV', 'Date').
+        Rows dated before the last stored day are skipped, and of rows dated on it only schemes
+        it lacks are added, so ingesting the same file twice is harmless. Returns the number of
+        rows written.
+        """
+        if navs_df is None or navs_df.empty:
+            return 0
+        frame = navs_df.dropna(subset=['Scheme Code', 'NAV', 'Date'])
+        day_numbers = pd.to_datetime(frame['Date']).to_numpy().astype('datetime64[D]').astype(np.int64)
+        written = 0
+        with self._write_lock(): # So no other process appends a later day between these
+            self._record_scheme_names(frame)
+            last = self.last_date()
+            for day in np.unique(day_numbers):
+                if last is not None and day < last:
+                    continue
+                rows = frame[day_numbers == day]
+                written += self.append_day(from_day_numbers([day])[0], rows['Scheme Code'], rows['NAV'])
+        return written
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_store() -> NavHistoryStore:
+    """Returns the process-wide store rooted at NAV_HISTORY_DIR."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = NavHistoryStore()
+        return _default_store
+
+
+def get_nav_series(scheme_code: int, start=None, end=None) -> pd.Series:
+    """Returns one scheme's stored NAVs over [start, end] from the default store."""
+    return get_default_store().get_nav_series(scheme_code, start, end)
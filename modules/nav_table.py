@@ -0,0 +1,137 @@
+import bisect
+import math
+import re
+import threading
+from collections import defaultdict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+# The NAV table in app.py is searched, sorted and paginated here, on the server, so only
+# the visible page is sent to the browser however many schemes the NAVs cover.
+# Scheme names are split into lowercase words when a NAV frame is first shown, and each
+# word maps to the sorted row numbers of the names containing it. A search term matches
+# every word that contains it, found through a trigram index over the (much smaller) word
+# vocabulary, so "cap" also finds "Smallcap"; terms under three letters, as typed so far,
+# match word prefixes instead. Rows must match every term. Sort orders are computed once
+# per column and direction, so a page of a search is an intersection of a few posting
+# arrays and a sort of the matches.
+# The index is built on the first render after each NAV fetch, not in the fetch itself:
+# a process that picks NAVs up from another's shared snapshot (modules/snapshot_store.py)
+# never runs the fetch, and the index cannot be shared that way. It is kept per fetch time,
+# so reruns reuse it until NAVs are fetched again.
+PAGE_SIZES = (25, 50, 100)
+DEFAULT_PAGE_SIZE = 50
+TRIGRAM = 3
+_WORD = re.compile(r'[a-z0-9]+')
+
+NavPage = namedtuple('NavPage', ['rows', 'matches', 'page', 'pages'])
+
+
+def search_terms(text: str) -> list:
+    """The lowercase words of `text`, as indexed for scheme names and searched for in queries."""
+    return _WORD.findall(str(text).lower())
+
+
+def _trigrams(word: str) -> set:
+    return {word[i:i + TRIGRAM] for i in range(len(word) - TRIGRAM + 1)}
+
+
+class NavTable:
+    """A NAV frame as returned by get_latest_navs_for_sbi, indexed for searching by scheme name."""
+
+    def __init__(self, navs_df: pd.DataFrame):
+        self.frame = navs_df.reset_index(drop=True)
+        rows_by_word = defaultdict(list)
+        for row, name in enumerate(self.frame['Scheme Name'].tolist()):
+            for word in dict.fromkeys(search_terms(name)): # Each word once per name, in order
+                rows_by_word[word].append(row)
+        self._words = sorted(rows_by_word)
+        self._postings = [np.asarray(rows_by_word[word], dtype=np.int32) for word in self._words]
+        words_by_trigram = defaultdict(list)
+        for index, word in enumerate(self._words):
+            for trigram in _trigrams(word):
+                words_by_trigram[trigram].append(index)
+        self._trigrams = {trigram: np.asarray(indices, dtype=np.int32) for trigram, indices in words_by_trigram.items()}
+        self._ranks = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frame)
+
+    def _matching_words(self, term: str) -> list:
+        if len(term) < TRIGRAM:
+            start = bisect.bisect_left(self._words, term)
+            end = bisect.bisect_left(self._words, term + '\uffff')
+            return list(range(start, end))
+        candidates = None
+        for trigram in sorted(_trigrams(term), key=lambda t: len(self._trigrams.get(t, ()))):
+            indices = self._trigrams.get(trigram)
+            if indices is None:
+                return []
+            candidates = indices if candidates is None else np.intersect1d(candidates, indices, assume_unique=True)
+        # Every trigram of the term occurring in a word does not yet mean the term does.
+        return [index for index in candidates.tolist() if term in self._words[index]]
+
+    def search(self, query: str = '') -> np.ndarray:
+        """Row numbers, in frame order, of the schemes whose names contain every word of `query`."""
+        matches = None
+        for term in sorted(set(search_terms(query)), key=len, reverse=True): # Longest, most selective first
+            words = self._matching_words(term)
+            if not words:
+                return np.empty(0, dtype=np.int32)
+            rows = self._postings[words[0]] if len(words) == 1 else np.unique(np.concatenate([self._postings[i] for i in words]))
+            matches = rows if matches is None else np.intersect1d(matches, rows, assume_unique=True)
+            if not len(matches):
+                break
+        return np.arange(len(self.frame), dtype=np.int32) if matches is None else matches
+
+    def _rank(self, column: str, descending: bool) -> tuple:
+        """(order, rank): the rows sorted by `column` with missing values last, and each row's place in that order."""
+        key = (column, descending)
+        with self._lock:
+            if key not in self._ranks:
+                order = self.frame[column].sort_values(ascending=not descending, na_position='last', kind='stable').index.to_numpy()
+                rank = np.empty(len(order), dtype=np.int64)
+                rank[order] = np.arange(len(order))
+                self._ranks[key] = (order, rank)
+            return self._ranks[key]
+
+    def page(self, query: str = '', sort_by: str = None, descending: bool = False, page: int = 1,
+             page_size: int = DEFAULT_PAGE_SIZE) -> NavPage:
+        """
+        One page of the schemes matching `query`, sorted by `sort_by` (frame order if None).
+        `page` is 1-based and clamped to the pages there are. Returns a NavPage with the
+        page's `rows` as a DataFrame, the number of `matches`, the `page` shown and `pages`.
+        """
+        if sort_by is not None and sort_by not in self.frame.columns:
+            raise ValueError(f"Cannot sort NAVs by unknown column {sort_by!r}.")
+        matches = self.search(query)
+        if sort_by is not None:
+            order, rank = self._rank(sort_by, descending)
+            matches = order if len(matches) == len(self.frame) else matches[np.argsort(rank[matches], kind='stable')]
+        pages = max(1, math.ceil(len(matches) / page_size))
+        page = min(max(1, int(page)), pages)
+        visible = matches[(page - 1) * page_size:page * page_size]
+        return NavPage(self.frame.iloc[visible], len(matches), page, pages)
+
+
+_table_lock = threading.Lock()
+_table = (None, None) # (fetched_at of the NAV frame, its NavTable)
+
+
+def get_nav_table(navs_df: pd.DataFrame, fetched_at: float = None) -> NavTable:
+    """
+    Returns the NavTable of `navs_df`, the NAV frame fetched at `fetched_at` (epoch seconds),
+    building it only when NAVs have been fetched since the table was last built. Without
+    a `fetched_at` (an uncached frame), the table is built for this call only.
+    """
+    global _table
+    if fetched_at is None:
+        return NavTable(navs_df)
+    with _table_lock:
+        built_for, table = _table
+        if built_for != fetched_at:
+            table = NavTable(navs_df)
+            _table = (fetched_at, table)
+        return table
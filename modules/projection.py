@@ -0,0 +1,138 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from modules.allocation import fund_return_statistics
+from modules.cache import cached, next_amfi_publish_time
+
+# Monte Carlo projection of what a fund mix could grow to. Each path draws one year of
+# correlated log returns per fund from the funds' annualised mean and covariance (NAV
+# history, see modules/allocation.py), and the mix is rebalanced to its weights once a
+# year, so a path is a column of yearly portfolio growth factors. Those depend only on the
+# mix and the seed, not on the amount, horizon or contribution schedule, so they are drawn
+# once per mix for MAX_PROJECTION_YEARS and cached; moving a slider only re-accumulates
+# contributions over the cached paths, a few (paths x years) array passes.
+#   lump_sum  the whole amount is invested at the start
+#   sip       the amount is spread over equal monthly instalments across the horizon
+# Funds without enough NAV history use the long-run assumptions below.
+PROJECTION_PATHS = 20_000
+PROJECTION_SEED = 2024
+MAX_PROJECTION_YEARS = 30
+MONTHS_PER_YEAR = 12
+PERCENTILES = (10, 50, 90)
+CONTRIBUTION_SCHEDULES = ('lump_sum', 'sip')
+
+# (name pattern, annual mean log return, annual volatility), first match wins.
+ASSUMED_RETURNS = (
+    (r'liquid|overnight|money market|arbitrage', 0.065, 0.01),
+    (r'gilt|debt|bond|income|duration|corporate|credit|savings|banking', 0.07, 0.03),
+    (r'conservative', 0.08, 0.05),
+    (r'hybrid|balanced|asset allocation|advantage', 0.09, 0.10),
+    (r'', 0.11, 0.18), # Everything else is taken to be equity
+)
+ASSUMED_CORRELATION = 0.6 # Between a fund without history and every other fund in the mix
+
+
+def assumed_statistics(fund_name: str) -> tuple:
+    """The long-run (mean log return, volatility) assumed for a fund, from its name."""
+    name = fund_name.lower()
+    for pattern, mean, volatility in ASSUMED_RETURNS:
+        if re.search(pattern, name):
+            return mean, volatility
+
+
+def mix_statistics(fund_names) -> tuple:
+    """
+    Annualised expected log returns and covariance for `fund_names`, from NAV history where
+    there is enough of it and from ASSUMED_RETURNS (at ASSUMED_CORRELATION) otherwise.
+    """
+    expected_returns, covariance = fund_return_statistics(list(fund_names))
+    expected_returns, covariance = expected_returns.copy(), covariance.copy()
+    missing = np.isnan(expected_returns) | np.isnan(np.diag(covariance))
+    if missing.any():
+        volatility = np.sqrt(np.diag(covariance))
+        for i in np.flatnonzero(missing):
+            expected_returns[i], volatility[i] = assumed_statistics(fund_names[i])
+        assumed = ASSUMED_CORRELATION * np.outer(volatility, volatility)
+        np.fill_diagonal(assumed, volatility ** 2)
+        fill = missing[:, None] | missing[None, :]
+        covariance[fill] = assumed[fill]
+        # The mixed matrix need not be positive semi-definite; clip negative eigenvalues.
+        values, vectors = np.linalg.eigh(covariance)
+        covariance = (vectors * np.clip(values, 0.0, None)) @ vectors.T
+    return expected_returns, covariance
+
+
+@cached('projection', expires_at=next_amfi_publish_time, maxsize=8)
+def simulate_growth(fund_names: tuple, weights: tuple, n_paths: int = PROJECTION_PATHS,
+                    seed: int = PROJECTION_SEED) -> tuple:
+    """
+    Annual growth factors of the mix, rebalanced to `weights` every year, and the matching
+    year-end value of monthly instalments of 1 (see _sip_year_factor). Both are
+    (MAX_PROJECTION_YEARS x n_paths), one row per year. They are cached per mix until the
+    next AMFI publish brings new statistics.
+    """
+    expected_returns, covariance = mix_statistics(fund_names)
+    values, vectors = np.linalg.eigh(covariance)
+    factor = vectors * np.sqrt(np.clip(values, 0.0, None)) # factor @ factor.T == covariance
+    draws = np.random.default_rng(seed).standard_normal((MAX_PROJECTION_YEARS * n_paths, len(fund_names)))
+    log_returns = draws @ factor.T + expected_returns
+    growth = (np.exp(log_returns) @ np.asarray(weights, dtype=np.float64)).reshape(MAX_PROJECTION_YEARS, n_paths)
+    sip_factor = _sip_year_factor(growth)
+    growth.flags.writeable = sip_factor.flags.writeable = False # Shared by every caller of the cache
+    return growth, sip_factor
+
+
+def _sip_year_factor(growth: np.ndarray) -> np.ndarray:
+    """Year-end value of 1 invested at the start of each month of a year that grows by `growth`."""
+    monthly = growth ** (1 / MONTHS_PER_YEAR)
+    # Geometric series monthly + monthly^2 + ... + monthly^12, which is 12 when flat.
+    flat = np.isclose(monthly, 1.0)
+    return np.divide(monthly * (growth - 1), monthly - 1, out=np.full_like(growth, MONTHS_PER_YEAR), where=~flat)
+
+
+def project_corpus(mix: list, duration_years: int, schedule: str = 'lump_sum', target: float = None,
+                   n_paths: int = PROJECTION_PATHS, seed: int = PROJECTION_SEED) -> dict:
+    """
+    Projects the corpus of a mix as returned by get_fund_mix over `duration_years`.
+    Returns a dict with `bands`, a DataFrame indexed by year with the amount invested so
+    far and the P10/P50/P90 corpus, plus `target` (the amount invested unless given) and
+    `shortfall_probability`, the share of paths that end below it.
+    """
+    if schedule not in CONTRIBUTION_SCHEDULES:
+        raise ValueError(f"Unknown contribution schedule {schedule!r}; expected one of {CONTRIBUTION_SCHEDULES}.")
+    years = int(duration_years)
+    if not 1 <= years <= MAX_PROJECTION_YEARS:
+        raise ValueError(f"Projections cover 1 to {MAX_PROJECTION_YEARS} years, not {duration_years}.")
+    total = float(sum(item['amount'] for item in mix))
+    if not mix or total <= 0:
+        raise ValueError("The mix has nothing invested to project.")
+
+    fund_names = tuple(item['fund'] for item in mix)
+    # Percentages are the allocation weights before rounding to rupees, so they do not move
+    # with the amount and a new amount is still a cache hit.
+    weights = tuple(round(item['percentage'] / 100, 6) for item in mix)
+    growth, sip_factor = simulate_growth(fund_names, weights, n_paths, seed)
+
+    # corpus[y] is every path's value at the end of year y + 1.
+    if schedule == 'lump_sum':
+        corpus = total * np.cumprod(growth[:years], axis=0)
+        invested = np.full(years, total)
+    else:
+        instalment = total / (years * MONTHS_PER_YEAR)
+        corpus = np.empty((years, growth.shape[1]))
+        corpus[0] = instalment * sip_factor[0]
+        for year in range(1, years):
+            corpus[year] = corpus[year - 1] * growth[year] + instalment * sip_factor[year]
+        invested = instalment * MONTHS_PER_YEAR * np.arange(1, years + 1)
+
+    target = total if target is None else float(target)
+    bands = pd.DataFrame(np.percentile(corpus, PERCENTILES, axis=1).T, columns=[f'P{p}' for p in PERCENTILES],
+                         index=pd.RangeIndex(1, years + 1, name='Year'))
+    bands.insert(0, 'Invested', invested)
+    return {
+        'bands': bands,
+        'target': target,
+        'shortfall_probability': float(np.mean(corpus[-1] < target)),
+    }
@@ -0,0 +1,193 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Client for a broker-style batch quote endpoint:
+#   GET {base_url}/quotes?symbols=SBIN.NS,INFY.NS,...
+#   200 -> {"quotes": {"SBIN.NS": {"symbol": ..., "current_price": ..., ...}, ...}}
+#   429 -> rate limited, with an optional Retry-After header (seconds or an HTTP date)
+# Symbols are packed into as few requests as the broker allows, requests run with bounded
+# concurrency over one keep-alive session, and transient failures are retried with
+# jittered exponential backoff. modules/mock_broker.py serves the same API for offline use.
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF_BASE_SECONDS = 0.1
+DEFAULT_BACKOFF_CAP_SECONDS = 5.0
+REQUEST_TIMEOUT_SECONDS = 5
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class QuoteClientError(Exception):
+    """Raised when a batch of quotes cannot be fetched after all retries."""
+
+
+def retry_after_seconds(value: str):
+    """Seconds to wait for a Retry-After header value (delay-seconds or HTTP-date), or None if unparseable."""
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every worker thread: at most `rate` requests per second with
+    bursts of up to `burst`. A 429 from the broker pauses everyone until its Retry-After.
+    """
+
+    def __init__(self, rate: float = None, burst: int = 1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self.clock()
+                wait = self._blocked_until - now
+                if wait <= 0 and self.rate is None:
+                    return
+                if wait <= 0:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            self.sleep(wait)
+
+    def block_for(self, seconds: float):
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, self.clock() + seconds)
+
+
+class QuoteClient:
+    """
+    Batched, pooled and rate-limit-aware quote fetching.
+    `get_quotes(tickers)` returns {ticker: quote dict or None}; tickers whose batch failed
+    after every retry map to None, and the failures go to the caller's `errors` list if given.
+    The client is shared across sessions, so it keeps no per-call state.
+    """
+
+    def __init__(self, base_url: str, api_key: str = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, max_retries: int = DEFAULT_MAX_RETRIES,
+                 requests_per_second: float = None, backoff_base: float = DEFAULT_BACKOFF_BASE_SECONDS,
+                 backoff_cap: float = DEFAULT_BACKOFF_CAP_SECONDS, timeout: float = REQUEST_TIMEOUT_SECONDS,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.base_url = base_url.rstrip('/')
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout
+        self.sleep = sleep
+        self.rate_limiter = RateLimiter(requests_per_second, burst=max_concurrency, clock=clock, sleep=sleep)
+        self.session = requests.Session()
+        # One pooled connection per worker so every batch rides a keep-alive socket.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if api_key:
+            self.session.headers['Authorization'] = f"Bearer {api_key}"
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='quotes')
+        self.requests_sent = 0
+        self.retries = 0
+        self._stats_lock = threading.Lock()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": spreads retries out so workers don't stampede the broker together.
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def _fetch_batch(self, symbols: list) -> dict:
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            with self._stats_lock:
+                self.requests_sent += 1
+                self.retries += 1 if attempt else 0
+            try:
+                response = self.session.get(f"{self.base_url}/quotes", params={'symbols': ','.join(symbols)},
+                                            timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                last_error = e
+                self.sleep(self._backoff(attempt))
+                continue
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                last_error = QuoteClientError(f"HTTP {response.status_code} from quote API")
+                retry_after = retry_after_seconds(response.headers.get('Retry-After') or '')
+                delay = self._backoff(attempt)
+                if response.status_code == 429:
+                    delay = max(delay, retry_after if retry_after is not None else self.backoff_base)
+                    self.rate_limiter.block_for(delay)
+                else:
+                    self.sleep(delay)
+                continue
+            response.raise_for_status()
+            return response.json().get('quotes', {})
+        raise QuoteClientError(f"Quote batch of {len(symbols)} symbols failed after {self.max_retries + 1} attempts: {last_error}")
+
+    def get_quotes(self, tickers, errors: list = None) -> dict:
+        """Fetches quotes for every ticker in as few requests as possible; failures are appended to `errors`."""
+        unique = list(dict.fromkeys(tickers))
+        batches = [unique[i:i + self.batch_size] for i in range(0, len(unique), self.batch_size)]
+        quotes = dict.fromkeys(unique)
+        futures = [self._executor.submit(self._fetch_batch, batch) for batch in batches]
+        for batch, future in zip(batches, futures):
+            try:
+                result = future.result()
+            except (QuoteClientError, requests.exceptions.RequestException, ValueError) as e:
+                if errors is not None:
+                    errors.append(e)
+                continue
+            for symbol in batch:
+                quotes[symbol] = result.get(symbol)
+        return quotes
+
+
+_client = None
+_client_resolved = False # Also set when no quote API is configured, so secrets are read once
+_client_lock = threading.Lock()
+
+
+def get_quote_client():
+    """
+    Returns the shared QuoteClient for the MARKET_DATA_API_URL secret or environment variable
+    (e.g. a local mock broker), or None when no quote API is configured.
+    """
+    global _client, _client_resolved
+    with _client_lock:
+        if not _client_resolved:
+            _client_resolved = True
+            try:
+                import streamlit as st
+                base_url = st.secrets.get("MARKET_DATA_API_URL")
+                api_key = st.secrets.get("MARKET_DATA_API_KEY")
+            except Exception: # No secrets file configured
+                base_url = api_key = None
+            base_url = base_url or os.environ.get("MARKET_DATA_API_URL")
+            api_key = api_key or os.environ.get("MARKET_DATA_API_KEY")
+            if base_url:
+                rate = os.environ.get("MARKET_DATA_REQUESTS_PER_SECOND")
+                _client = QuoteClient(base_url, api_key=api_key, requests_per_second=float(rate) if rate else None)
+        return _client
@@ -1,11 +1,21 @@
+import copy
+import hashlib
+import re
+import threading
+import warnings
+
+import numpy as np
 import pandas as pd
 
-def load_fund_data():
+from modules.catalog_snapshot import CATALOG_SNAPSHOT_DIR, fingerprint, read_snapshot, write_snapshot
+from modules.metrics import timed
+
+def load_fund_records() -> dict:
     """
-    Loads a dummy dataset of SBI Mutual Funds with their characteristics.
+    Loads a dummy dataset of SBI Mutual Funds with their characteristics, as column lists.
     In a real application, this would come from a database or a comprehensive internal API.
     """
-    data = {
+    return {
         'name': [
             "SBI Bluechip Fund", "SBI Equity Hybrid Fund", "SBI Small Cap Fund",
             "SBI contra fund", "SBI Long Term Equity Fund", "SBI Large & Midcap Fund",
@@ -49,141 +59,538 @@ def load_fund_data():
             "Highly liquid fund for very short-term parking of funds."
         ]
     }
-    return pd.DataFrame(data)
 
-# Load fund data once
-FUND_DATA = load_fund_data()
+def load_fund_data():
+    """Loads the fund dataset as a DataFrame."""
+    return pd.DataFrame(load_fund_records())
 
-def recommend_funds(risk_profile: str, duration_years: int, investment_goal: str) -> tuple:
-    """
-    Recommends fund categories and specific SBI Mutual Funds based on client's profile.
-    This logic can be significantly expanded with more sophisticated rules or ML models.
-    """
-    recommended_category = "General Investment"
-    suggested_funds = []
+# Input risk profiles, in the order of the sidebar selectbox. Fund risk levels are
+# encoded against the same list so a single code space covers both.
+RISK_PROFILES = ["Conservative", "Low", "Moderate", "High", "Aggressive"]
 
-    # Map input risk to internal risk levels for filtering
-    risk_mapping = {
-        "Conservative": ["Conservative"],
-        "Low": ["Low", "Conservative"],
-        "Moderate": ["Moderate", "Low"],
-        "High": ["High", "Moderate"],
-        "Aggressive": ["High"]
-    }
-    allowed_risks = risk_mapping.get(risk_profile, ["Moderate"])
+# Every goal a fund can be suitable for gets one bit in the goal bitmask.
+INVESTMENT_GOALS = [
+    "Retirement Planning", "Wealth Creation", "Child's Education",
+    "Tax Saving", "General Investment", "Short-term Capital Gain"
+]
+
+# Map input risk to internal risk levels for filtering
+RISK_MAPPING = {
+    "Conservative": ["Conservative"],
+    "Low": ["Low", "Conservative"],
+    "Moderate": ["Moderate", "Low"],
+    "High": ["High", "Moderate"],
+    "Aggressive": ["High"]
+}
+DEFAULT_ALLOWED_RISKS = ["Moderate"]
+
+# Allocation branches: equity growth, balanced, and debt / conservative.
+BRANCH_CATEGORIES = ["Equity - High Growth", "Hybrid - Balanced", "Debt / Hybrid - Conservative"]
+BRANCH_PRIORITY_TYPES = ["Small Cap|Mid Cap|Contra", "Hybrid|Large & Mid Cap|Bluechip", "Debt|Liquid|Hybrid - Conservative"]
+BRANCH_WEIGHTAGES = [
+    {"SBI Small Cap Fund": 40, "SBI Bluechip Fund": 30, "SBI contra fund": 30},
+    {"SBI Equity Hybrid Fund": 40, "SBI Balanced Advantage Fund": 30, "SBI Bluechip Fund": 30},
+    {"SBI Liquid Fund": 50, "SBI Debt Fund": 30, "SBI Equity Hybrid Fund": 20},
+]
+
+# Weightages are looked up by normalize_fund_name, and a fund whose name starts with a listed
+# one's words has its weightage: AMFI names each plan of a scheme, e.g. "SBI Bluechip Fund -
+# Direct Plan - Growth", which is how funds from the FundStore are named.
+_BRANCH_WEIGHTAGE_NAMES = None
+
+# Funds picked per profile: up to two from the branch's priority types, then one other.
+PRIORITY_PICKS = 2
+OTHER_PICKS = 1
+SELECT_CHUNK_CELLS = 4_000_000 # Profile x fund cells evaluated per vectorized step
+
+# Within a risk-match tier, funds rank by this modules.analytics metric over their NAV
+# history (higher first; funds without one last, in catalog order). None ranks by catalog
+# order alone.
+RANKING_METRIC = 'sharpe'
+
+# The app's catalog is not built on import: get_fund_catalog() maps it from a snapshot that is
+# rebuilt only when the fund records or the encoding tables above change. Bump this when the
+# way FundCatalog derives its arrays changes, so older snapshots are not reused.
+CATALOG_FORMAT = 1
+
+
+def _risk_codes(values) -> np.ndarray:
+    """Encodes risk labels against RISK_PROFILES; unknown labels get len(RISK_PROFILES)."""
+    codes = pd.Categorical(values, categories=RISK_PROFILES).codes.astype(np.int16)
+    codes[codes < 0] = len(RISK_PROFILES)
+    return codes
+
+
+def _goal_bits(goals) -> np.ndarray:
+    """Encodes single goal labels as bits; unknown goals get 0 and never match."""
+    codes = pd.Categorical(goals, categories=INVESTMENT_GOALS).codes.astype(np.int64)
+    return np.where(codes >= 0, np.left_shift(1, np.maximum(codes, 0)), 0).astype(np.uint32)
+
+
+def normalize_fund_name(name: str) -> str:
+    """The lowercase words of a fund name, e.g. "SBI Large & Midcap Fund" -> "sbi large midcap fund"."""
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', name.lower()).split())
+
+
+def _weightage_names() -> list:
+    global _BRANCH_WEIGHTAGE_NAMES
+    if _BRANCH_WEIGHTAGE_NAMES is None:
+        _BRANCH_WEIGHTAGE_NAMES = [[(normalize_fund_name(name), weightage) for name, weightage in weightages.items()]
+                                   for weightages in BRANCH_WEIGHTAGES]
+    return _BRANCH_WEIGHTAGE_NAMES
+
+
+def _listed_weightages(fund_names) -> np.ndarray:
+    """branch_weightage for every branch x fund at once, NaN where none is listed."""
+    # Trailing space: "a b" is listed name "a" plus words, "ab" is not
+    words = (pd.Series(fund_names, dtype=object).str.lower()
+             .str.replace(r'[^a-z0-9]+', ' ', regex=True).str.strip() + ' ').to_numpy(dtype=str)
+    weightages = np.full((len(BRANCH_WEIGHTAGES), len(words)), np.nan)
+    for branch, listed in enumerate(_weightage_names()):
+        for name, weightage in reversed(listed): # The first listed match wins
+            weightages[branch, np.char.startswith(words, name + ' ')] = weightage
+    return weightages
 
-    # Filter funds based on risk, duration, and goal
-    filtered_funds = FUND_DATA[
-        (FUND_DATA['risk_profile'].isin(allowed_risks)) &
-        (FUND_DATA['min_duration_years'] <= duration_years) &
-        (FUND_DATA['goal_suitability'].apply(lambda x: investment_goal in x))
-    ].copy() # Use .copy() to avoid SettingWithCopyWarning
 
-    # Determine recommended category (simplified logic)
+def branch_weightage(branch: int, fund_name: str):
+    """The BRANCH_WEIGHTAGES weightage of a fund (or of any plan of it) in `branch`, or None."""
+    words = normalize_fund_name(fund_name)
+    for name, weightage in _weightage_names()[branch]:
+        if words == name or words.startswith(name + ' '):
+            return weightage
+    return None
+
+
+def _tiebreak_rank(scores, n_funds: int) -> np.ndarray:
+    """Each fund's place when ordered by descending score, NaN last, ties in catalog order."""
+    rank = np.empty(n_funds, dtype=np.int64)
+    if scores is None:
+        rank[:] = np.arange(n_funds)
+    else:
+        scores = np.asarray(scores, dtype=np.float64)
+        order = np.lexsort((np.arange(n_funds), -np.nan_to_num(scores), np.isnan(scores)))
+        rank[order] = np.arange(n_funds)
+    return rank
+
+
+def _branch_for_risk(risk_profile: str) -> int:
     if risk_profile == "High" or risk_profile == "Aggressive":
-        recommended_category = "Equity - High Growth"
+        return 0
     elif risk_profile == "Moderate":
-        recommended_category = "Hybrid - Balanced"
+        return 1
+    return 2
+
+
+class FundCatalog:
+    """
+    Compact, array-based encoding of a fund DataFrame for fast filtering.
+    Risk levels become small integer codes, goal suitability becomes a bitmask and the
+    minimum durations are kept in sorted order so eligibility is a searchsorted lookup.
+    Everything here is computed once per catalog, not once per recommendation.
+    `scores` optionally ranks funds within the same risk-match tier (higher is better, NaN
+    last), e.g. a Sharpe ratio from modules.analytics.metric_scores; without it, catalog
+    order decides.
+    """
+
+    # Everything select() reads, in the order they are saved to a snapshot.
+    SNAPSHOT_ARRAYS = ('risk_codes', 'goal_masks', 'sorted_min_durations', 'duration_rank', 'allowed_risk',
+                       'branch_of_risk', 'priority_type', 'tiebreak_rank', 'fixed_weightage')
+
+    def __init__(self, fund_data: pd.DataFrame, scores=None):
+        self._fund_data = fund_data.reset_index(drop=True)
+        self.names = self.fund_data['name'].tolist()
+        self.types = self.fund_data['type'].tolist()
+        self.descriptions = self.fund_data['description'].tolist()
+        n_funds = len(self.fund_data)
+
+        self.risk_codes = _risk_codes(self.fund_data['risk_profile'])
+
+        goal_bit = {goal: 1 << i for i, goal in enumerate(INVESTMENT_GOALS)}
+        self.goal_masks = np.array(
+            [sum(goal_bit.get(g, 0) for g in set(goals)) for goals in self.fund_data['goal_suitability']],
+            dtype=np.uint32
+        )
+
+        # Sorted minimum durations plus each fund's rank in that order: a fund is eligible
+        # for duration d when its rank is below searchsorted(sorted_min_durations, d).
+        min_durations = self.fund_data['min_duration_years'].to_numpy(dtype=np.float64)
+        order = np.argsort(min_durations, kind='stable')
+        self.sorted_min_durations = min_durations[order]
+        self.duration_rank = np.empty(n_funds, dtype=np.int64)
+        self.duration_rank[order] = np.arange(n_funds)
+
+        # Which fund risk codes each input risk code may hold (last row/column: unknown).
+        n_codes = len(RISK_PROFILES) + 1
+        self.allowed_risk = np.zeros((n_codes, n_codes), dtype=bool)
+        for code in range(n_codes):
+            profile = RISK_PROFILES[code] if code < len(RISK_PROFILES) else None
+            for allowed in RISK_MAPPING.get(profile, DEFAULT_ALLOWED_RISKS):
+                self.allowed_risk[code, RISK_PROFILES.index(allowed)] = True
+
+        self.branch_of_risk = np.array(
+            [_branch_for_risk(p) for p in RISK_PROFILES] + [_branch_for_risk(None)], dtype=np.int8
+        )
+        type_series = self.fund_data['type']
+        self.priority_type = np.stack(
+            [type_series.str.contains(pattern).to_numpy(dtype=bool) for pattern in BRANCH_PRIORITY_TYPES]
+        )
+        self.tiebreak_rank = _tiebreak_rank(scores, n_funds)
+        self.fixed_weightage = _listed_weightages(self.names) # NaN: the default weightage
+
+    @property
+    def fund_data(self) -> pd.DataFrame:
+        """The source rows; a catalog loaded from a snapshot only rebuilds them when asked."""
+        if self._fund_data is None:
+            self._fund_data = pd.DataFrame(self._columns)
+        return self._fund_data
+
+    def save_snapshot(self, key: str, root: str = CATALOG_SNAPSHOT_DIR):
+        """Writes the derived arrays plus the source rows as the snapshot for fingerprint `key`."""
+        columns = {name: [None if value != value else value for value in values] # NaN is not JSON
+                   for name, values in self.fund_data.to_dict('list').items()}
+        write_snapshot(key, {name: getattr(self, name) for name in self.SNAPSHOT_ARRAYS}, {'columns': columns}, root)
+
+    @classmethod
+    def load_snapshot(cls, key: str, root: str = CATALOG_SNAPSHOT_DIR):
+        """The catalog saved under fingerprint `key`, with memory-mapped arrays, or None."""
+        snapshot = read_snapshot(key, root)
+        if snapshot is None:
+            return None
+        arrays, meta = snapshot
+        catalog = cls.__new__(cls)
+        catalog.__dict__.update(arrays)
+        catalog._fund_data = None
+        catalog._columns = meta['columns']
+        catalog.names = catalog._columns['name']
+        catalog.types = catalog._columns['type']
+        catalog.descriptions = catalog._columns['description']
+        return catalog
+
+    def __len__(self):
+        return len(self.names)
+
+    def ranked_by(self, scores) -> 'FundCatalog':
+        """A copy of this catalog, sharing its arrays, that ranks funds by `scores` as the constructor would."""
+        catalog = copy.copy(self)
+        catalog.tiebreak_rank = _tiebreak_rank(scores, len(self))
+        return catalog
+
+    def select(self, risk_codes: np.ndarray, durations: np.ndarray, goal_bits: np.ndarray) -> tuple:
+        """
+        Vectorized selection for many profiles at once.
+        Returns (branches, selected, weightages): selected is a (profiles, 3) array of fund
+        positions padded with -1, and weightages holds the matching allocation percentages.
+        """
+        n_funds = len(self)
+        picks = PRIORITY_PICKS + OTHER_PICKS
+        n_profiles = len(risk_codes)
+        risk_codes = np.asarray(risk_codes)
+        if n_funds == 0:
+            return (self.branch_of_risk[risk_codes], np.full((n_profiles, picks), -1, dtype=np.int64),
+                    np.full((n_profiles, picks), np.nan))
+
+        # A selection depends only on (risk code, how many funds the duration clears, goal),
+        # and a client book has few distinct combinations of those, so each is solved once
+        # and the (profiles x funds) work shrinks to (combinations x funds).
+        n_long_enough = np.searchsorted(self.sorted_min_durations, durations, side='right')
+        keys = ((risk_codes.astype(np.int64) * (n_funds + 1) + n_long_enough) << 32) | goal_bits.astype(np.int64)
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        inverse = inverse.ravel()
+
+        branches = self.branch_of_risk[risk_codes]
+        selected = np.empty((len(first), picks), dtype=np.int64)
+        chunk = max(1, SELECT_CHUNK_CELLS // n_funds)
+        for start in range(0, len(first), chunk):
+            rows = first[start:start + chunk]
+            selected[start:start + chunk] = self._select_funds(risk_codes[rows], n_long_enough[rows], goal_bits[rows])
+        selected = selected[inverse]
+
+        valid = selected >= 0
+        weightages = self.fixed_weightage[branches[:, None], np.where(valid, selected, 0)]
+        n_selected = valid.sum(axis=1)
+        default = np.round(100 / np.maximum(n_selected, 1), 0)
+        weightages = np.where(np.isnan(weightages), default[:, None], weightages)
+        weightages[~valid] = np.nan
+        return branches, selected, weightages
+
+    def _select_funds(self, risk_codes: np.ndarray, n_long_enough: np.ndarray, goal_bits: np.ndarray) -> np.ndarray:
+        """Fund positions picked for each profile, as a (profiles, 3) array padded with -1."""
+        n_funds = len(self)
+        branches = self.branch_of_risk[risk_codes]
+        eligible = self.allowed_risk[risk_codes][:, self.risk_codes]
+        eligible &= (self.goal_masks[None, :] & goal_bits[:, None]) != 0
+        eligible &= self.duration_rank[None, :] < n_long_enough[:, None]
+
+        # Funds whose risk matches the profile exactly score higher; ties go by tiebreak rank.
+        exact = self.risk_codes[None, :] == risk_codes[:, None]
+        order_key = np.where(exact, 0, n_funds) + self.tiebreak_rank[None, :]
+        priority = self.priority_type[branches]
+        not_eligible = 2 * n_funds
+        priority_key = np.where(eligible & priority, order_key, not_eligible)
+        other_key = np.where(eligible & ~priority, order_key, not_eligible)
+
+        return np.concatenate(
+            [_smallest_k(priority_key, PRIORITY_PICKS, not_eligible), _smallest_k(other_key, OTHER_PICKS, not_eligible)],
+            axis=1
+        )
+
+
+def _smallest_k(keys: np.ndarray, k: int, missing: int) -> np.ndarray:
+    """Row-wise positions of the k smallest keys in ascending order, -1 where key == missing."""
+    k_eff = min(k, keys.shape[1])
+    if k_eff < keys.shape[1]:
+        candidates = np.argpartition(keys, k_eff - 1, axis=1)[:, :k_eff]
     else:
-        recommended_category = "Debt / Hybrid - Conservative"
-
-    # Sort and select top funds (example logic)
-    if not filtered_funds.empty:
-        # Example: prioritize funds with matching risk and goal.
-        # In a real scenario, you'd have more complex scoring.
-        filtered_funds['score'] = 0
-        filtered_funds.loc[filtered_funds['risk_profile'] == risk_profile, 'score'] += 1
-        filtered_funds.loc[filtered_funds['goal_suitability'].apply(lambda x: investment_goal in x), 'score'] += 1
-
-        # Example: assign rough weights based on risk/category for allocation
-        if risk_profile == "High" or risk_profile == "Aggressive":
-            # For aggressive, prioritize small/mid caps and growth funds
-            priority_funds = filtered_funds[
-                (filtered_funds['type'].str.contains("Small Cap|Mid Cap|Contra"))
-            ].sort_values(by='score', ascending=False).head(2)
-            other_funds = filtered_funds[
-                ~(filtered_funds['type'].str.contains("Small Cap|Mid Cap|Contra"))
-            ].sort_values(by='score', ascending=False).head(1)
-            selected_funds = pd.concat([priority_funds, other_funds]).drop_duplicates().head(3)
-
-            # Assign example weights
-            if "SBI Small Cap Fund" in selected_funds['name'].values:
-                selected_funds.loc[selected_funds['name'] == "SBI Small Cap Fund", 'weightage'] = 40
-            if "SBI Bluechip Fund" in selected_funds['name'].values:
-                selected_funds.loc[selected_funds['name'] == "SBI Bluechip Fund", 'weightage'] = 30
-            if "SBI contra fund" in selected_funds['name'].values:
-                selected_funds.loc[selected_funds['name'] == "SBI contra fund", 'weightage'] = 30
-            # Ensure total weightage is 100% or adjust dynamically
-            selected_funds['weightage'] = selected_funds['weightage'].fillna(100 / len(selected_funds)).round(0)
-
-
-        elif risk_profile == "Moderate":
-            # For moderate, prioritize hybrid and large/mid cap
-            priority_funds = filtered_funds[
-                (filtered_funds['type'].str.contains("Hybrid|Large & Mid Cap|Bluechip"))
-            ].sort_values(by='score', ascending=False).head(2)
-            other_funds = filtered_funds[
-                ~(filtered_funds['type'].str.contains("Hybrid|Large & Mid Cap|Bluechip"))
-            ].sort_values(by='score', ascending=False).head(1)
-            selected_funds = pd.concat([priority_funds, other_funds]).drop_duplicates().head(3)
-
-            if "SBI Equity Hybrid Fund" in selected_funds['name'].values:
-                selected_funds.loc[selected_funds['name'] == "SBI Equity Hybrid Fund", 'weightage'] = 40
-            if "SBI Balanced Advantage Fund" in selected_funds['name'].values:
-                selected_funds.loc[selected_funds['name'] == "SBI Balanced Advantage Fund", 'weightage'] = 30
-            if "SBI Bluechip Fund" in selected_funds['name'].values:
-                selected_funds.loc[selected_funds['name'] == "SBI Bluechip Fund", 'weightage'] = 30
-            selected_funds['weightage'] = selected_funds['weightage'].fillna(100 / len(selected_funds)).round(0)
-
-        else: # Low / Conservative
-            # For low risk, prioritize debt and conservative hybrid
-            priority_funds = filtered_funds[
-                (filtered_funds['type'].str.contains("Debt|Liquid|Hybrid - Conservative"))
-            ].sort_values(by='score', ascending=False).head(2)
-            other_funds = filtered_funds[
-                ~(filtered_funds['type'].str.contains("Debt|Liquid|Hybrid - Conservative"))
-            ].sort_values(by='score', ascending=False).head(1)
-            selected_funds = pd.concat([priority_funds, other_funds]).drop_duplicates().head(3)
-
-            if "SBI Liquid Fund" in selected_funds['name'].values:
-                selected_funds.loc[selected_funds['name'] == "SBI Liquid Fund", 'weightage'] = 50
-            if "SBI Debt Fund" in selected_funds['name'].values:
-                selected_funds.loc[selected_funds['name'] == "SBI Debt Fund", 'weightage'] = 30
-            if "SBI Equity Hybrid Fund" in selected_funds['name'].values:
-                selected_funds.loc[selected_funds['name'] == "SBI Equity Hybrid Fund", 'weightage'] = 20
-            selected_funds['weightage'] = selected_funds['weightage'].fillna(100 / len(selected_funds)).round(0)
-
-        # Convert to list of dicts with rationale
-        for _, row in selected_funds.iterrows():
+        candidates = np.broadcast_to(np.arange(keys.shape[1]), keys.shape)
+    candidate_keys = np.take_along_axis(keys, candidates, axis=1)
+    order = np.argsort(candidate_keys, axis=1, kind='stable')
+    positions = np.take_along_axis(candidates, order, axis=1)
+    positions = np.where(np.take_along_axis(candidate_keys, order, axis=1) == missing, -1, positions)
+    if k_eff < k:
+        positions = np.pad(positions, ((0, 0), (0, k - k_eff)), constant_values=-1)
+    return positions
+
+
+_fund_catalog = None
+_ranked_catalog = (None, None) # ((NAV history root, rows) it was ranked for, FundCatalog)
+_fund_catalog_lock = threading.Lock()
+
+
+def _catalog_fingerprint() -> str:
+    # The fund records and every table the catalog is encoded with are defined in this file,
+    # so its content identifies the snapshot without building the records first.
+    with open(__file__, 'rb') as f:
+        source = hashlib.sha256(f.read()).hexdigest()
+    return fingerprint(CATALOG_FORMAT, FundCatalog.SNAPSHOT_ARRAYS, source)
+
+
+def _rank_catalog(catalog: FundCatalog, history) -> FundCatalog:
+    """`catalog` ranked by RANKING_METRIC over `history`, or as it is when no fund has NAVs there."""
+    from modules.allocation import resolve_scheme_codes
+    from modules.analytics import get_metric_scores
+    scheme_codes = resolve_scheme_codes(catalog.names, history)
+    if not (scheme_codes >= 0).any():
+        return catalog
+    return catalog.ranked_by(get_metric_scores(scheme_codes, RANKING_METRIC, history))
+
+
+def get_fund_catalog() -> FundCatalog:
+    """
+    Returns the process-wide FundCatalog of load_fund_records(), loaded from its snapshot and
+    built (and snapshotted for the next process) only when there is none for this source file,
+    then ranked by RANKING_METRIC over the NAV history, again whenever NAVs are appended.
+    """
+    global _ranked_catalog
+    catalog = _base_catalog()
+    if RANKING_METRIC is None:
+        return catalog
+    from modules.nav_history import get_default_store
+    history = get_default_store()
+    state = (history.root, len(history))
+    with _fund_catalog_lock:
+        if _ranked_catalog[0] != state:
+            _ranked_catalog = (state, _rank_catalog(catalog, history) if state[1] else catalog)
+        return _ranked_catalog[1]
+
+
+def _base_catalog() -> FundCatalog:
+    global _fund_catalog
+    with _fund_catalog_lock:
+        if _fund_catalog is None:
+            key = _catalog_fingerprint()
+            catalog = FundCatalog.load_snapshot(key)
+            if catalog is None:
+                catalog = FundCatalog(pd.DataFrame(load_fund_records()))
+                try:
+                    catalog.save_snapshot(key)
+                except OSError as e: # e.g. a read-only filesystem; the built catalog works all the same
+                    warnings.warn(f"Fund catalog snapshot not written: {e}")
+            _fund_catalog = catalog
+        return _fund_catalog
+
+
+def __getattr__(name):
+    # FUND_DATA and FUND_CATALOG are loaded on first use rather than on import.
+    if name == 'FUND_CATALOG':
+        return get_fund_catalog()
+    if name == 'FUND_DATA':
+        return get_fund_catalog().fund_data
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _profile_arrays(profiles) -> tuple:
+    """Splits profiles into (risk_profiles, durations, goals) sequences."""
+    if isinstance(profiles, pd.DataFrame):
+        return (profiles['risk_profile'].tolist(), profiles['duration_years'].to_numpy(dtype=np.float64),
+                profiles['investment_goal'].tolist())
+    profiles = list(profiles)
+    if not profiles:
+        return [], np.empty(0, dtype=np.float64), []
+    risks, durations, goals = zip(*profiles)
+    return list(risks), np.asarray(durations, dtype=np.float64), list(goals)
+
+
+def recommend_funds_batch(profiles, catalog: FundCatalog = None) -> list:
+    """
+    Recommends funds for many client profiles in one vectorized pass.
+    `profiles` is a sequence of (risk_profile, duration_years, investment_goal) tuples or a
+    DataFrame with those columns. Returns one (recommended_category, suggested_funds) tuple
+    per profile, exactly as recommend_funds would.
+    """
+    catalog = catalog if catalog is not None else get_fund_catalog()
+    risks, durations, goals = _profile_arrays(profiles)
+    branches, selected, weightages = catalog.select(_risk_codes(risks), durations, _goal_bits(goals))
+
+    results = []
+    for branch, positions, weights in zip(branches.tolist(), selected.tolist(), weightages.tolist()):
+        suggested_funds = []
+        for position, weightage in zip(positions, weights):
+            if position < 0:
+                continue
             suggested_funds.append({
-                'name': row['name'],
-                'type': row['type'],
-                'weightage': row['weightage'],
-                'rationale': row['description'] # Using description as rationale for now
+                'name': catalog.names[position],
+                'type': catalog.types[position],
+                'weightage': weightage,
+                'rationale': catalog.descriptions[position] # Using description as rationale for now
             })
+        results.append((BRANCH_CATEGORIES[branch], suggested_funds))
+    return results
+
+
+def rank_store(store):
+    """
+    Brings a FundStore's ranking scores up to date with RANKING_METRIC over the NAV history.
+    The store records what its scores were computed from, so across processes they are
+    recomputed once per appended NAV day.
+    """
+    if RANKING_METRIC is None:
+        return
+    from modules.nav_history import get_default_store
+    history = get_default_store()
+    as_of = f"{RANKING_METRIC}:{history.root}:{len(history)}"
+    if store.scores_as_of() == as_of:
+        return
+    scheme_codes = store.scheme_codes()
+    if len(history):
+        from modules.analytics import get_metric_scores
+        scores = get_metric_scores(scheme_codes, RANKING_METRIC, history)
+    else:
+        scores = np.full(len(scheme_codes), np.nan)
+    store.set_scores(dict(zip(scheme_codes, scores.tolist())), as_of)
+
 
-    return recommended_category, suggested_funds
+def recommend_from_store(store, risk_profile: str, duration_years: float, investment_goal: str) -> tuple:
+    """
+    recommend_funds over a FundStore (modules/fund_store.py): the same picks FundCatalog.select
+    makes, found with indexed top-k queries instead of a pass over every fund. Funds rank
+    by the store's scores as they are; see rank_store.
+    """
+    risk_code = RISK_PROFILES.index(risk_profile) if risk_profile in RISK_PROFILES else len(RISK_PROFILES)
+    branch = _branch_for_risk(risk_profile)
+    if investment_goal not in INVESTMENT_GOALS:
+        return BRANCH_CATEGORIES[branch], []
+    goal_code = INVESTMENT_GOALS.index(investment_goal)
+    allowed = [RISK_PROFILES.index(risk) for risk in RISK_MAPPING.get(risk_profile, DEFAULT_ALLOWED_RISKS)]
+    # Funds whose risk matches the profile exactly come first, then the other allowed risks.
+    tiers = [[code] for code in allowed if code == risk_code] + [[code for code in allowed if code != risk_code]]
+
+    picked = []
+    for priority, k in ((True, PRIORITY_PICKS), (False, OTHER_PICKS)):
+        found = []
+        for tier in tiers:
+            found += store.top_funds(goal_code, tier, duration_years, branch, priority, k - len(found))
+        picked += found
+
+    default = round(100 / max(len(picked), 1), 0)
+    suggested_funds = []
+    for fund in picked:
+        weightage = branch_weightage(branch, fund['name'])
+        suggested_funds.append({
+            'name': fund['name'],
+            'type': fund['type'],
+            'weightage': float(weightage if weightage is not None else default),
+            'rationale': fund['description'] # Using description as rationale for now
+        })
+    return BRANCH_CATEGORIES[branch], suggested_funds
 
 
-def get_fund_mix(suggested_funds: list, total_amount: float) -> list:
+@timed()
+def recommend_funds(risk_profile: str, duration_years: int, investment_goal: str, store=None) -> tuple:
+    """
+    Recommends fund categories and specific SBI Mutual Funds based on client's profile.
+    This logic can be significantly expanded with more sophisticated rules or ML models.
+    Funds are filtered by allowed risk, minimum duration and goal, ranked by exact risk match,
+    and up to two funds of the category's priority types are picked plus one other fund.
+    Picks come from `store`, or the configured FundStore, when it holds any funds, and from
+    the built-in catalog otherwise.
+    """
+    if store is None:
+        from modules.fund_store import get_fund_store
+        store = get_fund_store()
+    if store is not None and store.has_funds():
+        rank_store(store)
+        return recommend_from_store(store, risk_profile, duration_years, investment_goal)
+    return recommend_funds_batch([(risk_profile, duration_years, investment_goal)])[0]
+
+
+@timed()
+def get_fund_mix(suggested_funds: list, total_amount: float, method: str = 'weightage', store=None) -> list:
     """
     Calculates the investment allocation based on suggested funds and total amount.
     Assumes 'weightage' is present in suggested_funds.
+    `method` is 'weightage' (split by the recommended weightages), 'risk_parity' or
+    'mean_variance' (sized from NAV history, see modules/allocation.py). Amounts are
+    multiples of ₹100 and always add up to total_amount exactly.
+    Raises AllocationError when a risk-based method has no usable NAV history for a fund.
     """
     mix = []
     if not suggested_funds:
         return mix
 
-    total_weightage = sum(f['weightage'] for f in suggested_funds)
-    if total_weightage == 0: # Avoid division by zero if no weights assigned
+    weightages = np.array([[fund['weightage'] for fund in suggested_funds]], dtype=np.float64)
+    if not np.nansum(weightages) > 0: # Avoid division by zero if no weights assigned
         return mix
 
-    for fund in suggested_funds:
-        percentage = fund['weightage'] / total_weightage * 100
-        allocated_amount = (total_amount * percentage / 100)
+    from modules.allocation import AllocationError, allocate_batch, fund_return_statistics # Pulls in NAV history
+    covariance = expected_returns = None
+    if method != 'weightage':
+        expected_returns, covariance = fund_return_statistics([fund['name'] for fund in suggested_funds], store)
+        expected_returns, covariance = expected_returns[None, :], covariance[None, :, :]
+    weights, amounts, fallback = allocate_batch(weightages, [int(total_amount)], method, covariance, expected_returns)
+    if fallback[0]:
+        raise AllocationError("Not enough NAV history for every suggested fund to use this allocation method.")
+
+    for fund, weight, allocated_amount in zip(suggested_funds, weights[0].tolist(), amounts[0].tolist()):
         mix.append({
             'fund': fund['name'],
-            'amount': int(round(allocated_amount, -2)), # Round to nearest 100 for practicality
-            'percentage': percentage
+            'amount': allocated_amount,
+            'percentage': weight * 100
         })
     return mix
+
+
+def get_fund_mix_batch(profiles, amounts, method: str = 'weightage', catalog: FundCatalog = None, store=None) -> tuple:
+    """
+    Recommends and allocates for many clients in one vectorized call, e.g. to re-allocate
+    the whole client book. `profiles` is as for recommend_funds_batch and `amounts` holds
+    each client's investment amount.
+    Returns (selected, weights, leg_amounts, fallback): catalog positions of each client's
+    funds (padded with -1), their weights and rupee amounts, and which clients fell back to
+    the weightage split for lack of NAV history.
+    """
+    catalog = catalog if catalog is not None else get_fund_catalog()
+    risks, durations, goals = _profile_arrays(profiles)
+    _, selected, weightages = catalog.select(_risk_codes(risks), durations, _goal_bits(goals))
+
+    from modules.allocation import allocate_batch, fund_return_statistics
+    covariance = expected_returns = None
+    if method != 'weightage':
+        # Statistics are computed once for the whole catalog and gathered per client.
+        catalog_returns, catalog_covariance = fund_return_statistics(catalog.names, store)
+        legs = np.where(selected >= 0, selected, 0)
+        expected_returns = catalog_returns[legs]
+        covariance = catalog_covariance[legs[:, :, None], legs[:, None, :]]
+    weights, leg_amounts, fallback = allocate_batch(
+        weightages, np.asarray(amounts, dtype=np.int64), method, covariance, expected_returns
+    )
+    return selected, weights, leg_amounts, fallback
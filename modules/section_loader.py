@@ -0,0 +1,133 @@
+import concurrent.futures
+import threading
+import time
+from collections import namedtuple
+
+# Dashboard sections fetch their data on a shared thread pool so that one slow upstream
+# (say a broker quote) does not hold up the others. Results are handed back in completion
+# order; a source that misses its own deadline is reported as timed out and its section
+# renders in a degraded state while the rest of the page carries on.
+MAX_WORKERS = 16
+
+SectionResult = namedtuple('SectionResult', ['name', 'value', 'error', 'timed_out', 'elapsed'])
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """Returns the process-wide pool shared by every session's section loads."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='section')
+        return _executor
+
+
+def _script_run_ctx():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        return get_script_run_ctx(suppress_warning=True)
+    except Exception: # Not running under Streamlit
+        return None
+
+
+def _set_ctx(thread: threading.Thread, ctx):
+    """Attaches `ctx` to `thread`, or detaches whatever context it has when `ctx` is None."""
+    from streamlit.runtime.scriptrunner import add_script_run_ctx
+    from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+    if ctx is None:
+        setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, None) # add_script_run_ctx ignores None
+    else:
+        add_script_run_ctx(thread, ctx)
+
+
+class _Task:
+    """
+    One fetch run with the caller's Streamlit context attached, so st.* calls inside data
+    functions (error and warning messages) still reach the right session. Pool threads are
+    reused, so the thread's previous context is put back when the task ends. A task the
+    loader has abandoned past its deadline loses the context at once, and its later st.*
+    calls go nowhere rather than into a later run or another session.
+    """
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.abandoned = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def run(self, func, args, kwargs):
+        if self.ctx is None:
+            return func(*args, **kwargs)
+        thread = threading.current_thread()
+        previous = _script_run_ctx() # None for a fresh pool thread
+        with self._lock:
+            if not self.abandoned:
+                _set_ctx(thread, self.ctx)
+                self._thread = thread
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._thread = None
+                _set_ctx(thread, previous)
+
+    def abandon(self):
+        with self._lock:
+            self.abandoned = True
+            if self._thread is not None:
+                _set_ctx(self._thread, None)
+
+
+class SectionLoader:
+    """
+    Starts independent data fetches at once and yields each one as it finishes.
+    Usage: submit() every fetch up front, render whatever does not depend on them, then
+    iterate results() and fill each section's placeholder as its result arrives.
+    """
+
+    def __init__(self, executor: concurrent.futures.Executor = None):
+        self.executor = executor or get_executor()
+        self._ctx = _script_run_ctx()
+        self._pending = {} # future -> (name, started_at, deadline)
+        self._tasks = {} # future -> _Task
+
+    def submit(self, name: str, func, *args, timeout: float = 10.0, **kwargs):
+        started_at = time.monotonic()
+        task = _Task(self._ctx)
+        future = self.executor.submit(task.run, func, args, kwargs)
+        self._pending[future] = (name, started_at, started_at + timeout)
+        self._tasks[future] = task
+        return future
+
+    def results(self):
+        """
+        Yields a SectionResult per submitted fetch in completion order. Waits at most until
+        the latest deadline; fetches still running past their own deadline are cancelled if
+        not yet started and otherwise abandoned (their thread finishes in the background,
+        detached from this session).
+        """
+        while self._pending:
+            now = time.monotonic()
+            for future, (name, started_at, deadline) in list(self._pending.items()):
+                if deadline <= now and not future.done():
+                    future.cancel()
+                    self._tasks.pop(future).abandon()
+                    del self._pending[future]
+                    yield SectionResult(name, None, None, True, now - started_at)
+            if not self._pending:
+                break
+            next_deadline = min(deadline for _, _, deadline in self._pending.values())
+            done, _ = concurrent.futures.wait(
+                self._pending, timeout=max(0.0, next_deadline - time.monotonic()),
+                return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                name, started_at, _ = self._pending.pop(future)
+                del self._tasks[future]
+                elapsed = time.monotonic() - started_at
+                try:
+                    yield SectionResult(name, future.result(), None, False, elapsed)
+                except Exception as e:
+                    yield SectionResult(name, None, e, False, elapsed)
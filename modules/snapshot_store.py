@@ -0,0 +1,245 @@
+import hashlib
+import json
+import mmap
+import os
+import stat
+import struct
+import time
+import warnings
+from collections import namedtuple
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError: # Not on Windows: snapshots are still shared, fetches just are not coalesced across processes
+    fcntl = None
+
+# Cached upstream results shared by every Streamlit server process on the machine, so N
+# workers make one upstream call per key instead of N (see `shared` in modules/cache.py).
+# Each (cache name, key) is one file under SNAPSHOT_DIR, which defaults to a directory in
+# memory rather than on disk ($XDG_RUNTIME_DIR, else /dev/shm) private to the user the app
+# runs as. A file is a small JSON header followed by the value, and nothing in it is ever
+# unpickled or otherwise executed:
+#   frame  a DataFrame with a default index. Numeric and datetime columns are stored as raw
+#          aligned buffers after the header that readers memory-map, so they are read-only
+#          views of the one shared copy; other columns are JSON lists.
+#   json   anything JSON can hold, e.g. a stock quote dict.
+# Writers replace a file atomically and never modify one in place, so a reader's mapping
+# stays valid however often the snapshot is refreshed.
+# A lock file per key lets one process fetch while the others wait for its snapshot.
+# The directory must belong to this user and be closed to everyone else, as must every file
+# read from it; otherwise sharing is turned off. Set SNAPSHOT_DIR to an empty string to keep
+# every cache process-local.
+LOCK_WAIT_SECONDS = 60 # Longest a process waits for another's fetch before fetching itself
+LOCK_POLL_SECONDS = 0.05
+ALIGNMENT = 64
+_HEADER_LENGTH = struct.Struct('<Q')
+_BUFFER_KINDS = 'biufcmM' # NumPy dtype kinds stored as raw buffers
+
+
+def _default_snapshot_dir() -> str:
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') # Per user, mode 0700, in memory
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'fundgenius-snapshots')
+    root = '/dev/shm' if os.path.isdir('/dev/shm') else os.environ.get('TMPDIR', '/tmp')
+    return os.path.join(root, f'fundgenius-snapshots-{os.getuid()}' if hasattr(os, 'getuid') else 'fundgenius-snapshots')
+
+
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", _default_snapshot_dir())
+
+Snapshot = namedtuple('Snapshot', ['value', 'fetched_at', 'expires_at'])
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _is_private(status: os.stat_result) -> bool:
+    """Whether a file or directory belongs to this user and no one else can write it (or, for directories, list it)."""
+    if not hasattr(os, 'getuid'): # Windows: no POSIX owners or modes to check
+        return True
+    closed = 0o077 if stat.S_ISDIR(status.st_mode) else 0o022
+    return status.st_uid == os.getuid() and not status.st_mode & closed
+
+
+def _encode(value) -> tuple:
+    """(header fields, buffers) for `value`; raises TypeError for values snapshots cannot hold."""
+    import numpy as np
+    import pandas as pd
+    if isinstance(value, pd.DataFrame):
+        if not value.index.equals(pd.RangeIndex(len(value))):
+            raise TypeError("Only DataFrames with a default index can be shared as snapshots.")
+        columns, texts, buffers = [], {}, []
+        for position, name in enumerate(value.columns):
+            if not isinstance(name, str):
+                raise TypeError("Only DataFrames with string column names can be shared as snapshots.")
+            column = value.iloc[:, position]
+            if isinstance(column.dtype, np.dtype) and column.dtype.kind in _BUFFER_KINDS:
+                columns.append({'name': name, 'dtype': column.dtype.str, 'buffer': len(buffers)})
+                buffers.append(np.ascontiguousarray(column.to_numpy()).view(np.uint8))
+            else:
+                columns.append({'name': name, 'dtype': str(column.dtype)})
+                texts[name] = column.astype(object).where(column.notna(), None).tolist()
+        return {'kind': 'frame', 'rows': len(value), 'columns': columns, 'texts': texts}, buffers
+    json.dumps(value) # Raises TypeError for anything else JSON cannot hold
+    return {'kind': 'json', 'value': value}, []
+
+
+def _decode(fields: dict, buffers: list):
+    if fields['kind'] == 'json':
+        return fields['value']
+    import numpy as np
+    import pandas as pd
+    data = {}
+    for column in fields['columns']:
+        name = column['name']
+        if 'buffer' in column:
+            data[name] = np.frombuffer(buffers[column['buffer']], dtype=np.dtype(column['dtype']))
+        else:
+            data[name] = pd.Series(fields['texts'][name], dtype=column['dtype'])
+    return pd.DataFrame(data, index=pd.RangeIndex(fields['rows']), copy=False)
+
+
+class SnapshotStore:
+    """
+    Cache entries shared between processes as memory-mapped files under `root`, which is
+    created if need be and must be private to this user (PermissionError otherwise).
+    """
+
+    def __init__(self, root: str = SNAPSHOT_DIR):
+        self.root = root
+        os.makedirs(os.path.dirname(os.path.abspath(root)), exist_ok=True)
+        try:
+            os.mkdir(root, 0o700)
+        except FileExistsError:
+            pass
+        status = os.lstat(root) # Not stat: a symlink to someone else's directory is refused too
+        if not stat.S_ISDIR(status.st_mode) or not _is_private(status):
+            raise PermissionError(f"Snapshot directory {root} must be a directory owned by this user "
+                                  f"and closed to everyone else (mode 0700).")
+
+    def _path(self, name: str, key) -> str:
+        return os.path.join(self.root, name, hashlib.sha256(repr(key).encode('utf-8')).hexdigest()[:32])
+
+    def _directory(self, name: str) -> str:
+        directory = os.path.join(self.root, name)
+        try:
+            os.mkdir(directory, 0o700) # Inside the private root, so no one else can have made it
+        except FileExistsError:
+            pass
+        return directory
+
+    def read(self, name: str, key, newer_than: float = None):
+        """
+        The Snapshot stored for `key`, or None if there is none. With `newer_than`, also
+        None unless the snapshot was fetched after it, which costs only a header read.
+        """
+        try:
+            with open(self._path(name, key), 'rb') as f:
+                if not _is_private(os.fstat(f.fileno())):
+                    return None
+                (header_length,) = _HEADER_LENGTH.unpack(f.read(_HEADER_LENGTH.size))
+                header = json.loads(f.read(header_length))
+                if newer_than is not None and header['fetched_at'] <= newer_than:
+                    return None
+                view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except (OSError, ValueError, KeyError, struct.error):
+            return None
+        start = _align(_HEADER_LENGTH.size + header_length)
+        try:
+            (offset, length), *layout = header['chunks']
+            fields = json.loads(bytes(view[start + offset:start + offset + length]))
+            value = _decode(fields, [view[start + offset:start + offset + length] for offset, length in layout])
+        except Exception: # Truncated or from an incompatible version: as good as missing
+            return None
+        return Snapshot(value, header['fetched_at'], header['expires_at'])
+
+    def write(self, name: str, key, value, fetched_at: float, expires_at: float):
+        """Stores `value` for `key`; raises TypeError if it is neither a DataFrame nor JSON-serializable."""
+        import tempfile
+        fields, buffers = _encode(value)
+        chunks = [json.dumps(fields).encode('utf-8')] + buffers # The value's JSON fields, then its byte buffers
+        layout, offset = [], 0
+        for chunk in chunks:
+            layout.append([offset, len(chunk)])
+            offset = _align(offset + len(chunk))
+        header = json.dumps({'fetched_at': fetched_at, 'expires_at': expires_at, 'chunks': layout}).encode('utf-8')
+
+        fd, staging = tempfile.mkstemp(prefix='.staging-', dir=self._directory(name)) # Mode 0600
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_HEADER_LENGTH.pack(len(header)))
+                f.write(header)
+                start = _align(f.tell())
+                for (offset, _), chunk in zip(layout, chunks):
+                    f.seek(start + offset)
+                    f.write(chunk)
+            os.replace(staging, self._path(name, key))
+        except BaseException:
+            os.unlink(staging)
+            raise
+
+    @contextmanager
+    def lock(self, name: str, key, wait: bool = True):
+        """
+        Holds the key's fetch lock for the block and yields True, or yields False without
+        it: at once if `wait` is false and another process holds it, or after LOCK_WAIT_SECONDS.
+        """
+        if fcntl is None:
+            yield True
+            return
+        self._directory(name)
+        fd = os.open(self._path(name, key) + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            deadline = time.monotonic() + (LOCK_WAIT_SECONDS if wait else 0)
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        yield False
+                        return
+                    time.sleep(LOCK_POLL_SECONDS)
+            try:
+                yield True
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def invalidate(self, name: str, key=None):
+        """Drops the snapshot of one key, or of every key of the cache when `key` is None."""
+        if key is not None:
+            paths = [self._path(name, key)]
+        else:
+            directory = os.path.join(self.root, name)
+            try:
+                paths = [os.path.join(directory, entry) for entry in os.listdir(directory)
+                         if not entry.endswith('.lock') and not entry.startswith('.')]
+            except FileNotFoundError:
+                return
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+_store = None
+_store_checked = False
+
+
+def get_snapshot_store():
+    """
+    Returns the SnapshotStore at SNAPSHOT_DIR, or None when SNAPSHOT_DIR is set empty or
+    is not private to this user, in which case every cache stays process-local.
+    """
+    global _store, _store_checked
+    if not _store_checked and SNAPSHOT_DIR:
+        _store_checked = True
+        try:
+            _store = SnapshotStore(SNAPSHOT_DIR)
+        except OSError as e:
+            warnings.warn(f"Not sharing cached data between processes: {e}")
+    return _store
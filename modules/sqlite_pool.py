@@ -0,0 +1,65 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Shared by the SQLite-backed stores (modules/fund_store.py, modules/manager_notes.py).
+# Streamlit serves every session from its own thread, so each store keeps a small pool of
+# connections that any thread may borrow rather than one connection per thread.
+DEFAULT_POOL_SIZE = 4
+BUSY_TIMEOUT_SECONDS = 30
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of up to `size` SQLite connections, opened on demand. A thread borrows
+    one for the length of a `with pool.connection()` block; when all are in use it waits.
+    Connections run in WAL mode, so readers are never blocked by a writer. `on_connect`, if
+    given, is called with every new connection, e.g. to register SQL functions.
+    """
+
+    def __init__(self, path: str, size: int = DEFAULT_POOL_SIZE, on_connect=None):
+        self.path = path
+        self.size = size
+        self.on_connect = on_connect
+        self._idle = queue.LifoQueue() # Most recently used first: its pages are warmest
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        if self.on_connect is not None:
+            self.on_connect(connection)
+        return connection
+
+    @contextmanager
+    def connection(self):
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened < self.size
+                self._opened += can_open
+            if not can_open:
+                connection = self._idle.get()
+            else:
+                try:
+                    connection = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
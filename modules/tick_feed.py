@@ -0,0 +1,197 @@
+import json
+import os
+import socket
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# Streaming quotes for the market overview panel. A background subscriber reads a
+# line-delimited JSON tick feed over TCP, one tick per line:
+#   {"symbol": "SBIN.NS", "price": 800.55, "open": 795.0, "ts": 1760000000.25}
+# and keeps the last N ticks per symbol in fixed-size NumPy ring buffers. The dashboard
+# reads snapshots from the buffers on a timer instead of polling the quote API.
+# modules/mock_broker.py has a local publisher that speaks the same protocol.
+DEFAULT_CAPACITY = 512
+RECONNECT_BACKOFF_SECONDS = (0.5, 1, 2, 5, 10)
+SNAPSHOT_RETRIES = 8
+
+
+class TickRingBuffer:
+    """
+    Last `capacity` (timestamp, price) ticks of one symbol.
+    There is a single writer (the subscriber thread). Readers never take a lock: a
+    sequence counter is made odd while a write is in progress and even afterwards, and a
+    reader retries its copy if the counter moved underneath it (a seqlock).
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._timestamps = np.zeros(capacity)
+        self._prices = np.zeros(capacity)
+        self._open = np.nan
+        self._count = 0 # Total ticks ever appended; the next slot is _count % capacity
+        self._sequence = 0
+
+    def append(self, timestamp: float, price: float, open_price: float = None):
+        self._sequence += 1
+        slot = self._count % self.capacity
+        self._timestamps[slot] = timestamp
+        self._prices[slot] = price
+        if open_price is not None:
+            self._open = open_price
+        self._count += 1
+        self._sequence += 1
+
+    def snapshot(self) -> tuple:
+        """Returns (timestamps, prices, open) copies in chronological order, without blocking the writer."""
+        for _ in range(SNAPSHOT_RETRIES):
+            sequence = self._sequence
+            if sequence % 2 == 0:
+                count = self._count
+                timestamps = self._timestamps.copy()
+                prices = self._prices.copy()
+                open_price = self._open
+                if self._sequence == sequence:
+                    break
+            time.sleep(0) # Let the writer finish its tick
+        else:
+            # Still racing a busy writer: settle for a copy that may be one tick torn.
+            count, timestamps, prices, open_price = self._count, self._timestamps.copy(), self._prices.copy(), self._open
+        n = min(count, self.capacity)
+        if count > self.capacity:
+            # The buffer has wrapped: the oldest tick sits at the next write slot.
+            start = count % self.capacity
+            timestamps = np.roll(timestamps, -start)
+            prices = np.roll(prices, -start)
+        return timestamps[:n], prices[:n], open_price
+
+    def latest(self):
+        """Returns (timestamp, price, open) of the newest tick, or None before the first one."""
+        timestamps, prices, open_price = self.snapshot()
+        if not len(prices):
+            return None
+        return timestamps[-1], prices[-1], open_price
+
+
+class TickSubscriber:
+    """
+    Background thread that subscribes to a tick feed at host:port and fills one
+    TickRingBuffer per symbol, reconnecting with backoff when the feed drops.
+    """
+
+    def __init__(self, host: str, port: int, capacity: int = DEFAULT_CAPACITY):
+        self.host = host
+        self.port = port
+        self.capacity = capacity
+        self.buffers = {}
+        self.ticks_received = 0
+        self.connected = False
+        self.last_error = None
+        self._stop = threading.Event()
+        self._socket = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='tick-subscriber', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        sock = self._socket
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def _run(self):
+        attempt = 0
+        while not self._stop.is_set():
+            try:
+                with socket.create_connection((self.host, self.port), timeout=5) as sock:
+                    sock.settimeout(None)
+                    self._socket = sock
+                    self.connected = True
+                    attempt = 0
+                    with sock.makefile('r', encoding='utf-8') as lines:
+                        for line in lines:
+                            self._handle(line)
+                            if self._stop.is_set():
+                                break
+            except (OSError, ValueError) as e:
+                self.last_error = e
+            finally:
+                self.connected = False
+                self._socket = None
+            if not self._stop.is_set():
+                self._stop.wait(RECONNECT_BACKOFF_SECONDS[min(attempt, len(RECONNECT_BACKOFF_SECONDS) - 1)])
+                attempt += 1
+
+    def _handle(self, line: str):
+        try:
+            tick = json.loads(line)
+            symbol = tick['symbol']
+            price = float(tick['price'])
+        except (ValueError, KeyError, TypeError):
+            return # Skip malformed ticks rather than dropping the connection
+        buffer = self.buffers.get(symbol)
+        if buffer is None:
+            buffer = TickRingBuffer(self.capacity)
+            self.buffers[symbol] = buffer
+        open_price = tick.get('open')
+        buffer.append(float(tick.get('ts', time.time())), price, float(open_price) if open_price is not None else None)
+        self.ticks_received += 1
+
+    def series(self, symbol: str) -> pd.Series:
+        """Buffered prices for `symbol` indexed by tick time, e.g. for an intraday sparkline."""
+        buffer = self.buffers.get(symbol)
+        if buffer is None:
+            return pd.Series(dtype=np.float64, name=symbol)
+        timestamps, prices, _ = buffer.snapshot()
+        return pd.Series(prices, index=pd.to_datetime(timestamps, unit='s'), name=symbol)
+
+    def quote(self, symbol: str):
+        """Latest tick for `symbol` in get_stock_data's shape (price fields only), or None."""
+        buffer = self.buffers.get(symbol)
+        latest = buffer.latest() if buffer is not None else None
+        if latest is None:
+            return None
+        timestamp, price, open_price = (float(v) for v in latest)
+        change = price - open_price if not np.isnan(open_price) else np.nan
+        return {
+            'symbol': symbol,
+            'current_price': price,
+            'change': change,
+            'percent_change': change / open_price * 100 if not np.isnan(open_price) else np.nan,
+            'open': open_price,
+            'timestamp': timestamp
+        }
+
+
+_subscriber = None
+_subscriber_lock = threading.Lock()
+
+
+def get_tick_subscriber():
+    """
+    Returns the process-wide subscriber for the TICK_FEED_ADDRESS ("host:port") secret or
+    environment variable, starting it on first use, or None when no feed is configured.
+    """
+    global _subscriber
+    with _subscriber_lock:
+        if _subscriber is None:
+            try:
+                import streamlit as st
+                address = st.secrets.get("TICK_FEED_ADDRESS")
+            except Exception: # No secrets file configured
+                address = None
+            address = address or os.environ.get("TICK_FEED_ADDRESS")
+            if address:
+                host, _, port = address.rpartition(':')
+                _subscriber = TickSubscriber(host or '127.0.0.1', int(port)).start()
+        return _subscriber
@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+# Modules read their storage locations from the environment at import time, so point them
+# at a scratch directory before any test imports them, and drop every upstream the app
+# could otherwise reach. Each test that writes data still uses its own tmp_path.
+_SCRATCH = tempfile.mkdtemp(prefix='fundgenius-tests-')
+os.environ['NAV_HISTORY_DIR'] = os.path.join(_SCRATCH, 'nav_history')
+os.environ['CATALOG_SNAPSHOT_DIR'] = os.path.join(_SCRATCH, 'catalog_snapshot')
+os.environ['NOTES_DB_PATH'] = os.path.join(_SCRATCH, 'manager_notes.sqlite3')
+os.environ['SNAPSHOT_DIR'] = '' # Keep every cache process-local
+for name in ('FUND_DB_PATH', 'MARKET_DATA_API_URL', 'MARKET_DATA_API_KEY', 'TICK_FEED_ADDRESS', 'NOTES_SOURCE'):
+    os.environ.pop(name, None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,61 @@
+import numpy as np
+
+from modules.allocation import RISK_AVERSION, ROUNDING_UNIT, largest_remainder_round, mean_variance_weights
+
+
+def test_rows_add_up_to_their_amounts():
+    rng = np.random.default_rng(7)
+    weights = rng.random((500, 3))
+    weights[rng.random((500, 3)) < 0.2] = 0
+    weights[weights.sum(axis=1) == 0, 0] = 1
+    weights /= weights.sum(axis=1, keepdims=True)
+    amounts = rng.integers(1, 10_000_000, size=500)
+
+    legs = largest_remainder_round(weights, amounts)
+
+    assert legs.dtype.kind == 'i'
+    np.testing.assert_array_equal(legs.sum(axis=1), amounts)
+    assert (legs >= 0).all()
+    assert (legs[weights == 0] == 0).all()
+
+
+def test_legs_are_unit_multiples_apart_from_the_residual():
+    weights = np.array([[0.5, 0.3, 0.2], [1 / 3, 1 / 3, 1 / 3]])
+    amounts = np.array([100_050, 100_000 + ROUNDING_UNIT - 1])
+
+    legs = largest_remainder_round(weights, amounts)
+
+    np.testing.assert_array_equal(legs.sum(axis=1), amounts)
+    residuals = amounts % ROUNDING_UNIT
+    largest = np.argmax(weights, axis=1)
+    for row in range(len(legs)):
+        unrounded = legs[row].copy()
+        unrounded[largest[row]] -= residuals[row]
+        assert (unrounded % ROUNDING_UNIT == 0).all()
+
+
+def test_ties_go_to_the_earlier_leg():
+    legs = largest_remainder_round(np.array([[1 / 3, 1 / 3, 1 / 3]]), np.array([100]), unit=1)
+    np.testing.assert_array_equal(legs, [[34, 33, 33]])
+
+
+def test_rows_without_weights_get_nothing():
+    legs = largest_remainder_round(np.array([[0.0, 0.0, 0.0], [np.nan, 1.0, 0.0]]), np.array([5_000, 5_000]))
+    np.testing.assert_array_equal(legs, [[0, 0, 0], [0, 5_000, 0]])
+
+
+def test_mean_variance_converges_for_a_two_leg_mix():
+    # Realistic annual variances in a three-leg layout with the third leg unused; the
+    # optimum is interior, so with w2 = 1 - w1 it has a closed form.
+    sigma = np.array([[0.012, 0.004], [0.004, 0.008]])
+    mu = np.array([0.10, 0.095])
+    covariance = np.zeros((1, 3, 3))
+    covariance[0, :2, :2] = sigma
+    expected_returns = np.array([[*mu, 0.0]])
+    mask = np.array([[True, True, False]])
+    w1 = ((mu[0] - mu[1] + RISK_AVERSION * (sigma[1, 1] - sigma[0, 1]))
+          / (RISK_AVERSION * (sigma[0, 0] - 2 * sigma[0, 1] + sigma[1, 1])))
+
+    weights = mean_variance_weights(covariance, expected_returns, mask, iterations=30)
+
+    np.testing.assert_allclose(weights, [[w1, 1 - w1, 0.0]], atol=1e-9)
@@ -0,0 +1,107 @@
+import io
+import math
+
+import pytest
+import requests
+
+from modules import amfi_data
+from modules.amfi_data import SBI_AMC_NAME, fetch_navs, iter_navall_records
+
+NAVALL = f"""Scheme Code;ISIN Div Payout/ ISIN Growth;ISIN Div Reinvestment;Scheme Name;Net Asset Value;Date
+
+Open Ended Schemes(Equity Scheme - Large Cap Fund)
+
+Aditya Birla Sun Life Mutual Fund
+
+119551;INF209KA12Z1;INF209KA13Z9;Aditya Birla Sun Life Frontline Equity Fund - Direct Plan;512.3400;17-Oct-2026
+
+{SBI_AMC_NAME}
+
+119598;INF200K01QX4;-;SBI Bluechip Fund - Direct Plan - Growth;98.7654;17-Oct-2026
+119599;INF200K01QY2;-;SBI Bluechip Fund - Direct Plan - IDCW;N.A.;17-Oct-2026
+
+Open Ended Schemes(Debt Scheme - Liquid Fund)
+
+{SBI_AMC_NAME}
+
+119800;INF200K01RA1;-; SBI Liquid Fund - Direct Plan - Growth ;3901.25;16-Oct-2026
+not;a;valid;row
+""".splitlines()
+
+
+def test_only_the_amcs_rows_are_parsed():
+    records = list(iter_navall_records(NAVALL))
+    assert [record['Scheme Code'] for record in records] == [119598, 119599, 119800]
+    assert records[0] == {
+        'Scheme Code': 119598,
+        'Scheme Name': 'SBI Bluechip Fund - Direct Plan - Growth',
+        'Category': 'Equity Scheme - Large Cap Fund',
+        'NAV': 98.7654,
+        'Date': '2026-10-17',
+    }
+    assert records[2]['Scheme Name'] == 'SBI Liquid Fund - Direct Plan - Growth'
+    assert records[2]['Category'] == 'Debt Scheme - Liquid Fund'
+    assert records[2]['Date'] == '2026-10-16'
+
+
+def test_missing_navs_are_nan():
+    records = {record['Scheme Code']: record for record in iter_navall_records(NAVALL)}
+    assert math.isnan(records[119599]['NAV'])
+
+
+def test_every_amc_without_a_filter():
+    records = list(iter_navall_records(NAVALL, amc_name=None))
+    assert [record['Scheme Code'] for record in records] == [119551, 119598, 119599, 119800]
+
+
+def test_bytes_lines_are_decoded():
+    records = list(iter_navall_records(line.encode('utf-8') for line in NAVALL))
+    assert len(records) == 3
+
+
+class FakeSession:
+    """Answers each GET with the next scripted (status, headers, body) and records the request headers."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        self.sent.append(dict(headers or {}))
+        status, response_headers, body = self.responses.pop(0)
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(response_headers)
+        response.raw = io.BytesIO(body.encode())
+        response.url = url
+        return response
+
+
+BODY = '\n'.join(NAVALL)
+
+
+@pytest.fixture(autouse=True)
+def empty_nav_cache(monkeypatch):
+    monkeypatch.setattr(amfi_data, '_nav_cache', {})
+
+
+def test_unchanged_navs_are_revalidated_and_reused():
+    session = FakeSession((200, {'ETag': '"v1"'}, BODY), (304, {}, ''))
+    first = fetch_navs('https://amfi.invalid/NAVAll.txt', session=session)
+    second = fetch_navs('https://amfi.invalid/NAVAll.txt', session=session)
+    assert session.sent == [{}, {'If-None-Match': '"v1"'}]
+    assert len(second) == 3 and second.equals(first)
+
+
+def test_a_304_without_a_cached_copy_is_fetched_again():
+    session = FakeSession((304, {}, ''), (200, {}, BODY))
+    navs = fetch_navs('https://amfi.invalid/NAVAll.txt', session=session)
+    assert session.sent == [{}, {'Cache-Control': 'no-cache'}]
+    assert list(navs['Scheme Code']) == [119598, 119599, 119800]
+
+
+def test_a_repeated_304_without_a_cached_copy_is_an_error():
+    session = FakeSession((304, {}, ''), (304, {}, ''))
+    with pytest.raises(requests.HTTPError):
+        fetch_navs('https://amfi.invalid/NAVAll.txt', session=session)
+    assert amfi_data.get_cached_navs('https://amfi.invalid/NAVAll.txt') is None
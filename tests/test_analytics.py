@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from modules.analytics import compute_metrics, get_metric_scores
+from modules.nav_history import NavHistoryStore
+
+CODES = np.arange(100, 110)
+
+
+def _append_days(store, days, rng):
+    for day in days:
+        store.append_day(day, CODES, 10 * np.exp(rng.normal(0.0005, 0.01, size=len(CODES))) + np.arange(len(CODES)))
+
+
+def test_incremental_scores_match_a_full_recompute(tmp_path):
+    store = NavHistoryStore(str(tmp_path / 'nav_history'))
+    rng = np.random.default_rng(3)
+    days = pd.bdate_range('2021-01-01', periods=900)
+    _append_days(store, days[:800], rng)
+    wanted = [101, 104, 107, -1]
+
+    get_metric_scores(wanted, store=store) # Computed in full
+    _append_days(store, days[800:], rng)
+    for metric in ('sharpe', 'cagr_1y', 'max_drawdown'):
+        full = compute_metrics(store)[metric].reindex([101, 104, 107, -1]).to_numpy()
+        np.testing.assert_allclose(get_metric_scores(wanted, metric, store), full, rtol=1e-9)
+    assert np.isnan(get_metric_scores(wanted, store=store)[-1])
+
+
+def test_scores_of_a_subset_match_the_whole_universe(tmp_path):
+    store = NavHistoryStore(str(tmp_path / 'nav_history'))
+    _append_days(store, pd.bdate_range('2023-01-02', periods=300), np.random.default_rng(5))
+    subset = compute_metrics(store, scheme_codes=[102, 108])
+    everything = compute_metrics(store).loc[[102, 108]]
+    pd.testing.assert_frame_equal(subset, everything, check_exact=False, rtol=1e-12)
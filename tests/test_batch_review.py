@@ -0,0 +1,89 @@
+import io
+import itertools
+
+import pandas as pd
+import pytest
+
+from modules import batch_review
+from modules.batch_review import CHECKPOINT_SUFFIX, run_review
+from modules.recommender import INVESTMENT_GOALS, RISK_PROFILES
+
+CHUNK_ROWS = 25
+
+
+@pytest.fixture
+def profiles(tmp_path):
+    rows = [(risk, goal, duration, 10_000 + 1_750 * index)
+            for index, (risk, goal, duration) in enumerate(itertools.product(RISK_PROFILES, INVESTMENT_GOALS, [1, 4, 12]))]
+    path = tmp_path / 'clients.csv'
+    pd.DataFrame(rows, columns=['risk_profile', 'investment_goal', 'duration_years', 'amount']).to_csv(path, index=False)
+    return str(path), len(rows)
+
+
+def _interrupted_run(monkeypatch, input_path, output_path, after_chunks):
+    review_chunk = batch_review.review_chunk
+    reviewed = []
+
+    def failing(first_row, chunk, method='weightage'):
+        if len(reviewed) == after_chunks:
+            raise KeyboardInterrupt
+        reviewed.append(first_row)
+        return review_chunk(first_row, chunk, method)
+
+    monkeypatch.setattr(batch_review, 'review_chunk', failing)
+    with pytest.raises(KeyboardInterrupt):
+        run_review(input_path, output_path, workers=0, chunk_rows=CHUNK_ROWS, progress=None)
+    monkeypatch.setattr(batch_review, 'review_chunk', review_chunk)
+
+
+def test_resumed_run_matches_a_fresh_one(tmp_path, monkeypatch, profiles):
+    input_path, n_profiles = profiles
+    fresh, resumed = str(tmp_path / 'fresh.csv'), str(tmp_path / 'resumed.csv')
+    assert run_review(input_path, fresh, workers=0, chunk_rows=CHUNK_ROWS, progress=None) == n_profiles
+
+    _interrupted_run(monkeypatch, input_path, resumed, after_chunks=2)
+    with open(resumed, 'ab') as f:
+        f.write(b'half a row that the checkpoint does not cover')
+
+    calls = []
+    review_chunk = batch_review.review_chunk
+    monkeypatch.setattr(batch_review, 'review_chunk', lambda first_row, *args: calls.append(first_row) or review_chunk(first_row, *args))
+    assert run_review(input_path, resumed, workers=0, chunk_rows=CHUNK_ROWS, progress=None) == n_profiles
+
+    assert calls[0] == 2 * CHUNK_ROWS # Picked up after the two chunks already written
+    with open(fresh, 'rb') as a, open(resumed, 'rb') as b:
+        assert a.read() == b.read()
+    assert not (tmp_path / ('resumed.csv' + CHECKPOINT_SUFFIX)).exists()
+
+
+def test_checkpoint_of_another_job_is_ignored(tmp_path, monkeypatch, profiles):
+    input_path, n_profiles = profiles
+    output = str(tmp_path / 'review.csv')
+    _interrupted_run(monkeypatch, input_path, output, after_chunks=1)
+
+    calls = []
+    review_chunk = batch_review.review_chunk
+    monkeypatch.setattr(batch_review, 'review_chunk', lambda first_row, *args: calls.append(first_row) or review_chunk(first_row, *args))
+    assert run_review(input_path, output, workers=0, chunk_rows=2 * CHUNK_ROWS, progress=None) == n_profiles
+    assert calls[0] == 0
+    assert len(pd.read_csv(output)) == n_profiles
+
+
+@pytest.mark.parametrize('damage', ['delete', 'truncate'])
+def test_run_starts_over_when_the_output_is_gone(tmp_path, monkeypatch, profiles, damage):
+    input_path, n_profiles = profiles
+    fresh, output = str(tmp_path / 'fresh.csv'), str(tmp_path / 'review.csv')
+    run_review(input_path, fresh, workers=0, chunk_rows=CHUNK_ROWS, progress=None)
+    _interrupted_run(monkeypatch, input_path, output, after_chunks=2)
+    if damage == 'delete':
+        (tmp_path / 'review.csv').unlink()
+    else:
+        with open(output, 'r+b') as f:
+            f.truncate(100)
+
+    progress = io.StringIO()
+    assert run_review(input_path, output, workers=0, chunk_rows=CHUNK_ROWS, progress=progress) == n_profiles
+
+    assert 'starting over' in progress.getvalue()
+    with open(fresh, 'rb') as a, open(output, 'rb') as b:
+        assert a.read() == b.read()
@@ -0,0 +1,222 @@
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from modules.cache import (IST, NAV_RETRY_SECONDS, TTLCache, cached, expected_nav_date, invalidate_all,
+                           next_nav_refresh_time)
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_the_ttl():
+    clock = FakeClock()
+    cache = TTLCache('test-expiry', ttl=60, clock=clock)
+    cache.set('key', 'value')
+
+    clock.now += 59
+    assert cache.get('key').value == 'value'
+    clock.now += 1
+    assert cache.get('key') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_expires_at_overrides_the_ttl():
+    clock = FakeClock()
+    cache = TTLCache('test-expires-at', expires_at=lambda fetched_at, value: fetched_at + 5, clock=clock)
+    cache.set('key', 'value')
+    clock.now += 5
+    assert cache.get('key') is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache('test-lru', ttl=60, maxsize=2, clock=FakeClock())
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.peek('b') is None
+    assert cache.peek('a').value == 1 and cache.peek('c').value == 3
+
+
+def test_cached_refetches_after_expiry():
+    calls = []
+
+    @cached('test-cached-expiry', ttl=60)
+    def fetch(x):
+        calls.append(x)
+        return x * len(calls)
+
+    clock = FakeClock()
+    fetch.cache.clock = clock
+    assert fetch(2) == 2
+    assert fetch(2) == 2
+    clock.now += 60
+    assert fetch(2) == 4
+    assert calls == [2, 2]
+
+
+def test_cache_if_vetoes_caching_a_result():
+    calls = []
+
+    @cached('test-cached-veto', ttl=60, cache_if=bool)
+    def fetch():
+        calls.append(1)
+        return []
+
+    fetch()
+    fetch()
+    assert len(calls) == 2
+
+
+def test_concurrent_misses_share_one_call():
+    calls = []
+    started = threading.Event()
+
+    @cached('test-single-flight', ttl=60)
+    def fetch(key):
+        calls.append(key)
+        started.set()
+        time.sleep(0.2) # Long enough for every other thread to arrive while it runs
+        return object()
+
+    results = [None] * 16
+
+    def call(index):
+        results[index] = fetch('key')
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(results))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ['key']
+    assert all(result is results[0] for result in results)
+
+
+def test_single_flight_shares_the_error():
+    calls = []
+    barrier = threading.Barrier(4)
+
+    @cached('test-single-flight-error', ttl=60)
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        raise RuntimeError("upstream down")
+
+    errors = []
+
+    def call():
+        barrier.wait()
+        try:
+            fetch()
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(errors) == 4
+
+
+def test_peek_returns_the_entry_without_fetching():
+    calls = []
+
+    @cached('test-peek', ttl=60)
+    def fetch(x):
+        calls.append(x)
+        return x * 2
+
+    assert fetch.peek(3) is None
+    fetch(3)
+    entry = fetch.peek(3)
+    assert (entry.value, entry.fetched_at) == (6, fetch.fetched_at(3))
+    assert calls == [3]
+
+
+def _ist(text):
+    return datetime.fromisoformat(text).replace(tzinfo=IST).timestamp()
+
+
+def test_nav_date_expected_after_each_publish():
+    assert expected_nav_date(_ist('2026-10-15 22:59')) == '2026-10-14'
+    assert expected_nav_date(_ist('2026-10-15 23:05')) == '2026-10-15'
+    assert expected_nav_date(_ist('2026-10-17 23:30')) == '2026-10-16' # Saturday: Friday's NAVs
+    assert expected_nav_date(_ist('2026-10-19 10:00')) == '2026-10-16' # Monday morning
+
+
+def test_navs_fetched_before_amfi_publishes_are_retried_soon():
+    fetched_at = _ist('2026-10-15 23:05')
+    yesterdays = pd.DataFrame({'Date': ['2026-10-14', '2026-10-14']})
+    todays = pd.DataFrame({'Date': ['2026-10-15', None]})
+
+    assert next_nav_refresh_time(fetched_at, yesterdays) == fetched_at + NAV_RETRY_SECONDS
+    assert next_nav_refresh_time(fetched_at, todays) == _ist('2026-10-16 23:00')
+    assert next_nav_refresh_time(_ist('2026-10-16 09:00'), yesterdays.assign(Date='2026-10-15')) == _ist('2026-10-16 23:00')
+
+
+def test_cached_navs_expire_on_the_retry_interval():
+    @cached('test-nav-expiry', expires_at=next_nav_refresh_time)
+    def fetch():
+        return pd.DataFrame({'Date': ['2026-10-14']})
+
+    fetch.cache.clock = FakeClock(_ist('2026-10-15 23:05'))
+    fetch()
+    entry = fetch.peek()
+    assert entry.expires_at - entry.fetched_at == NAV_RETRY_SECONDS
+
+
+def _shared(monkeypatch, store, name, calls):
+    import modules.snapshot_store
+    monkeypatch.setattr(modules.snapshot_store, 'get_snapshot_store', lambda: store)
+
+    @cached(name, ttl=60, shared=True)
+    def fetch():
+        calls.append(1)
+        return {'fetch': len(calls)}
+    return fetch
+
+
+def test_invalidating_refetches_here_without_dropping_the_shared_snapshot(tmp_path, monkeypatch):
+    from modules.snapshot_store import SnapshotStore
+    store = SnapshotStore(str(tmp_path / 'snapshots'))
+    calls = []
+    first = _shared(monkeypatch, store, 'test-shared-refresh', calls)
+    second = _shared(monkeypatch, store, 'test-shared-refresh', calls) # Another process's cache
+
+    clock = FakeClock()
+    first.cache.clock = second.cache.clock = clock
+    assert first() == second() == {'fetch': 1}
+    clock.now += 30
+    first.invalidate()
+    assert first() == {'fetch': 2} # Refetched rather than taken back from the old snapshot
+    assert second() == {'fetch': 1} # Still live in the other process
+    assert store.read('test-shared-refresh', ()).value == {'fetch': 2}
+
+    clock.now += 30
+    assert second() == {'fetch': 2} # Its value expired: picks up the refetch made since
+    assert len(calls) == 2
+
+
+def test_invalidate_all_deletes_shared_snapshots_only_when_asked(tmp_path, monkeypatch):
+    from modules.snapshot_store import SnapshotStore
+    store = SnapshotStore(str(tmp_path / 'snapshots'))
+    fetch = _shared(monkeypatch, store, 'test-shared-reset', [])
+    fetch()
+
+    invalidate_all()
+    assert store.read('test-shared-reset', ()) is not None
+    invalidate_all(shared=True)
+    assert store.read('test-shared-reset', ()) is None
@@ -0,0 +1,43 @@
+import pytest
+
+from modules.fund_store import FundStore
+from modules.recommender import INVESTMENT_GOALS
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FundStore(str(tmp_path / 'funds.sqlite3'))
+    yield store
+    store.close()
+
+
+def _fund(code, name, category='Equity Scheme - Large Cap Fund', **fields):
+    return dict(scheme_code=code, name=name, category=category, **fields)
+
+
+def test_a_scheme_listed_twice_in_one_batch_is_written_once(store):
+    goals = INVESTMENT_GOALS[:2]
+    written = store.upsert_funds([
+        _fund(1, 'First', goal_suitability=goals),
+        _fund(2, 'Old name', goal_suitability=goals),
+        _fund(2, 'New name', goal_suitability=goals, aum_crore=12.5),
+    ])
+
+    assert written == 2
+    assert len(store) == 2
+    frame = store.load_frame().set_index('scheme_code')
+    assert frame.loc[2, 'name'] == 'New name'
+    assert frame.loc[2, 'aum_crore'] == 12.5
+    with store.pool.connection() as connection:
+        goal_rows = connection.execute("SELECT COUNT(*) FROM fund_goals WHERE scheme_code = 2").fetchone()[0]
+    assert goal_rows == len(goals)
+
+
+def test_upserting_keeps_positions_and_stored_optional_fields(store):
+    store.upsert_funds([_fund(1, 'First', aum_crore=100.0), _fund(2, 'Second')])
+    store.upsert_funds([_fund(1, 'First, renamed')])
+
+    frame = store.load_frame()
+    assert frame['scheme_code'].tolist() == [1, 2]
+    assert frame.loc[0, 'name'] == 'First, renamed'
+    assert frame.loc[0, 'aum_crore'] == 100.0
@@ -0,0 +1,30 @@
+import socket
+import warnings
+
+import pytest
+
+from modules import metrics
+
+
+@pytest.fixture
+def unresolved_server(monkeypatch):
+    monkeypatch.setattr(metrics, '_server', None)
+    monkeypatch.setattr(metrics, '_server_resolved', False)
+
+
+def test_a_taken_port_is_reported_once(monkeypatch, unresolved_server):
+    with socket.socket() as taken:
+        taken.bind(('127.0.0.1', 0))
+        taken.listen()
+        monkeypatch.setenv('METRICS_PORT', str(taken.getsockname()[1]))
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            assert metrics.get_metrics_server() is None
+            assert metrics.get_metrics_server() is None
+    assert len(caught) == 1
+    assert 'Metrics endpoint not started' in str(caught[0].message)
+
+
+def test_no_port_configured(monkeypatch, unresolved_server):
+    monkeypatch.delenv('METRICS_PORT', raising=False)
+    assert metrics.get_metrics_server() is None
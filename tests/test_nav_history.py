@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.nav_history import NavHistoryStore, from_day_numbers, to_day_number
+
+DAYS = pd.date_range('2024-01-01', periods=10, freq='D')
+CODES = np.array([119551, 100016, 120503, 100027])
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = NavHistoryStore(str(tmp_path / 'nav_history'))
+    for offset, day in enumerate(DAYS):
+        navs = 10.0 + offset + np.arange(len(CODES)) / 10
+        if offset == 3:
+            navs[2] = np.nan # No NAV that day: the scheme has no row for it
+        store.append_day(day, CODES, navs)
+    return store
+
+
+def test_append_and_range(store):
+    assert len(store) == len(DAYS) * len(CODES) - 1
+    assert store.last_date() == to_day_number(DAYS[-1])
+
+    dates, codes, navs = store.get_range('2024-01-02', '2024-01-03')
+    assert list(from_day_numbers(np.unique(dates))) == list(DAYS[1:3])
+    assert list(codes) == sorted(CODES) * 2
+    assert not dates.flags.writeable
+
+
+def test_reappending_the_last_day_keeps_stored_navs(store):
+    assert store.append_day(DAYS[-1], CODES, np.ones(len(CODES))) == 0
+    assert len(store) == len(DAYS) * len(CODES) - 1
+    assert (store.get_range(DAYS[-1])[2] != 1).all()
+
+
+def test_late_schemes_are_merged_into_the_last_day(store):
+    late = [100020, 999999]
+    assert store.append_day(DAYS[-1], list(CODES) + late, np.arange(len(CODES) + 2, dtype=np.float64)) == 2
+
+    dates, codes, navs = store.get_range(DAYS[-1])
+    assert list(codes) == sorted(list(CODES) + late)
+    assert navs[list(codes).index(999999)] == len(CODES) + 1
+    assert navs[list(codes).index(CODES[0])] == 10.0 + 9 # Stored NAVs are kept
+    assert store.get_nav_series(100020).index.tolist() == [DAYS[-1]]
+    assert len(store.get_range('2024-01-01', DAYS[-2])[1]) == 9 * len(CODES) - 1 # Earlier days untouched
+    store.append_day(DAYS[-1] + pd.Timedelta(days=1), [1], [1.0])
+    assert store.get_nav_series(999999).index.tolist() == [DAYS[-1]]
+
+
+def test_an_interrupted_merge_is_rolled_back(store, monkeypatch):
+    before = [np.array(column) for column in store.get_range()]
+    real_open = open
+
+    def failing_open(path, mode='r', *args, **kwargs):
+        if str(path).endswith('dates.i4') and mode == 'ab':
+            raise OSError("disk full")
+        return real_open(path, mode, *args, **kwargs)
+
+    monkeypatch.setattr('builtins.open', failing_open)
+    with pytest.raises(OSError):
+        store.append_day(DAYS[-1], [100017, 100018], [1.0, 2.0])
+    monkeypatch.undo()
+
+    store.append_day(DAYS[-1] + pd.Timedelta(days=1), [1], [1.0]) # The next write rolls back first
+    after = store.get_range(None, DAYS[-1])
+    for old, new in zip(before, after):
+        np.testing.assert_array_equal(old, new)
+
+
+def test_appending_an_earlier_day_raises(store):
+    with pytest.raises(ValueError):
+        store.append_day(DAYS[0], CODES, np.ones(len(CODES)))
+
+
+def test_duplicate_codes_in_a_day_raise(store):
+    with pytest.raises(ValueError):
+        store.append_day(DAYS[-1] + pd.Timedelta(days=1), [1, 1], [1.0, 2.0])
+
+
+def test_nav_series(store):
+    series = store.get_nav_series(120503)
+    position = list(CODES).index(120503)
+    assert list(series.index) == [day for offset, day in enumerate(DAYS) if offset != 3]
+    np.testing.assert_allclose(series.to_numpy(), [10.0 + offset + position / 10 for offset in range(10) if offset != 3])
+
+    bounded = store.get_nav_series(120503, '2024-01-05', '2024-01-06')
+    assert list(bounded.index) == list(DAYS[4:6])
+    assert store.get_nav_series(999999).empty
+
+
+def test_get_schemes_matches_a_full_scan(store):
+    wanted = [100016, 120503, 424242]
+    for start, end in [(None, None), ('2024-01-03', '2024-01-07'), ('2024-02-01', None)]:
+        dates, codes, navs = store.get_range(start, end)
+        mask = np.isin(codes, wanted)
+        expected = (dates[mask], codes[mask], navs[mask])
+        for actual, scanned in zip(store.get_schemes(wanted, start, end), expected):
+            np.testing.assert_array_equal(actual, scanned)
+
+
+def test_ingest_navs_appends_each_new_day_once(tmp_path):
+    store = NavHistoryStore(str(tmp_path / 'nav_history'))
+    navs = pd.DataFrame({
+        'Scheme Code': [2, 1, 2],
+        'Scheme Name': ['Two', 'One', 'Two'],
+        'NAV': [20.0, 10.0, 21.0],
+        'Date': ['2024-03-01', '2024-03-01', '2024-03-04'],
+    })
+    assert store.ingest_navs(navs) == 3
+    assert store.ingest_navs(navs) == 0
+    late = pd.DataFrame({'Scheme Code': [3], 'Scheme Name': ['Three'], 'NAV': [30.0], 'Date': ['2024-03-04']})
+    assert store.ingest_navs(late) == 1 # Published late for the last stored day
+    assert store.get_nav_series(3).tolist() == [30.0]
+    assert store.get_nav_series(2).tolist() == [20.0, 21.0]
+    assert store.scheme_names() == {1: 'One', 2: 'Two', 3: 'Three'}
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from modules.nav_table import get_nav_table
+
+NAVS = pd.DataFrame({
+    'Scheme Code': [1, 2, 3],
+    'Scheme Name': ['SBI Small Cap Fund - Direct Growth', 'SBI Bluechip Fund - Regular', 'SBI Liquid Fund'],
+    'NAV': [150.5, 80.25, 3900.0],
+    'Date': ['2026-10-16'] * 3,
+})
+
+
+def test_search_and_sorted_pages():
+    table = get_nav_table(NAVS)
+    assert table.search('cap').tolist() == [0]
+    assert table.search('fund sbi').tolist() == [0, 1, 2]
+    assert table.search('blue regular').tolist() == [1]
+    page = table.page('fund', sort_by='NAV', descending=True, page_size=2)
+    assert page.rows['Scheme Code'].tolist() == [3, 1]
+    assert (page.matches, page.page, page.pages) == (3, 1, 2)
+
+
+def test_table_is_kept_per_fetch_time():
+    table = get_nav_table(NAVS, fetched_at=100.0)
+    assert get_nav_table(NAVS.copy(), fetched_at=100.0) is table # The same fetch, loaded again from a snapshot
+
+    refetched = NAVS.iloc[:2].reset_index(drop=True)
+    rebuilt = get_nav_table(refetched, fetched_at=200.0)
+    assert rebuilt is not table and len(rebuilt) == 2
+    assert get_nav_table(refetched) is not get_nav_table(refetched) # Uncached frames are not kept
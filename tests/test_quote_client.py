@@ -0,0 +1,114 @@
+import json
+import threading
+import time
+from email.utils import formatdate
+
+import pytest
+import requests
+
+from modules import quote_client
+from modules.quote_client import QuoteClient, QuoteClientError, retry_after_seconds
+
+
+class FakeClock:
+    """Monotonic clock that only moves when the client sleeps; records every sleep."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeSession:
+    """Answers each GET with the next scripted (status, headers) or a quote for every symbol."""
+
+    def __init__(self, script=()):
+        self.script = list(script)
+        self.requested = []
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None):
+        with self._lock:
+            symbols = params['symbols'].split(',')
+            self.requested.append(symbols)
+            status, headers = self.script.pop(0) if self.script else (200, {})
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response._content = json.dumps({'quotes': {s: {'symbol': s, 'current_price': 1.0} for s in symbols}}).encode()
+        return response
+
+    def close(self):
+        pass
+
+
+def make_client(script=(), **kwargs):
+    clock = FakeClock()
+    client = QuoteClient('http://quotes.invalid', clock=clock, sleep=clock.sleep, **kwargs)
+    client.session = FakeSession(script)
+    return client, clock
+
+
+def test_tickers_are_split_into_batches():
+    client, _ = make_client(batch_size=2)
+    try:
+        quotes = client.get_quotes(['A', 'B', 'C', 'A', 'D', 'E'])
+    finally:
+        client.close()
+    assert sorted(client.session.requested) == [['A', 'B'], ['C', 'D'], ['E']]
+    assert list(quotes) == ['A', 'B', 'C', 'D', 'E']
+    assert all(quote['symbol'] == symbol for symbol, quote in quotes.items())
+
+
+def test_server_errors_are_retried_with_bounded_backoff():
+    client, clock = make_client([(503, {}), (502, {})], backoff_base=0.5, backoff_cap=0.8)
+    try:
+        assert client.get_quotes(['A'])['A']['symbol'] == 'A'
+    finally:
+        client.close()
+    assert client.requests_sent == 3 and client.retries == 2
+    assert len(clock.sleeps) == 2
+    assert 0 <= clock.sleeps[0] <= 0.5 and 0 <= clock.sleeps[1] <= 0.8 # base * 2**attempt, capped
+
+
+def test_a_failed_batch_is_reported_to_its_caller_only():
+    client, _ = make_client([(500, {})] * 2, batch_size=1, max_concurrency=1, max_retries=1, backoff_base=0)
+    try:
+        errors, others = [], []
+        quotes = client.get_quotes(['A', 'B'], errors=errors)
+        assert client.get_quotes(['C'], errors=others) == {'C': {'symbol': 'C', 'current_price': 1.0}}
+    finally:
+        client.close()
+    assert quotes['A'] is None and quotes['B']['symbol'] == 'B'
+    assert len(errors) == 1 and isinstance(errors[0], QuoteClientError)
+    assert others == []
+
+
+def test_a_429_waits_until_its_http_date():
+    retry_at = formatdate(time.time() + 30, usegmt=True)
+    client, clock = make_client([(429, {'Retry-After': retry_at})], backoff_base=0)
+    try:
+        assert client.get_quotes(['A'])['A'] is not None
+    finally:
+        client.close()
+    assert client.requests_sent == 2
+    assert clock.sleeps and 28 <= sum(clock.sleeps) <= 31
+
+
+@pytest.mark.parametrize('value, expected', [('12', 12.0), ('-3', 0.0), ('soon', None), ('', None)])
+def test_retry_after_values(value, expected):
+    assert retry_after_seconds(value) == expected
+
+
+def test_an_unconfigured_client_is_resolved_once(monkeypatch):
+    monkeypatch.setattr(quote_client, '_client', None)
+    monkeypatch.setattr(quote_client, '_client_resolved', False)
+    assert quote_client.get_quote_client() is None
+    monkeypatch.setenv('MARKET_DATA_API_URL', 'http://quotes.invalid')
+    assert quote_client.get_quote_client() is None
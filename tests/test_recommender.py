@@ -0,0 +1,150 @@
+import itertools
+
+import pandas as pd
+import pytest
+
+from modules.fund_store import FundStore
+from modules.recommender import (BRANCH_CATEGORIES, BRANCH_PRIORITY_TYPES, BRANCH_WEIGHTAGES, DEFAULT_ALLOWED_RISKS,
+                                 INVESTMENT_GOALS, OTHER_PICKS, PRIORITY_PICKS, RISK_MAPPING, RISK_PROFILES,
+                                 load_fund_data, load_fund_records, recommend_from_store, recommend_funds,
+                                 recommend_funds_batch)
+
+DURATIONS = [0, 0.25, 1, 2.5, 3, 5, 7, 10, 30]
+PROFILES = list(itertools.product(RISK_PROFILES, DURATIONS, INVESTMENT_GOALS))
+
+
+def reference_recommendation(risk_profile, duration_years, investment_goal):
+    """The documented rules applied row by row to the sample funds, without FundCatalog."""
+    funds = load_fund_data()
+    branch = 0 if risk_profile in ("High", "Aggressive") else 1 if risk_profile == "Moderate" else 2
+    allowed = RISK_MAPPING.get(risk_profile, DEFAULT_ALLOWED_RISKS)
+    eligible = funds[funds['risk_profile'].isin(allowed)
+                     & (funds['min_duration_years'] <= duration_years)
+                     & funds['goal_suitability'].apply(lambda goals: investment_goal in goals)]
+    ranked = eligible.assign(inexact=eligible['risk_profile'] != risk_profile, position=eligible.index)
+    ranked = ranked.sort_values(['inexact', 'position'])
+    priority = ranked['type'].str.contains(BRANCH_PRIORITY_TYPES[branch])
+    picked = pd.concat([ranked[priority].head(PRIORITY_PICKS), ranked[~priority].head(OTHER_PICKS)])
+    default = round(100 / max(len(picked), 1))
+    return BRANCH_CATEGORIES[branch], [(name, float(BRANCH_WEIGHTAGES[branch].get(name, default)))
+                                       for name in picked['name']]
+
+
+def _picks(result):
+    category, funds = result
+    return category, [(fund['name'], fund['weightage']) for fund in funds]
+
+
+@pytest.mark.parametrize('profile, expected', [
+    (('High', 10, 'Wealth Creation'),
+     ('Equity - High Growth', [('SBI Small Cap Fund', 40.0), ('SBI contra fund', 30.0), ('SBI Bluechip Fund', 30.0)])),
+    (('Moderate', 4, 'Retirement Planning'),
+     ('Hybrid - Balanced', [('SBI Equity Hybrid Fund', 40.0), ('SBI Balanced Advantage Fund', 30.0)])),
+    (('Moderate', 3, 'Tax Saving'), ('Hybrid - Balanced', [('SBI Long Term Equity Fund', 100.0)])),
+    (('Low', 2, 'Short-term Capital Gain'),
+     ('Debt / Hybrid - Conservative', [('SBI Debt Fund', 30.0), ('SBI Liquid Fund', 50.0)])),
+    (('Conservative', 0.25, 'General Investment'), ('Debt / Hybrid - Conservative', [('SBI Liquid Fund', 50.0)])),
+    (('Aggressive', 10, 'Tax Saving'), ('Equity - High Growth', [])),
+    (('Moderate', 1, 'Wealth Creation'), ('Hybrid - Balanced', [])),
+])
+def test_representative_profiles(profile, expected):
+    assert _picks(recommend_funds(*profile)) == expected
+
+
+def test_batch_matches_the_reference_rules():
+    for profile, result in zip(PROFILES, recommend_funds_batch(PROFILES)):
+        assert _picks(result) == reference_recommendation(*profile), profile
+
+
+def test_batch_accepts_a_frame():
+    frame = pd.DataFrame(PROFILES, columns=['risk_profile', 'duration_years', 'investment_goal'])
+    assert recommend_funds_batch(frame) == recommend_funds_batch(PROFILES)
+
+
+def test_store_picks_match_the_catalog(tmp_path):
+    records = load_fund_records()
+    store = FundStore(str(tmp_path / 'funds.sqlite3'))
+    try:
+        store.upsert_funds({**{column: values[i] for column, values in records.items()}, 'scheme_code': i + 1,
+                            'category': records['type'][i]} for i in range(len(records['name'])))
+        for profile, result in zip(PROFILES, recommend_funds_batch(PROFILES)):
+            assert _picks(recommend_from_store(store, *profile)) == _picks(result), profile
+    finally:
+        store.close()
+
+
+SHARPE_ORDER = ["SBI Large & Midcap Fund", "SBI contra fund", "SBI Small Cap Fund"] # Best first
+
+
+@pytest.fixture
+def ranked_history(tmp_path, monkeypatch):
+    """A default NAV history in which the three High-risk equity funds differ only in Sharpe ratio."""
+    import numpy as np
+    from modules import nav_history, recommender
+    store = nav_history.NavHistoryStore(str(tmp_path / 'nav_history'))
+    monkeypatch.setattr(nav_history, '_default_store', store)
+    monkeypatch.setattr(recommender, '_ranked_catalog', (None, None))
+
+    rng = np.random.default_rng(11)
+    names = load_fund_records()['name']
+    noise = rng.normal(0, 0.01, size=(300, len(names)))
+    drift = np.full(len(names), 0.0002)
+    for rank, name in enumerate(SHARPE_ORDER):
+        drift[names.index(name)] = 0.003 - 0.001 * rank
+    navs = 10 * np.exp(np.cumsum(drift + noise, axis=0))
+    for day, row in zip(pd.bdate_range('2025-01-01', periods=len(navs)), navs):
+        store.ingest_navs(pd.DataFrame({
+            'Scheme Code': range(1, len(names) + 1),
+            'Scheme Name': [f"{name} - Regular Plan - Growth" for name in names],
+            'NAV': row,
+            'Date': day.strftime('%Y-%m-%d'),
+        }))
+    return store
+
+
+def test_nav_history_metric_ranks_the_catalog(ranked_history):
+    from modules import recommender
+    unranked = ['SBI Small Cap Fund', 'SBI contra fund', 'SBI Bluechip Fund']
+    assert [fund['name'] for fund in recommend_funds('High', 10, 'Wealth Creation')[1]] == \
+        ["SBI Large & Midcap Fund", "SBI contra fund", "SBI Bluechip Fund"]
+
+    recommender.RANKING_METRIC, metric = None, recommender.RANKING_METRIC
+    try:
+        assert [fund['name'] for fund in recommend_funds('High', 10, 'Wealth Creation')[1]] == unranked
+    finally:
+        recommender.RANKING_METRIC = metric
+
+
+def test_nav_history_metric_ranks_the_store(ranked_history, tmp_path):
+    from modules.recommender import rank_store
+    records = load_fund_records()
+    store = FundStore(str(tmp_path / 'funds.sqlite3'))
+    try:
+        store.upsert_funds({**{column: values[i] for column, values in records.items()}, 'scheme_code': i + 1,
+                            'category': records['type'][i]} for i in range(len(records['name'])))
+        assert [fund['name'] for fund in recommend_from_store(store, 'High', 10, 'Wealth Creation')[1]] == \
+            ['SBI Small Cap Fund', 'SBI contra fund', 'SBI Bluechip Fund']
+        rank_store(store)
+        assert [fund['name'] for fund in recommend_from_store(store, 'High', 10, 'Wealth Creation')[1]] == \
+            ["SBI Large & Midcap Fund", "SBI contra fund", "SBI Bluechip Fund"]
+        assert _picks(recommend_funds('Moderate', 4, 'Retirement Planning', store=store)) == \
+            _picks(recommend_funds('Moderate', 4, 'Retirement Planning'))
+    finally:
+        store.close()
+
+
+def test_amfi_plan_names_get_their_schemes_weightage(tmp_path):
+    records = load_fund_records()
+    store = FundStore(str(tmp_path / 'funds.sqlite3'))
+    try:
+        store.upsert_funds({**{column: values[i] for column, values in records.items()}, 'scheme_code': i + 1,
+                            'name': f"{records['name'][i].upper()} - Direct Plan - Growth",
+                            'category': records['type'][i]} for i in range(len(records['name'])))
+        category, funds = recommend_from_store(store, 'High', 10, 'Wealth Creation')
+        assert [(fund['name'], fund['weightage']) for fund in funds] == [
+            ('SBI SMALL CAP FUND - Direct Plan - Growth', 40.0),
+            ('SBI CONTRA FUND - Direct Plan - Growth', 30.0),
+            ('SBI BLUECHIP FUND - Direct Plan - Growth', 30.0),
+        ]
+    finally:
+        store.close()
@@ -0,0 +1,101 @@
+import json
+import math
+import socket
+import threading
+import time
+
+import numpy as np
+
+from modules import tick_feed
+from modules.tick_feed import TickRingBuffer, TickSubscriber
+
+
+class WriteDuringCopy:
+    """Wraps a ring buffer array so that the reader's first copy of it races one write."""
+
+    def __init__(self, buffer, array, tick):
+        self.buffer, self.array, self.tick = buffer, array, tick
+
+    def __setitem__(self, slot, value):
+        self.array[slot] = value
+
+    def copy(self):
+        if self.tick is not None:
+            tick, self.tick = self.tick, None
+            self.buffer.append(*tick)
+        return self.array.copy()
+
+
+def test_a_snapshot_racing_a_write_is_retried():
+    buffer = TickRingBuffer(capacity=4)
+    for i in range(6):
+        buffer.append(float(i), 10.0 * i)
+    buffer._prices = WriteDuringCopy(buffer, buffer._prices, (6.0, 60.0))
+
+    timestamps, prices, _ = buffer.snapshot()
+
+    np.testing.assert_array_equal(timestamps, [3, 4, 5, 6])
+    np.testing.assert_array_equal(prices, [30, 40, 50, 60])
+
+
+def test_a_snapshot_waits_out_an_unfinished_write(monkeypatch):
+    monkeypatch.setattr(tick_feed, 'SNAPSHOT_RETRIES', 10_000_000)
+    buffer = TickRingBuffer(capacity=4)
+    buffer.append(1.0, 10.0, open_price=9.0)
+    buffer._sequence += 1 # A write has started...
+    finish = threading.Timer(0.05, lambda: setattr(buffer, '_sequence', buffer._sequence + 1))
+    started = time.monotonic()
+    finish.start()
+    try:
+        assert buffer.latest() == (1.0, 10.0, 9.0)
+    finally:
+        finish.join()
+    assert time.monotonic() - started >= 0.04 # ...and the reader only copied once it had finished
+
+
+def test_a_tick_without_an_open_has_no_change():
+    subscriber = TickSubscriber('127.0.0.1', 0)
+    subscriber._handle(json.dumps({'symbol': 'NIFTY 50', 'price': 22500.0, 'ts': 1.0}))
+    quote = subscriber.quote('NIFTY 50')
+    assert quote['current_price'] == 22500.0
+    assert math.isnan(quote['change']) and math.isnan(quote['percent_change'])
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_the_subscriber_reconnects_after_the_feed_drops(monkeypatch):
+    monkeypatch.setattr(tick_feed, 'RECONNECT_BACKOFF_SECONDS', (0.01,))
+    sessions = [
+        # The feed drops mid-tick: the half-sent line is skipped, not stored.
+        [{'symbol': 'SBIN.NS', 'price': 800.0, 'open': 795.0, 'ts': 1.0},
+         {'symbol': 'SBIN.NS', 'price': 801.0, 'ts': 2.0}, '{"symbol": "SBIN.NS", "pri'],
+        [{'symbol': 'SBIN.NS', 'price': 805.0, 'ts': 10.0}, {'symbol': 'SBIN.NS', 'price': 806.0, 'ts': 11.0}],
+    ]
+    server = socket.create_server(('127.0.0.1', 0))
+
+    def publish():
+        for ticks in sessions:
+            connection, _ = server.accept()
+            with connection:
+                lines = [tick if isinstance(tick, str) else json.dumps(tick) + '\n' for tick in ticks]
+                connection.sendall(''.join(lines).encode())
+        server.close()
+
+    publisher = threading.Thread(target=publish, daemon=True)
+    publisher.start()
+    subscriber = TickSubscriber('127.0.0.1', server.getsockname()[1]).start()
+    try:
+        _wait_for(lambda: subscriber.ticks_received == 4)
+        series = subscriber.series('SBIN.NS')
+        quote = subscriber.quote('SBIN.NS')
+    finally:
+        subscriber.stop()
+        publisher.join(timeout=2)
+
+    np.testing.assert_array_equal(series.to_numpy(), [800.0, 801.0, 805.0, 806.0])
+    assert quote['open'] == 795.0 and quote['change'] == 11.0 # The open survives the reconnect